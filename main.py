@@ -9,7 +9,7 @@
 @Modified:
 """
 
-from PyQt5.QtWidgets import QApplication, QMainWindow, QFileDialog, QMenu
+from PyQt5.QtWidgets import QApplication, QMainWindow, QFileDialog, QMenu, QLabel, QVBoxLayout
 from ui.main_window import Ui_mainWindow
 from PyQt5.QtCore import Qt, QPoint, QTimer
 from PyQt5.QtGui import QImage, QPixmap
@@ -18,13 +18,23 @@ import sys
 import json
 import os
 import cv2
-import queue
 
 from ui.sonar_win import Window
 from modules.detectThread import YoloDetThread
 from modules.CustomMessageBox import MessageBox
 from modules.logger import Logger
 from modules.decodeThread import DecodeThread
+from modules.framePool import FrameQueue
+from modules.udpPortThread import UdpPortThread, is_live_source
+from modules.pingRecorder import PingRecorder
+
+STOP_TIMEOUT_MS = 1000      # 等待子线程退出的最长时间
+# 播放速度：(名称, 倍速, 每列合并的ping数)。快速浏览时每列覆盖更长的时间，每帧显示的列数与显示开销不变
+SPEED_MODES = [('正常 ×1', 1, 1), ('快速 ×3', 3, 1), ('浏览 ×20', 20, 20), ('浏览 ×100', 100, 100)]
+# 扩散补偿（TVG）：名称、扩散系数；默认不补偿
+SPREADING_MODES = [('不补偿扩散', 0), ('20logR（鱼群）', 20), ('40logR（单体）', 40)]
+# 微批处理（见YoloDetThread.set_batch）：名称、批大小；默认逐帧推理
+BATCH_MODES = [('逐帧推理', 1), ('每批2帧', 2), ('每批4帧', 4), ('每批8帧', 8)]
 
 
 # 程序主窗口
@@ -33,7 +43,9 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         super(MainWindow, self).__init__(parent)
         self.setupUi(self)
         self.m_flag = False
-        self.img_queue = queue.Queue()       # 用于子线程间传输图片；数据解析线程为生产者，目标检测线程为消费者
+        # 用于子线程间传输图片；数据解析线程为生产者，目标检测线程为消费者。
+        # 有界队列，检测跟不上时丢弃最旧的帧，内存与延迟均有上界
+        self.img_queue = FrameQueue(maxsize=2, policy='drop_oldest')
 
         # style 1: window can be stretched
         # self.setWindowFlags(Qt.CustomizeWindowHint | Qt.WindowStaysOnTopHint)
@@ -68,9 +80,29 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         self.decode_thread = DecodeThread(self.img_queue)
         self.decode_thread.send_msg.connect(lambda x: self.statistic_msg(x))
         self.decode_thread.percent_length = self.progressSlider.maximum()
+        self.decode_thread.fast_decimations = tuple(d for _, _, d in SPEED_MODES if d > 1)    # 后台扫描时预池化
         self.decode_thread.send_percent.connect(lambda x: self.progressSlider.setValue(x))
         self.progressSlider.sliderReleased.connect(self.change_percent)
-        self.decode_thread.send_fps.connect(lambda x: self.fpsLabel.setText(x))
+        self.decode_thread.send_fps.connect(lambda x: self.show_fps(x, 0))
+
+        # 缩略回波图放在进度条正上方、与进度条同宽，第k列对应进度条的第k格
+        self.overviewLabel = QLabel(self.groupBox_201)
+        self.overviewLabel.setFixedHeight(40)
+        self.overviewLabel.setScaledContents(True)
+        self.gridLayout_3.removeWidget(self.progressSlider)
+        progress_layout = QVBoxLayout()
+        progress_layout.setSpacing(0)
+        progress_layout.addWidget(self.overviewLabel)
+        progress_layout.addWidget(self.progressSlider)
+        self.gridLayout_3.addLayout(progress_layout, 1, 2, 1, 1)
+        self.decode_thread.send_overview.connect(self.show_overview)
+
+        # 探鱼仪UDP接收线程，直接写入数据解析线程的ping环形缓冲区
+        self.udp_thread = UdpPortThread(self.decode_thread.ping_buffer)
+        self.udp_thread.recorder = PingRecorder(os.path.join(os.getcwd(), 'records'))  # 实时数据异步写盘
+        self.udp_thread.send_msg.connect(lambda x: self.statistic_msg(x))
+        self.udp_thread.send_statistic.connect(self.show_udp_statistic)
+        self.udp_lost_num = 0
 
         # Logger
         self.log = Logger()
@@ -85,7 +117,17 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         self.detect_thread.send_statistic.connect(self.show_statistic)
         self.detect_thread.send_msg.connect(lambda x: self.show_msg(x))
 
-        self.detect_thread.send_fps.connect(lambda x: self.fpsLabel.setText(x))
+        self.detect_thread.send_fps.connect(lambda x: self.show_fps(x, 1))
+        self.fps_texts = ['', '']               # 解析线程、检测线程的帧率信息
+
+        # 子线程退出后（finished信号）再重新启动或关闭窗口，界面线程不阻塞等待
+        self.threads = [(self.decode_thread, '数据解析线程'), (self.detect_thread, '目标检测线程'),
+                        (self.udp_thread, 'UDP接收线程')]
+        self.pending_starts = []                # 停止中的线程，退出后再启动
+        self.closing = False                    # 正在关闭窗口，等待线程退出
+        self.close_forced = False               # 等待超时，不再等待线程退出
+        for thread, _ in self.threads:
+            thread.finished.connect(lambda t=thread: self.thread_finished(t))
 
         self.fileButton.clicked.connect(self.open_file)
         self.sonarButton.clicked.connect(self.chose_sonar)
@@ -104,6 +146,8 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         self.absorbSlider.valueChanged.connect(lambda x: self.change_val(x, 'absorbSlider'))
         self.cutButton.clicked.connect(self.saveOneImg)
         self.speedButton.clicked.connect(self.setSpeed)
+        self.speedButton.setContextMenuPolicy(Qt.CustomContextMenu)      # 右键选择快速浏览倍数
+        self.speedButton.customContextMenuRequested.connect(self.show_speed_menu)
         self.load_setting()
 
     def search_pt(self):
@@ -141,6 +185,9 @@ class MainWindow(QMainWindow, Ui_mainWindow):
             MessageBox(
                 self.closeButton, title='提示', text='Loading sonar stream', time=1000, auto=True).exec_()
             self.detect_thread.source = ip
+            self.decode_thread.source = ip
+            self.overviewLabel.clear()          # 实时数据没有缩略图
+            self.udp_thread.address = ip
             new_config = {"ip": ip}
             new_json = json.dumps(new_config, ensure_ascii=False, indent=2)
             with open('config/ip.json', 'w', encoding='utf-8') as f:
@@ -172,6 +219,10 @@ class MainWindow(QMainWindow, Ui_mainWindow):
             conf = config['conf']
             gain = config['gain']
             absorb = config['absorb']
+            # 扩散补偿与每个采样点的距离（m，取决于声呐采样率），缺省时不补偿、0.05 m
+            self.decode_thread.tvg.spreading = config.get('spreading', 0)
+            self.decode_thread.tvg.range_per_bin = config.get('range_per_bin', 0.05)
+            self.detect_thread.set_batch(config.get('batch_size', 1))
         self.confSpinBox.setValue(conf)
         self.iouSpinBox.setValue(iou)
         self.gainSpinBox.setValue(gain)
@@ -184,21 +235,31 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         elif flag == 'confSlider':
             self.confSpinBox.setValue(x/100)
             self.detect_thread.conf_thres = x/100
+            self.detect_thread.request_nms()        # 当前画面按新阈值重做NMS（不重新推理）
         elif flag == 'iouSpinBox':
             self.iouSlider.setValue(int(x*100))
         elif flag == 'iouSlider':
             self.iouSpinBox.setValue(x/100)
             self.detect_thread.iou_thres = x/100
+            self.detect_thread.request_nms()        # 当前画面按新阈值重做NMS（不重新推理）
         elif flag == 'gainSpinBox':
             self.gainSlider.setValue(x)
             self.decode_thread.gain = x
+            self.decode_thread.request_render()     # 整屏按新参数重绘
+            self.decode_thread.emit_overview()
         elif flag == 'gainSlider':
             self.gainSpinBox.setValue(x)
             self.decode_thread.gain = x
+            self.decode_thread.request_render()     # 整屏按新参数重绘
+            self.decode_thread.emit_overview()
         elif flag == 'absorbSpinBox':
             self.absorbSlider.setValue(x)
+            self.decode_thread.tvg.absorption = x
+            self.decode_thread.request_render()     # 整屏按新参数重绘
         elif flag == 'absorbSlider':
             self.absorbSpinBox.setValue(x)
+            self.decode_thread.tvg.absorption = x
+            self.decode_thread.request_render()     # 整屏按新参数重绘
         elif flag == 'progressSlider':
             self.decode_thread.progress_slider_changed(x)
         else:
@@ -253,26 +314,60 @@ class MainWindow(QMainWindow, Ui_mainWindow):
             self.showNormal()
 
     def run_or_continue(self):
-        self.decode_thread.jump_out = False
-        self.detect_thread.jump_out = False
         if self.runButton.isChecked():
-            self.decode_thread.is_continue = True
-            if not self.decode_thread.isRunning():
-                self.decode_thread.start()
+            if is_live_source(self.decode_thread.source) and \
+                    (not self.udp_thread.isRunning() or self.udp_thread.control.is_stopping):
+                self.udp_thread.address = self.decode_thread.source
+                self.start_thread(self.udp_thread)
+
+            self.decode_thread.resume()
+            self.start_thread(self.decode_thread)
 
-            self.detect_thread.is_continue = True
-            if not self.detect_thread.isRunning():
-                self.detect_thread.start()
+            self.detect_thread.resume()
+            self.start_thread(self.detect_thread)
 
             source = os.path.basename(self.decode_thread.source)
-            source = 'sonar' if source.isnumeric() else source
+            source = 'sonar' if source.isnumeric() or is_live_source(self.decode_thread.source) else source
             self.statistic_msg('main_thread >> 历史文件回放中：%s' % source)
         else:
-            self.decode_thread.is_continue = False
+            self.decode_thread.pause()
             self.statistic_msg('已暂停')
 
+    # 请求停止，不在界面线程上等待线程退出；STOP_TIMEOUT_MS后仍未退出时提示
     def stop(self):
-        self.decode_thread.jump_out = True
+        for thread in (self.decode_thread, self.udp_thread):
+            if thread in self.pending_starts:
+                self.pending_starts.remove(thread)
+            thread.stop()
+        QTimer.singleShot(STOP_TIMEOUT_MS, self.check_stopped)
+
+    def check_stopped(self):
+        for thread, name in self.threads:
+            if thread.isRunning() and thread.control.is_stopping:
+                self.statistic_msg('main_thread >> %s未能在%d ms内停止' % (name, STOP_TIMEOUT_MS))
+
+    # 启动线程（已在运行时不重复启动）；上一次运行仍在退出时，等其finished信号后再启动
+    def start_thread(self, thread):
+        if not thread.isRunning():
+            thread.control.reset()
+            thread.start()
+        elif thread.control.is_stopping and thread not in self.pending_starts:
+            self.pending_starts.append(thread)
+
+    def thread_finished(self, thread):
+        thread.wait()       # finished信号在线程函数返回后发出，此处只等待线程真正结束，立即返回
+        if self.closing:
+            self.close()
+        elif thread in self.pending_starts:
+            self.pending_starts.remove(thread)
+            self.start_thread(thread)
+
+    # 缩略图拉伸到进度条宽度显示（不保持宽高比），列与进度条刻度对齐
+    def show_overview(self, img_src):
+        frame = cv2.cvtColor(img_src, cv2.COLOR_BGR2RGB)
+        img = QImage(frame.data, frame.shape[1], frame.shape[0], frame.shape[2] * frame.shape[1],
+                     QImage.Format_RGB888)
+        self.overviewLabel.setPixmap(QPixmap.fromImage(img))
 
     @staticmethod
     def show_image(img_src, label):
@@ -301,37 +396,144 @@ class MainWindow(QMainWindow, Ui_mainWindow):
         except Exception as e:
             print(repr(e))
 
+    # 解析线程（出帧）与检测线程（推理）的帧率并列显示，互不覆盖
+    def show_fps(self, text, index):
+        self.fps_texts[index] = text
+        self.fpsLabel.setText(''.join(self.fps_texts))
+
     def show_statistic(self, statistic_dic):
         try:
             self.resultWidget.clear()
-            statistic_dic = sorted(statistic_dic.items(), key=lambda x: x[1], reverse=True)
-            statistic_dic = [i for i in statistic_dic if i[1] > 0]
-            results = [' '+str(i[0]) + '：' + str(i[1]) for i in statistic_dic]
+            # 各类别(当前跟踪中的目标数, 累计目标数)，按累计数量排序
+            statistic_dic = sorted(statistic_dic.items(), key=lambda x: x[1][1], reverse=True)
+            statistic_dic = [i for i in statistic_dic if i[1][1] > 0]
+            results = [' %s：%d（累计 %d）' % (i[0], i[1][0], i[1][1]) for i in statistic_dic]
             self.resultWidget.addItems(results)
 
         except Exception as e:
             print(repr(e))
 
+    # UDP接收统计显示在帧率标签的提示中，有丢包时写入日志
+    def show_udp_statistic(self, counters):
+        text = '接收: %.0f ping/s %.1f MB/s  丢失: %d  间隔: %d  乱序: %d  无效字节: %d' \
+               % (counters['ping_rate'], counters['byte_rate'] / 1e6, counters['lost'],
+                  counters['gap'], counters['reorder'], counters['bad_bytes'])
+        if 'record_depth' in counters:
+            text += '\n记录: %.1f MB/s  队列: %d（峰值%d）  丢弃: %d  文件: %d' \
+                    % (counters['record_byte_rate'] / 1e6, counters['record_depth'], counters['record_max_depth'],
+                       counters['record_dropped'], counters['record_file'])
+        self.fpsLabel.setToolTip(text)
+        if counters['lost'] > self.udp_lost_num:
+            self.log.logger.info('udp_thread >> 丢失ping累计：%d' % counters['lost'])
+        self.udp_lost_num = counters['lost']
+
     def setSpeed(self):
         if self.speedButton.isChecked():
-            self.decode_thread.speed = 6
+            self.set_speed_mode(1)
         else:
-            self.decode_thread.speed = 2
+            self.set_speed_mode(0)
+
+    def set_speed_mode(self, index):
+        name, speed, decimation = SPEED_MODES[index]
+        self.decode_thread.speed = speed
+        if decimation != self.decode_thread.decimation:
+            self.decode_thread.set_decimation(decimation)
+        self.speedButton.setChecked(index > 0)
+        self.speedButton.setToolTip(name)
+
+    def show_speed_menu(self, pos):
+        menu = QMenu(self)
+        current = (self.decode_thread.speed, self.decode_thread.decimation)
+        for index, (name, speed, decimation) in enumerate(SPEED_MODES):
+            action = menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked((speed, decimation) == current)
+            action.triggered.connect(lambda _, i=index: self.set_speed_mode(i))
+        menu.addSeparator()
+        action = menu.addAction('浏览时检测')
+        action.setCheckable(True)
+        action.setChecked(self.decode_thread.detect_decimated)
+        action.triggered.connect(lambda x: setattr(self.decode_thread, 'detect_decimated', x))
+        action = menu.addAction('增量检测')
+        action.setCheckable(True)
+        action.setChecked(self.detect_thread.incremental)
+        action.triggered.connect(self.detect_thread.set_incremental)
+        action = menu.addAction('能量门控')
+        action.setCheckable(True)
+        action.setChecked(self.detect_thread.energy_gating)
+        action.triggered.connect(self.detect_thread.set_energy_gating)
+        batch_menu = menu.addMenu('微批处理')
+        for name, batch_size in BATCH_MODES:
+            action = batch_menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(self.detect_thread.batcher.batch_size == batch_size)
+            action.triggered.connect(lambda _, x=batch_size: self.set_batch(x))
+        menu.addSeparator()
+        for name, spreading in SPREADING_MODES:
+            action = menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(self.decode_thread.tvg.spreading == spreading)
+            action.triggered.connect(lambda _, x=spreading: self.set_spreading(x))
+        menu.addSeparator()
+        menu.addAction('导出海底深度').triggered.connect(self.export_bottom)
+        menu.exec_(self.speedButton.mapToGlobal(pos))
+
+    # 设置扩散补偿，屏幕按新的增益整屏重绘
+    def set_spreading(self, spreading):
+        self.decode_thread.tvg.spreading = spreading
+        self.decode_thread.request_render()
+
+    # 设置检测的批大小，帧队列容量随之扩大或复原
+    def set_batch(self, batch_size):
+        self.detect_thread.set_batch(batch_size)
+        self.statistic_msg('检测批大小：%d，帧队列容量：%d' % (batch_size, self.img_queue.maxsize))
+
+    # 导出已处理部分每个ping的海底深度（CSV）
+    def export_bottom(self):
+        default = os.path.splitext(str(self.decode_thread.source))[0] + '_bottom.csv'
+        name, _ = QFileDialog.getSaveFileName(self, '导出海底深度', default, "CSV文件(*.csv)")
+        if not name:
+            return
+        try:
+            count = self.decode_thread.export_bottom(name)
+            self.statistic_msg('已导出海底深度 %d 个ping：%s' % (count, os.path.basename(name)))
+        except Exception as e:
+            self.statistic_msg('导出海底深度失败：%s' % e)
 
+    # 关闭窗口：请求各线程停止并保存设置，所有线程退出（finished信号）后再退出程序，界面线程不阻塞等待；
+    # STOP_TIMEOUT_MS后仍有线程未退出时提示并不再等待
     def closeEvent(self, event):
-        self.decode_thread.jump_out = True
+        if not self.closing:
+            self.closing = True
+            for thread, _ in self.threads:
+                thread.stop()
+            self.save_setting()
+            self.closing_box = MessageBox(self.closeButton, title='提示', text='正在关闭', time=2000, auto=True)
+            self.closing_box.show()
+            QTimer.singleShot(STOP_TIMEOUT_MS, self.force_close)
+        if not self.close_forced and any(thread.isRunning() for thread, _ in self.threads):
+            event.ignore()
+            return
+        sys.exit(0)
+
+    def force_close(self):
+        self.check_stopped()
+        self.close_forced = True
+        self.close()
+
+    def save_setting(self):
         config_file = 'config/setting.json'
         config = dict()
         config['iou'] = self.iouSpinBox.value()
         config['conf'] = self.confSpinBox.value()
         config['gain'] = self.gainSpinBox.value()
         config['absorb'] = self.absorbSpinBox.value()
+        config['spreading'] = self.decode_thread.tvg.spreading
+        config['range_per_bin'] = self.decode_thread.tvg.range_per_bin
+        config['batch_size'] = self.detect_thread.batcher.batch_size
         config_json = json.dumps(config, ensure_ascii=False, indent=2)
         with open(config_file, 'w', encoding='utf-8') as f:
             f.write(config_json)
-        MessageBox(
-            self.closeButton, title='提示', text='正在关闭', time=2000, auto=True).exec_()
-        sys.exit(0)
 
     def mousePressEvent(self, event):
         self.m_Position = event.pos()
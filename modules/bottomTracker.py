@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        bottomTracker.py
+@Author：      wzj
+@Description:  逐ping的海底跟踪。海底回波是每个ping中最强、最宽的回波，原先检测与显示把它当作普通回波处理。
+               每次只处理新到达的ping（数据解析线程写入瀑布图的新列），所有计算对整块(pkg_len, n)矩阵进行，
+               不逐个采样点循环：
+                   1. 检测：沿深度方向滑动平均（累加和相减）抑制斑点噪声，跳过近场min_bin行后取最强回波
+                      （已跟踪到海底时优先取上次深度附近的强回波，比海底更强的鱼群不会把海底拉走）；
+                      最强回波与该ping中位数之比低于contrast时视为没有海底（深水、丢失）；
+                      海底深度取最强回波以上search行内上升最陡（梯度最大）的位置，即回波前沿
+                   2. 时间平滑：与之前的ping一起取最近window个ping的中位数（鱼群等短暂的强回波被剔除，
+                      有效估计不足一半时视为丢失），再做指数平滑（scipy.signal.lfilter，状态跨调用保留）
+                   3. 锁定：连续confirm个ping都有估计才确认为海底（深水中孤立的鱼群不会被当作海底），
+                      确认前的部分在屏幕与记录中回填
+               输出每个ping的海底行号（与瀑布图的行一致，NaN表示没有海底），供：
+                   检测：能量门控只统计海底以上的水体，检测结果中位于海底以下的框被丢弃
+                   显示：检测画面上叠加海底线
+                   导出：按ping下标记录，导出为CSV（ping, 行号, 深度m）
+               运行本文件在模拟数据上测试吞吐量与误差：python -m modules.bottomTracker
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+
+class BottomTracker(object):
+    def __init__(self, width=1400, smooth_bins=5, min_bin=20, contrast=4.0, search=30, gate=40, window=9, smooth=0.3,
+                 confirm=50):
+        self.width = width                  # 屏幕列数
+        self.smooth_bins = smooth_bins      # 深度方向滑动平均的行数
+        self.min_bin = min_bin              # 近场（发射余振）行数，不参与检测
+        self.contrast = contrast            # 最强回波与中位数之比的下限
+        self.search = search                # 回波前沿在最强回波以上的搜索行数
+        self.gate = gate                    # 已跟踪到海底时，先在上次深度上下gate行内寻找最强回波
+        self.window = window                # 时间中位数的ping数
+        self.smooth = smooth                # 指数平滑中新估计的权重
+        self.confirm = confirm              # 确认为海底所需的连续ping数
+        self.screen = np.full(width, np.nan, dtype=np.float32)     # 屏幕上每列的海底行号（左旧右新）
+        self.history = np.full(0, np.nan, dtype=np.float32)         # 按ping下标记录的海底行号
+        self.reset()
+
+    # 清除时间平滑的状态（整屏重绘、跳转时调用）；history为True时同时清除记录（切换数据源时调用）
+    def reset(self, history=False):
+        self.tail = np.full(self.window - 1, np.nan, dtype=np.float32)     # 最近window-1个ping的检测值
+        self.state = np.nan                 # 指数平滑的最近输出
+        self.run = 0                        # 当前连续有估计的ping数
+        self.pending = np.full(0, np.nan, dtype=np.float32)     # 当前未确认连续段的估计值
+        self.cost = 0.0                     # 最近一次的耗时（秒）
+        if history:
+            self.history = np.full(0, np.nan, dtype=np.float32)
+
+    # 逐ping检测（不做时间平滑），data形状为(pkg_len, n)，返回n个行号（NaN表示没有海底）。
+    # prior为上次的海底行号：其上下gate行内有足够强的回波时取该回波（比海底更强的鱼群不会把海底拉走），否则在整列中寻找
+    def detect(self, data, prior=np.nan):
+        k = self.smooth_bins
+        if data.shape[0] < self.min_bin + k + 2:
+            return np.full(data.shape[1], np.nan, dtype=np.float32)
+        total = np.cumsum(data, axis=0, dtype=np.float32)
+        smoothed = (total[k:] - total[:-k]) / k         # 第i行为[i+1, i+k]行的平均
+        below = smoothed[self.min_bin:]
+        columns = np.arange(data.shape[1])
+        floor = self.contrast * (np.median(smoothed, axis=0) + 1)
+        peak = below.argmax(axis=0)
+        if not np.isnan(prior):
+            center = int(prior) - self.min_bin - k // 2 - 2
+            lo, hi = max(center - self.gate, 0), max(center + self.gate + 1, 0)
+            if hi > lo and lo < below.shape[0]:
+                near = below[lo:hi].argmax(axis=0) + lo
+                peak = np.where(below[near, columns] > floor, near, peak)
+        strength = below[peak, columns]
+        valid = strength > floor
+        # 回波前沿：最强回波以上search行内梯度最大的位置
+        gradient = np.diff(below, axis=0)               # 第i行为below[i+1] - below[i]
+        rows = np.arange(gradient.shape[0])[:, None]
+        gradient[(rows < peak - self.search) | (rows >= peak)] = -np.inf
+        edge = gradient.argmax(axis=0) + 1
+        edge = np.where(np.isfinite(gradient[edge - 1, columns]), edge, peak)
+        bottom = (edge + self.min_bin + k // 2 + 2).astype(np.float32)
+        bottom[~valid] = np.nan
+        return bottom
+
+    # 时间平滑：最近window个ping的中位数（有效值过半时），再做指数平滑
+    def temporal(self, raw):
+        n = len(raw)
+        series = np.concatenate([self.tail, raw])
+        self.tail = series[len(series) - self.window + 1:]
+        windows = np.sort(sliding_window_view(series, self.window), axis=1)    # NaN排在最后
+        count = np.count_nonzero(~np.isnan(windows), axis=1)
+        median = windows[np.arange(n), np.maximum(count - 1, 0) // 2]
+        median[count <= self.window // 2] = np.nan
+        valid = ~np.isnan(median)
+        if not valid.any():
+            return median
+        # 缺失的ping沿用之前的值参与滤波（输出仍为NaN），滤波器状态为上一次的输出
+        last = np.maximum.accumulate(np.where(valid, np.arange(n), -1))
+        start = self.state if not np.isnan(self.state) else median[valid][0]
+        filled = np.where(last >= 0, median[np.maximum(last, 0)], start)
+        a = 1 - self.smooth
+        out, _ = lfilter([self.smooth], [1, -a], filled, zi=[a * start])
+        self.state = out[-1]
+        out = out.astype(np.float32)
+        out[~valid] = np.nan
+        return out
+
+    # 锁定：连续段（跨调用累计）达到confirm个ping的估计才输出，其余为NaN；
+    # 返回(输出, 本次才确认的、属于之前调用的估计值)
+    def lock(self, bottom):
+        n = len(bottom)
+        early = self.pending[:0]
+        if n == 0:
+            return bottom, early
+        valid = ~np.isnan(bottom)
+        index = np.arange(n)
+        begin = np.maximum.accumulate(np.where(valid, 0, index + 1))       # 所在连续段在本次的起点
+        run = index - begin + 1 + np.where(begin == 0, self.run, 0)        # 连续段到该ping为止的长度
+        end = np.minimum.accumulate(np.where(valid, n, index)[::-1])[::-1] - 1     # 所在连续段在本次的终点
+        total = run[np.maximum(end, 0)]
+        out = np.where(valid & (total >= self.confirm), bottom, np.nan).astype(np.float32)
+        if valid[0] and 0 < self.run < self.confirm <= total[0]:
+            early = self.pending
+        if not valid[-1]:
+            self.run, self.pending = 0, self.pending[:0]
+        else:
+            self.run = int(run[-1])
+            tail = bottom[begin[-1]:]
+            if self.run >= self.confirm:
+                self.pending = self.pending[:0]
+            elif begin[-1] == 0:
+                self.pending = np.concatenate([self.pending, tail])
+            else:
+                self.pending = tail
+        return out, early
+
+    # 新到达的n个显示列data(pkg_len, n)，first为第一列的ping下标，每列对应step个ping（快速浏览时合并的ping数）；
+    # 返回n个海底行号，同时更新屏幕与记录
+    def push(self, data, first, step=1):
+        t0 = time.perf_counter()
+        bottom, early = self.lock(self.temporal(self.detect(data, self.state)))
+        n = len(bottom)
+        if n >= self.width:
+            self.screen[:] = bottom[n - self.width:]
+        elif n:
+            self.screen[:-n] = self.screen[n:]
+            self.screen[-n:] = bottom
+        if len(early):
+            # 回填本次才确认的连续段中属于之前的部分
+            m = min(len(early), max(self.width - n, 0))
+            if m:
+                self.screen[self.width - n - m:self.width - n] = early[len(early) - m:]
+            self.record(early, first - len(early) * step, step)
+        self.record(bottom, first, step)
+        self.cost = time.perf_counter() - t0
+        return bottom
+
+    # 整屏重绘：清除时间平滑的状态后重新处理整屏数据
+    def overwrite(self, data, first, step=1):
+        self.reset()
+        self.screen[:] = np.nan
+        return self.push(data, first, step)
+
+    # 按ping下标记录（容量不足时按倍数扩大）
+    def record(self, bottom, first, step):
+        if first < 0 or len(bottom) == 0:
+            return
+        end = first + len(bottom) * step
+        if end > len(self.history):
+            grown = np.full(max(end, 2 * len(self.history)), np.nan, dtype=np.float32)
+            grown[:len(self.history)] = self.history
+            self.history = grown
+        self.history[first:end] = np.repeat(bottom, step)
+
+    # 导出已记录的海底深度：每行为ping下标、行号与深度（m，行中心），没有海底的ping不导出；返回导出的行数
+    def export_csv(self, path, range_per_bin):
+        pings = np.flatnonzero(~np.isnan(self.history))
+        rows = self.history[pings]
+        table = np.column_stack([pings, rows, (rows + 0.5) * range_per_bin])
+        np.savetxt(path, table, fmt=['%d', '%.1f', '%.3f'], delimiter=',', header='ping,bin,depth_m', comments='')
+        return len(pings)
+
+
+# 检测结果(n, 6)中上边缘已在海底以下（框中心所在列）的框为False；该列没有海底时为True
+def above_bottom(det, bottom):
+    if len(det) == 0:
+        return np.ones(0, dtype=bool)
+    centers = np.clip(((det[:, 0] + det[:, 2]) / 2).astype(np.int64), 0, len(bottom) - 1)
+    limit = bottom[centers]
+    return ~(det[:, 1] >= limit)        # NaN比较为False，保留
+
+
+# 在图像上画出海底线（不连续处断开）
+def draw_bottom(img, bottom, color=(255, 255, 255), thickness=2):
+    columns = np.flatnonzero(~np.isnan(bottom))
+    if len(columns) < 2:
+        return img
+    points = np.column_stack([columns, bottom[columns]]).astype(np.int32)
+    segments = np.split(points, np.flatnonzero(np.diff(columns) > 1) + 1)
+    cv2.polylines(img, [s.reshape(-1, 1, 2) for s in segments if len(s) > 1], False, color, thickness)
+    return img
+
+
+# 模拟数据：缓慢起伏的海底（强回波与向下的拖尾）、瑞利噪声、海底以上的鱼群（部分比海底更强），
+# 以及没有海底回波的片段（其中有深处的鱼群）；返回(数据(pkg_len, pings)，真实海底行号（丢失处为NaN）)
+def synthetic_pings(pings, pkg_len=800, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(pings)
+    truth = 500 + 120 * np.sin(t / 700) + 30 * np.sin(t / 97)
+    data = rng.rayleigh(300, (pkg_len, pings))
+    rows = np.arange(pkg_len)[:, None]
+    depth = rows - truth[None, :]
+    data += np.where(depth >= 0, 20000 * np.exp(-depth / 25), 0)
+    data[:15] += 30000                                       # 发射余振
+    for _ in range(pings // 150):                            # 鱼群
+        x, y = rng.integers(0, pings - 40), rng.integers(60, 380)
+        w, h = rng.integers(5, 40), rng.integers(10, 40)
+        data[y:y + h, x:x + w] += rng.uniform(4000, 30000)
+    lost = np.zeros(pings, dtype=bool)
+    for _ in range(pings // 3000):                           # 丢失海底回波的片段
+        x = rng.integers(0, pings - 200)
+        lost[x:x + rng.integers(20, 200)] = True
+    data[:, lost] = rng.rayleigh(300, (pkg_len, int(lost.sum())))
+    for x in np.flatnonzero(np.diff(lost.astype(np.int8)) == 1) + 1:     # 丢失片段中深处的鱼群
+        y = rng.integers(450, 700)
+        data[y:y + 25, x + 10:x + 40] += 30000
+    truth[lost] = np.nan
+    return np.clip(data, 0, 65535).astype(np.uint16), truth
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pings', type=int, default=20000, help='ping number')
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per ping')
+    parser.add_argument('--chunk', type=int, default=20, help='pings per call (ping rate / frame rate)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 按chunk个ping一批增量处理，统计吞吐量（ping/s）与误差（实时输出与回填后的记录）；
+    # 并与不用先验深度、不做时间平滑与锁定的逐ping检测比较
+    opt = parse_opt()
+    data, truth = synthetic_pings(opt.pings, opt.pkg_len)
+    tracker = BottomTracker()
+    out, raw = [], []
+    t0 = time.perf_counter()
+    for first in range(0, opt.pings, opt.chunk):
+        out.append(tracker.push(data[:, first:first + opt.chunk], first))
+    elapsed = time.perf_counter() - t0
+    out = np.concatenate(out)
+    raw = np.concatenate([tracker.detect(data[:, f:f + opt.chunk]) for f in range(0, opt.pings, opt.chunk)])
+    has_bottom = ~np.isnan(truth)
+    for name, result in (('per-ping detection without prior', raw), ('tracked, live output', out),
+                         ('tracked, recorded (backfilled after lock)', tracker.history[:opt.pings])):
+        found = ~np.isnan(result)
+        error = np.abs(result - truth)[has_bottom & found]
+        print('%s: error mean %.2f bins, p99 %.1f bins, within 5 bins %.1f%%; bottom found on %.1f%% of pings '
+              'with bottom, false bottom on %.1f%% of pings without'
+              % (name, error.mean(), np.percentile(error, 99), (error <= 5).mean() * 100,
+                 found[has_bottom].mean() * 100, found[~has_bottom].mean() * 100))
+    print('%d pings x %d samples in chunks of %d: %.2f ms per chunk, %.0f pings/s'
+          % (opt.pings, opt.pkg_len, opt.chunk, elapsed / (opt.pings / opt.chunk) * 1000, opt.pings / elapsed))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        colorMap.py
+@Author：      wzj
+@Description:  查找表（LUT）着色：采样值 → 色阶index → BGR颜色。
+               色阶index = int((value - threshold) / denominator * levels)，value <= threshold时为0，与逐点着色的结果一致。
+               对uint16采样值，按当前threshold/denominator预先计算65536项的“采样值 → BGR”查找表，
+               之后每帧只需一次np.take即可完成整条新数据的着色；threshold/denominator变化时才重新计算查找表。
+               运行本文件可对比逐点着色与查找表着色的单帧耗时：python -m modules.colorMap
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+class ColorMap(object):
+    def __init__(self, color_bar, levels=16):
+        self.color_bar = color_bar          # index值到color的映射字典，共levels+1项（BGR）
+        self.levels = levels
+        self.color_lut = self._build_color_lut(color_bar, levels)
+        self.value_lut = None               # 采样值 → BGR，形状为(65536, 3)
+        self.value_lut_key = None           # 生成value_lut时的(threshold, denominator)
+
+    # 色阶查找表，形状为(levels+1, 3)。levels与color_bar的色阶数不同时（如256级）在相邻颜色间线性插值
+    @staticmethod
+    def _build_color_lut(color_bar, levels):
+        colors = np.array([color_bar[k] for k in sorted(color_bar)], dtype=np.float64)
+        if len(colors) == levels + 1:
+            return colors.astype(np.uint8)
+        src = np.linspace(0, 1, len(colors))
+        dst = np.linspace(0, 1, levels + 1)
+        lut = np.stack([np.interp(dst, src, colors[:, c]) for c in range(3)], axis=1)
+        return np.round(lut).astype(np.uint8)
+
+    # 采样值 → 色阶index
+    def quantize(self, data, threshold, denominator):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = (data.astype(np.float64) - threshold) / denominator * self.levels
+        index = np.zeros(data.shape, dtype=np.uint16)
+        above = data > threshold
+        index[above] = np.minimum(scaled[above], self.levels)
+        return index
+
+    # 对一段数据着色，data形状为(pkg_len, n)，返回(pkg_len, n, 3)的BGR图像；out不为None时直接写入out
+    def render(self, data, threshold, denominator, out=None):
+        if data.dtype == np.uint16:
+            key = (threshold, denominator)
+            if self.value_lut_key != key:
+                values = np.arange(65536, dtype=np.uint16)
+                self.value_lut = self.color_lut[self.quantize(values, threshold, denominator)]
+                self.value_lut_key = key
+            return np.take(self.value_lut, data, axis=0, out=out)
+        return np.take(self.color_lut, self.quantize(data, threshold, denominator), axis=0, out=out)
+
+
+# 逐点着色（原DecodeThread.run中的实现），仅用于正确性校验与性能对比
+def _render_loop(color_bar, data, threshold, denominator, img):
+    pkg_len, speed = data.shape
+    for i in range(speed):
+        for j in range(pkg_len):
+            if data[j, i] > threshold:
+                index = int((data[j, i] - threshold) / denominator * 16)
+            else:
+                index = 0
+            img[j, i, :] = color_bar[index]
+    return img
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per ping')
+    parser.add_argument('--speed', type=int, default=6, help='new columns per frame')
+    parser.add_argument('--gain', type=int, default=60, help='digital gain')
+    parser.add_argument('--frames', type=int, default=50, help='frame number')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    from modules.decodeThread import DecodeThread
+    from modules.framePool import FrameQueue
+
+    opt = parse_opt()
+    color_bar = DecodeThread(FrameQueue()).color_bar
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 4096, size=(opt.frames, opt.pkg_len, opt.speed), dtype=np.uint16)
+    max_value = int(frames.max())
+    denominator = max_value * opt.gain / 100
+    threshold = max_value - denominator
+
+    img = np.zeros((opt.pkg_len, opt.speed, 3), dtype=np.uint8)
+    t0 = time.perf_counter()
+    ref = [_render_loop(color_bar, f, threshold, denominator, img).copy() for f in frames]
+    t_loop = (time.perf_counter() - t0) / opt.frames
+
+    color_map = ColorMap(color_bar)
+    t0 = time.perf_counter()
+    color_map.render(frames[0], threshold, denominator)     # 生成查找表
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    out = [color_map.render(f, threshold, denominator) for f in frames]
+    t_lut = (time.perf_counter() - t0) / opt.frames
+
+    print('per-pixel loop: %.3f ms/frame' % (t_loop * 1000))
+    print('lookup table:   %.3f ms/frame (table build %.3f ms, once per gain change)' % (t_lut * 1000, t_build * 1000))
+    print('identical: %s, speedup: x%.0f' % (all(np.array_equal(a, b) for a, b in zip(ref, out)), t_loop / t_lut))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        dataCache.py
+@Author：      wzj
+@Description:  已解析txt数据的二进制缓存。
+               首次解析后在缓存目录写入一个紧凑的二进制文件，再次打开同一文件时直接内存映射（毫秒级），无需重新解析hex文本。
+               文件格式（小端）：
+                   [0:64]  文件头：magic、版本、pkg_len、行数、源文件大小、源文件mtime、源文件摘要
+                   [64:]   uint16采样矩阵，形状为(行数, pkg_len)，每个ping连续存放
+               源文件大小/mtime/摘要任一不一致时缓存自动失效；缓存目录总大小超过上限时，按最近使用时间淘汰旧文件。
+               写入失败或被中断时删除临时文件；进程被强制结束时残留的临时文件在下次淘汰时清理。
+@Created：     2026/10/18
+@Modified:
+"""
+
+import hashlib
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+
+CACHE_MAGIC = b'SBPC'
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.sbc'
+HEADER_FMT = '<4sHHIQQQ16s'         # magic, version, 保留, pkg_len, 行数, 源文件大小, 源文件mtime(ns), 摘要
+HEADER_SIZE = 64
+SAMPLE_BYTES = 2                    # 每个采样点为uint16
+DIGEST_BLOCK = 4096                 # 计算摘要时读取源文件首尾各4KB
+STALE_TMP_SECONDS = 3600            # 超过该时间未修改的临时文件视为残留（写入中的临时文件持续更新）
+
+
+# 源文件签名：(大小, mtime, 摘要)。摘要覆盖大小、mtime及文件首尾内容，防止mtime被保留的拷贝/覆盖漏检
+def source_signature(source):
+    st = os.stat(source)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(b'%d:%d' % (st.st_size, st.st_mtime_ns))
+    with open(source, 'rb') as f:
+        h.update(f.read(DIGEST_BLOCK))
+        if st.st_size > DIGEST_BLOCK:
+            f.seek(max(st.st_size - DIGEST_BLOCK, DIGEST_BLOCK))
+            h.update(f.read(DIGEST_BLOCK))
+    return st.st_size, st.st_mtime_ns, h.digest()
+
+
+# 删除文件，不存在或无法删除时忽略
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class DataCache(object):
+    def __init__(self, cache_dir=None, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir if cache_dir is not None else os.path.join(os.getcwd(), 'cache')
+        self.max_bytes = max_bytes      # 缓存目录大小上限（字节）
+
+    # 缓存文件路径：以源文件绝对路径的摘要命名
+    def sidecar_path(self, source):
+        key = hashlib.blake2b(os.path.abspath(source).encode('utf-8'), digest_size=12).hexdigest()
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.cache_dir, '%s_%s%s' % (name, key, CACHE_SUFFIX))
+
+    # 读取缓存，返回(pkg_len, data)，data为只读内存映射，形状为(行数, pkg_len)；缓存不存在或已失效时返回None
+    def load(self, source):
+        path = self.sidecar_path(source)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(HEADER_SIZE)
+            magic, version, _, pkg_len, line_num, size, mtime_ns, digest = \
+                struct.unpack(HEADER_FMT, header[:struct.calcsize(HEADER_FMT)])
+            expected = HEADER_SIZE + line_num * pkg_len * SAMPLE_BYTES
+            if magic != CACHE_MAGIC or version != CACHE_VERSION or os.path.getsize(path) != expected \
+                    or (size, mtime_ns, digest) != source_signature(source):
+                os.remove(path)
+                return None
+        except (OSError, struct.error):
+            return None
+
+        os.utime(path)      # 更新最近使用时间，供淘汰策略使用
+        if line_num == 0 or pkg_len == 0:
+            return pkg_len, np.zeros((line_num, pkg_len), dtype='<u2')
+        data = np.memmap(path, dtype='<u2', mode='r', offset=HEADER_SIZE, shape=(line_num, pkg_len))
+        return pkg_len, data
+
+    # 写入缓存。data形状为(pkg_len, 行数)，与DecodeThread中ping矩阵的排列一致
+    def save(self, source, data):
+        return self.save_blocks(source, data.shape[0], [data])
+
+    # 分块写入缓存，blocks依次产生形状为(pkg_len, n)的矩阵，内存占用只与块大小有关
+    # stop_event被置位时放弃写入，返回None
+    def save_blocks(self, source, pkg_len, blocks, stop_event=None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.sidecar_path(source)
+        signature = source_signature(source)
+
+        # 先写临时文件再改名，避免中途退出留下残缺缓存
+        tmp_path = '%s.%d.tmp' % (path, threading.get_ident())
+        line_num = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(b'\0' * HEADER_SIZE)
+                for data in blocks:
+                    if stop_event is not None and stop_event.is_set():
+                        raise InterruptedError
+                    f.write(np.ascontiguousarray(data[:pkg_len].T, dtype='<u2').tobytes())
+                    line_num += data.shape[1]
+                f.seek(0)
+                f.write(struct.pack(HEADER_FMT, CACHE_MAGIC, CACHE_VERSION, 0, pkg_len, line_num, *signature))
+            if source_signature(source) != signature:      # 写入期间源文件被修改
+                raise InterruptedError
+            os.replace(tmp_path, path)
+        except InterruptedError:
+            _remove(tmp_path)
+            return None
+        except BaseException:
+            _remove(tmp_path)       # 磁盘已满、数据块异常等：不留下临时文件，异常交给调用者
+            raise
+        self.evict(keep=path)
+        return path
+
+    # 淘汰：缓存目录总大小超过上限时，按最近使用时间从旧到新删除（keep指定的文件除外）；同时清理残留的临时文件
+    def evict(self, keep=None):
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith('.tmp') and CACHE_SUFFIX + '.' in name:
+                if now - st.st_mtime > STALE_TMP_SECONDS:
+                    _remove(path)
+                continue
+            if name.endswith(CACHE_SUFFIX):
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and os.path.samefile(path, keep):
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        decimatedColumns.py
+@Author：      wzj
+@Description:  快速浏览（×20、×100）的预池化显示列。快速浏览时一屏跨越width*decimation个ping（×100时14万个），
+               切换倍速、跳转时整屏重绘若从数据源重新读取并解析，hex文本需要数秒。
+               后台扫描本来就顺序读取整个文件，每个块顺带按各快速浏览倍数d做时间方向的max-pooling
+               （与DecodeThread.read_columns相同：第k列为[k*d, (k+1)*d)个ping的最大值），保存在内存中；
+               扫描经过的位置，整屏重绘只需切片，不再访问数据源。内存占用为pkg_len*ping数*2/d字节（每个倍数）。
+               运行本文件测试构建速度与整屏读取耗时：python -m modules.decimatedColumns
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+class DecimatedColumns(object):
+    def __init__(self, line_num, pkg_len, factors=(20, 100)):
+        self.line_num = line_num
+        self.pkg_len = pkg_len
+        self.factors = tuple(d for d in factors if d > 1)
+        self.data = {d: np.zeros((pkg_len, max(-(-line_num // d), 1)), dtype=np.uint16) for d in self.factors}
+        self.added_lines = 0        # 从文件开头起连续送入的ping数（后台扫描顺序送入）
+
+    # 送入一段数据，block形状为(pkg_len, n)，start为首个ping的下标
+    def add(self, start, block):
+        n = block.shape[1]
+        if n == 0:
+            return
+        block = block[:self.pkg_len]
+        for d in self.factors:
+            lo = start // d
+            firsts = np.arange((-start) % d, n, d)     # 列边界（ping下标为d的整数倍）在本段中的位置
+            if len(firsts) == 0 or firsts[0]:
+                firsts = np.concatenate(([0], firsts))
+            pooled = np.maximum.reduceat(block, firsts, axis=1)
+            cols = slice(lo, lo + pooled.shape[1])
+            rows = pooled.shape[0]
+            np.maximum(self.data[d][:rows, cols], pooled, out=self.data[d][:rows, cols])
+        if start <= self.added_lines:
+            self.added_lines = max(self.added_lines, start + n)
+
+    # 以d个ping为一列、从第first个ping起的columns列；first不是d的整数倍或尚未扫描到时返回None
+    def read(self, d, first, columns):
+        if d not in self.data or first % d:
+            return None
+        stop = min(first + columns * d, self.line_num)
+        if stop > self.added_lines and self.added_lines < self.line_num:
+            return None
+        out = np.zeros((self.pkg_len, columns), dtype=np.uint16)
+        lo = first // d
+        c0 = max(-lo, 0)
+        c1 = min(columns, self.data[d].shape[1] - lo)
+        if c1 > c0:
+            out[:, c0:c1] = self.data[d][:, lo + c0:lo + c1]
+        return out
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pings', type=int, default=200000, help='ping number')
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per ping')
+    parser.add_argument('--width', type=int, default=1400, help='screen columns')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 按1024个ping一块送入（与后台扫描相同），与逐屏读取后池化的结果比较，并统计整屏读取耗时
+    opt = parse_opt()
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 65536, size=(opt.pkg_len, opt.pings), dtype=np.uint16)
+    columns = DecimatedColumns(opt.pings, opt.pkg_len)
+    t0 = time.perf_counter()
+    for start in range(0, opt.pings, 1024):
+        columns.add(start, data[:, start:start + 1024])
+    build = time.perf_counter() - t0
+    for d in columns.factors:
+        count = min(opt.width, opt.pings // d)
+        first = (opt.pings // d - count) * d
+        t0 = time.perf_counter()
+        result = columns.read(d, first, opt.width)
+        elapsed = time.perf_counter() - t0
+        expected = data[:, first:first + count * d].reshape(opt.pkg_len, count, d).max(axis=2)
+        print('x%d: one screen (%d pings) in %.2f ms, identical: %s'
+              % (d, opt.width * d, elapsed * 1000, np.array_equal(result[:, :count], expected)))
+    print('build: %d pings in %.2f s (%.1f us per ping), memory %.1f MB'
+          % (opt.pings, build, build / opt.pings * 1e6, sum(v.nbytes for v in columns.data.values()) / 1e6))
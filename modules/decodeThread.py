@@ -18,36 +18,82 @@ import math
 
 from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from modules.logger import Logger
+from modules.dataCache import DataCache
+from modules.colorMap import ColorMap
+from modules.energyGate import EnergyGate
+from modules.bottomTracker import BottomTracker
+from modules.tvgGain import TvgGain
+from modules.overview import Overview
+from modules.decimatedColumns import DecimatedColumns
+from modules.pipelineControl import ThreadControl
+from modules.intensityStats import IntensityStats
+from modules.waterfall import Waterfall
+from modules.framePool import FramePool
+from modules.frameScheduler import FrameScheduler
+from modules.pingReader import PingReader, PingIndex, TextPingSource, CachePingSource
+from modules.pingBuffer import PingRingBuffer
+from modules.udpPortThread import is_live_source
 import numpy as np
 import cv2
 import os
+import threading
 import time
 import math
 
+DECIMATE_CHUNK = 16384                  # 快速浏览时每次读取并池化的ping数，限制临时内存
+
 
 class DecodeThread(QThread):
     send_msg = pyqtSignal(str)          # 状态栏更新、打印日志等
     send_percent = pyqtSignal(int)      # 播放进度
     send_fps = pyqtSignal(str)          # fps
+    send_overview = pyqtSignal(np.ndarray)  # 整个文件的缩略回波图（BGR），显示在进度条上方
 
     def __init__(self, img_queue):
         super(DecodeThread, self).__init__()
         self.source = '0'
         self.screen_size = [800, 1400]          # [height, width]
         self.pkg_len = 0                        # 包长度
-        self.raw_img = np.full((800, 1400, 3), [65,65,65], dtype=np.uint8)
-        self.current_path = '0'                 # 已缓存的原始数据路径
-        self.data_tmp_buffer = np.zeros((800, 20000), dtype=np.int16)    # 原始数据缓存
-        self.total_line_num = 0                 # 数据缓存中有效列数
+        self.waterfall = Waterfall(*self.screen_size)  # 环形缓冲区瀑布图，新列写在写指针处，无需整幅左移
+        self.screen_raw = Waterfall(*self.screen_size, background=0, dtype=np.uint16)  # 屏幕各列的原始强度（TVG之前）
+        self.raw_key = None                     # screen_raw对应的(数据源, 实时, 屏幕右端, 每列ping数, pkg_len)
+        self.energy_gate = EnergyGate(self.screen_size[1])     # 新列是否可能含目标，检测线程据此跳过推理
+        self.bottom_tracker = BottomTracker(self.screen_size[1])   # 逐ping的海底深度，供门控、检测、显示与导出
+        self.current_path = '0'                 # 已打开的原始数据路径
+        self.data_cache = DataCache()           # 已解析数据的二进制缓存
+        self.scan_thread = None                 # 后台扫描线程（强度统计、生成缓存）
+        self.scan_stop_event = threading.Event()
+        self.stats = IntensityStats()           # 强度统计，加载时计算一次，调节增益时只重新缩放
+        self.gain_mode = 'max'                  # 增益参考值：'max'全局最大值/'percentile'百分位数/'window'当前屏幕最大值
+        self.gain_percentile = 99.9
+        self.reader = None                      # 流式读取器，只在内存中保留播放位置附近的ping
+        self.ping_buffer = PingRingBuffer(self.screen_size[0])     # 实时数据的ping环形缓冲区，由UDP接收线程写入
+        self.live = False                       # 当前数据源是否为实时数据
+        self.live_skipped_num = 0               # 实时数据：一帧内到达超过一屏时未渲染的ping数
+        self.window_behind = 2 * self.screen_size[1]    # 播放位置之前保留的列数
+        self.window_ahead = 3 * self.screen_size[1]     # 播放位置之后预读的列数
+        self.total_line_num = 0                 # 数据文件中有效列数
         self.percent_length = 0                 # 进度条
         self.total_line_num_dec_percent = 0     # 总列数的1/percent_length（为加快计算速度而单独拎出来）
-        self.jump_out = False
-        self.is_continue = True
+        self.control = ThreadControl()          # 暂停/继续/停止
+        self.frame_interval = 0.05              # 帧间隔（秒）
+        self.scheduler = FrameScheduler(self.frame_interval, self.control)     # 按截止时刻出帧，统计抖动与超时
+        self.ping_rate = 40.0                   # 记录的ping速率（ping/s），回放按此速率乘以倍速推进
+        self.play_pos = 0.0                     # 回放时间轴上的位置（ping，含不足一列的小数部分）
         self.gain = 60                          # 数字增益
-        self.speed = 2                          # 控制帧速，1表示x轴方向每帧前进1像素，以此类推
-        self.new_line_num = 0                   # 下一帧图片是当前帧左移self.speed行，再用新数据填充最后self.speed行。
+        self.tvg = TvgGain()                    # 时变增益/吸收补偿，吸收系数由界面的吸收滑块设置
+        self.rendered_key = None                # 屏幕上图像所用的着色参数，变化时从原始数据整屏重绘
+        self.rendered_reference = None          # 屏幕上图像所用的增益参考值，新列沿用，保证同一屏幕亮度尺度一致
+        self.reference_tolerance = 0.05         # 参考值相对变化超过该比例时整屏重绘
+        self.render_pending = False             # 跳转等需要整屏重绘的请求
+        self.window_end = 0                     # 屏幕最右一列之后的ping下标
+        self.speed = 1                          # 回放倍速，1表示按记录的ping速率回放
+        self.decimation = 1                     # 快速浏览：每个显示列由decimation个ping取最大值合并（仅回放）
+        self.detect_decimated = True            # 快速浏览时是否对降采样后的画面做目标检测
+        self.new_line_num = 0                   # 下一帧图片是当前帧左移若干列，再用新数据填充最后若干列。
                                                 # self.new_line_num为新数据第一行在的self.data_tmp_buffer中的行号
-        self.img_queue = img_queue
+        self.img_queue = img_queue              # FrameQueue，有界
+        self.frame_pool = FramePool(img_queue.maxsize + 2, (*self.screen_size, 3))   # 队列容量+生产者、消费者各占用一帧
         self.color_bar = {                      # index值到color的映射字典（index=data/20），注意：排序为BGR
                                                 # Ref >> https://www.sioe.cn/yingyong/yanse-rgb-16/
             0: (112, 25, 25),       # 午夜蓝
@@ -68,35 +114,239 @@ class DecodeThread(QThread):
             15: (0, 0, 128),         # 栗色
             16: (0, 0, 50)          # max
         }
+        self.color_map = ColorMap(self.color_bar)       # 查找表着色
+        self.overview = None                            # 缩略回波图，后台扫描时逐块构建
+        self.overview_color_map = ColorMap(self.color_bar)  # 缩略图单独着色，不与主画面争用查找表缓存
+        self.overview_lock = threading.Lock()
+        self.overview_interval = 0.5                    # 构建过程中刷新缩略图的间隔（秒）
+        self.fast_decimations = (20, 100)               # 后台扫描时预池化的快速浏览倍数（见DecimatedColumns）
+        self.decimated = None
+        self.preview_pings = 4                          # 扫描尚未到达时每列预览读取的ping数（见read_preview）
+        self.preview_end = None                         # 当前屏幕为预览时的屏幕右端
 
-    # 将数据文件加载至内存
-    def load_data_to_mem(self):
-        with open(self.source, 'r') as f:
-            lines = f.readlines()
-            if len(lines) < 20000:      # 最多缓存20000行
-                self.total_line_num = len(lines) - 1
-            else:
-                self.total_line_num = 19999
-        self.total_line_num_dec_percent = math.floor(self.total_line_num/self.percent_length)
+    # 打开数据文件：有有效缓存时内存映射缓存，否则流式读取hex文本
+    def open_data_file(self):
+        self.send_msg.emit('decode_thread >> 数据加载中：0%')
+        if self.reader is not None:
+            self.reader.close()
+        self.scan_stop_event.set()
+        self.stats = IntensityStats()
+        self.bottom_tracker.reset(history=True)
+        self.raw_key = None
+
+        cached = self.data_cache.load(self.source)
+        if cached is not None:
+            source = CachePingSource(*cached)
+            scan_source = source
+        else:
+            index = PingIndex(self.source)      # 行偏移索引，已保存在数据文件旁时无需重新扫描
+            source = TextPingSource(self.source, index=index)
+            scan_source = TextPingSource(self.source, index=index)
+        self.reader = PingReader(source, self.window_behind, self.window_ahead, on_block=self.stats.add,
+                                 on_error=self.read_error)
+        self.pkg_len = min(self.reader.pkg_len, self.screen_size[0])
+        self.total_line_num = self.reader.total_line_num
+        self.total_line_num_dec_percent = max(math.floor(self.total_line_num/self.percent_length), 1)
+
+        # 缩略回波图：数据文件旁有缓存时直接显示，否则在后台扫描时构建
+        self.overview = Overview.load(self.source, self.total_line_num, self.reader.pkg_len, self.percent_length)
+        if self.overview is None:
+            self.overview = Overview(self.total_line_num, self.reader.pkg_len, self.percent_length)
+        self.emit_overview()
 
-        for i in range(self.total_line_num):
-            if i == 0:
-                self.send_msg.emit('decode_thread >> 数据加载中：0%')
-            elif i % math.floor(self.total_line_num/10) == 0:
-                tmp = int(i*10 / math.floor(self.total_line_num/10))
-                self.send_msg.emit('decode_thread >> 数据加载中：' + str(tmp) + '%')
+        # 后台逐块扫描整个文件：统计强度、构建缩略图与快速浏览的预池化列，并在没有缓存时生成缓存
+        self.decimated = DecimatedColumns(self.total_line_num, self.pkg_len, self.fast_decimations)
+        self.scan_stop_event = threading.Event()
+        self.scan_thread = threading.Thread(target=self.scan_data_file, daemon=True,
+                                            args=(self.source, scan_source, cached is None, self.stats,
+                                                  self.overview, self.decimated, self.scan_stop_event))
+        self.scan_thread.start()
+        self.send_msg.emit('decode_thread >> 数据加载中：100%')
 
-            line_str = lines[i]
-            self.pkg_len = int(line_str[14:16], 16)*256 + int(line_str[12:14], 16)      # 大小端反转
+    # 读取器首次读取失败（文件损坏、磁盘错误）：提示一次，失败的块显示为空白，回放继续
+    def read_error(self, block, error):
+        self.send_msg.emit('decode_thread >> 第%d块数据读取失败，显示为空白：%s' % (block, error))
 
-            for j in range(self.pkg_len):
-                self.data_tmp_buffer[j,i] = int(line_str[18+j*4:20+j*4], 16)*256 + int(line_str[16+j*4:18+j*4], 16)
+    # 后台扫描线程：统计强度、构建缩略图；build_cache为True时同时生成二进制缓存，下次打开同一文件时直接内存映射
+    def scan_data_file(self, path, source, build_cache, stats, overview, decimated, stop_event):
+        last_emit = time.perf_counter()
+
+        def blocks():
+            nonlocal last_emit
+            for block in range(source.block_num):
+                if stop_event.is_set():
+                    return
+                data = source.read_block(block)
+                stats.add(block * source.block_lines, data)
+                decimated.add(block * source.block_lines, data)
+                if self.preview_end is not None and decimated is self.decimated \
+                        and decimated.added_lines >= min(self.preview_end, self.total_line_num):
+                    self.preview_end = None
+                    self.raw_key = None
+                    self.request_render()
+                if not overview.complete:
+                    overview.add(block * source.block_lines, data)
+                    if time.perf_counter() - last_emit >= self.overview_interval:
+                        self.emit_overview(overview)        # 构建过程中逐步显示
+                        last_emit = time.perf_counter()
+                yield data
+
+        try:
+            if build_cache:
+                self.data_cache.save_blocks(path, source.pkg_len, blocks(), stop_event)
+            else:
+                for _ in blocks():
+                    pass
+            if not overview.complete and not stop_event.is_set():
+                overview.complete = True
+                overview.save(path)
+                self.emit_overview(overview)
+        except (OSError, ValueError) as e:
+            self.send_msg.emit('decode_thread >> 数据扫描失败：%s' % e)
 
-        print('max:' + str(np.max(self.data_tmp_buffer)))
+    # 按当前增益着色并发送缩略图；overview不是当前文件的缩略图时（已切换文件）不发送
+    def emit_overview(self, overview=None):
+        overview = overview if overview is not None else self.overview
+        if overview is None or overview is not self.overview:
+            return
+        with self.overview_lock:
+            img = overview.render(self.overview_color_map, self.gain)
+        self.send_overview.emit(img)
 
     def progress_slider_changed(self, x):
-        self.new_line_num = self.total_line_num_dec_percent * x + 1399
-        print('progress_slider_changed: self.new_line_num: ' + str(self.new_line_num))
+        self.new_line_num = self.total_line_num_dec_percent * x + self.screen_size[1] * self.column_pings - 1
+        self.window_end = self.align(self.new_line_num)
+        self.play_pos = self.window_end
+        if self.reader is not None:
+            self.reader.set_playhead(self.new_line_num)     # 立即预读目标屏幕所需的ping
+        self.request_render()
+
+    # 每个显示列对应的ping数；实时数据不降采样
+    @property
+    def column_pings(self):
+        return 1 if self.live else self.decimation
+
+    # 设置快速浏览倍数，屏幕按新的时间尺度整屏重绘
+    def set_decimation(self, decimation):
+        self.decimation = max(int(decimation), 1)
+        self.window_end = self.align(self.window_end)
+        self.request_render()
+
+    # 快速浏览时屏幕右端对齐到每列ping数的整数倍，与预池化的列（DecimatedColumns）一致
+    def align(self, line):
+        return line - line % self.column_pings
+
+    # 读取从first起columns个显示列的数据：每column_pings个ping取最大值（max-pooling，细小目标不会被抽掉）。
+    # 快速浏览时后台扫描已经过的位置直接取预池化的列；否则绕过块缓存直接从数据源读取
+    # （一屏跨越的ping数远超缓存窗口，经过块缓存只会反复淘汰），分段读取以限制临时内存。
+    # 返回形状为(pkg_len, columns)的uint16矩阵（预池化时行数为屏幕显示的pkg_len）
+    def read_columns(self, first, columns):
+        d = self.column_pings
+        if d == 1:
+            return self.reader.read(first, columns)
+        if self.decimated is not None:
+            out = self.decimated.read(d, first, columns)
+            if out is not None:
+                return out
+        out = np.empty((self.reader.pkg_len, columns), dtype=np.uint16)
+        step = max(DECIMATE_CHUNK // d, 1)
+        for c in range(0, columns, step):
+            n = min(step, columns - c)
+            raw = self.reader.read_direct(first + c * d, n * d)
+            out[:, c:c + n] = raw.reshape(raw.shape[0], n, d).max(axis=2)
+        return out
+
+    # 快速浏览时后台扫描尚未到达的位置：每列只读开头附近的preview_pings个ping（逐列定位读取），
+    # 切换倍速、跳转时不必解析整屏跨越的全部ping；扫描经过后整屏重绘为max-pooling的精确结果
+    def read_preview(self, first, columns):
+        d = self.column_pings
+        out = np.zeros((self.reader.pkg_len, columns), dtype=np.uint16)
+        for c in range(columns):
+            start = first + c * d
+            if 0 <= start < self.total_line_num:
+                raw = self.reader.read_near(start, min(self.preview_pings, d))
+                if raw.shape[1]:
+                    out[:, c] = raw.max(axis=1)
+        return out
+
+    # 当前数据的TVG增益向量，未开启时为None
+    def tvg_vector(self):
+        return self.tvg.vector(self.pkg_len) if self.tvg.enabled and self.pkg_len else None
+
+    # 影响着色的参数，任一变化时整屏重绘
+    def render_key(self):
+        return (self.column_pings, self.gain, self.gain_mode, self.gain_percentile, self.tvg.spreading, self.tvg.absorption,
+                self.tvg.range_per_bin, self.tvg.min_range, id(self.color_map), self.color_map.levels)
+
+    # 请求整屏重绘：播放中在下一帧完成，暂停中立即唤醒线程重绘当前屏幕
+    def request_render(self):
+        self.render_pending = True
+        self.control.wake()
+
+    # 屏幕右端为end时的增益参考值
+    def gain_reference(self, end):
+        return self.stats.reference(self.gain_mode, self.gain_percentile,
+                                    end - self.screen_size[1] * self.column_pings, end, self.tvg_vector())
+
+    # 参考值对应的阈值与分母
+    def gain_params(self, reference):
+        denominator = reference * self.gain / 100  # 阈值为max的一定比例
+        return reference - denominator, denominator
+
+    # 参考值（后台扫描中增长的全局最大值/百分位数、随屏幕滑动的窗口最大值）相对屏幕所用的值变化超过容差
+    def reference_drifted(self, reference):
+        rendered = self.rendered_reference
+        return rendered is None or abs(reference - rendered) > self.reference_tolerance * max(rendered, 1)
+
+    # 从原始数据一次性重绘右端为end的整屏（TVG、查表着色均为整块矩阵运算），不逐列回放。
+    # 屏幕位置与时间尺度不变（只改变增益、TVG、色表）时从screen_raw重绘，不再读取数据
+    def render_window(self, end):
+        width = self.screen_size[1]
+        key = (self.source, self.live, end, self.column_pings, self.pkg_len)
+        if key == self.raw_key:
+            raw = self.screen_raw.view()[:self.pkg_len]
+        elif self.live:
+            raw = self.ping_buffer.read(end - width, width)
+        elif self.reader is not None:
+            d = self.column_pings
+            first = end - width * d
+            self.preview_end = None
+            if d == 1:
+                raw = self.reader.read(first, width)
+            elif self.decimated is not None:
+                raw = self.decimated.read(d, first, width)
+            else:
+                raw = None
+            if raw is None:
+                raw = self.read_preview(first, width)
+                self.preview_end = end      # 后台扫描经过end后重绘为精确结果（见scan_data_file）
+        else:
+            return
+        if key != self.raw_key:
+            self.screen_raw.overwrite(self.pkg_len)[:] = raw[:self.pkg_len]
+            self.raw_key = key
+        self.rendered_reference = self.gain_reference(end)
+        threshold, denominator = self.gain_params(self.rendered_reference)
+        self.rendered_key = self.render_key()
+        self.render_pending = False
+        strip = self.tvg.apply(raw[:self.pkg_len])
+        bottom = self.bottom_tracker.overwrite(strip, end - raw.shape[1] * self.column_pings, self.column_pings)
+        self.energy_gate.overwrite(strip, threshold, denominator, bottom)
+        self.color_map.render(strip, threshold, denominator, out=self.waterfall.overwrite(self.pkg_len))
+
+    # 按时间顺序拼接到预分配的帧缓冲中（每帧一次拷贝），放入队列后不再被修改
+    def emit_frame(self, index):
+        self.frame_pool.grow(self.img_queue.maxsize + 2)    # 微批处理时队列容量会扩大（见YoloDetThread.set_batch）
+        frame = self.frame_pool.acquire(timeout=self.frame_interval)
+        if frame is not None:
+            self.waterfall.view(out=frame.data)
+            frame.index = index
+            frame.generation, frame.column = self.waterfall.generation, self.waterfall.column
+            frame.key = (self.source, index, self.render_key(), self.rendered_reference)
+            frame.energy_column = self.energy_gate.energy_column
+            frame.bottom[:] = self.bottom_tracker.screen
+            frame.detect = self.decimation == 1 or self.live or self.detect_decimated
+            self.img_queue.put(frame, timeout=self.frame_interval)
 
     # run函数
     def run(self):
@@ -104,53 +354,134 @@ class DecodeThread(QThread):
         if self.source.lower().endswith(".txt"):
             if self.current_path != self.source:
                 self.current_path = self.source
-                self.load_data_to_mem()
+                self.open_data_file()
                 file_name = os.path.split(os.path.splitext(self.source)[0])[-1] + os.path.splitext(self.source)[-1]    # 获取不带路径的文件名
                 self.send_msg.emit('decode_thread >> 历史文件回放中：' + file_name)
+            self.live = False
+        elif is_live_source(self.source):
+            if self.current_path != self.source:
+                self.current_path = self.source
+                self.stats = IntensityStats(capacity=self.ping_buffer.capacity)    # 只统计环形缓冲中保留的ping
+                self.bottom_tracker.reset(history=True)
+                self.new_line_num = self.ping_buffer.head
+                self.live_skipped_num = 0
+            self.live = True
+            self.send_msg.emit('decode_thread >> 实时数据：' + self.source)
 
         try:
             count = 0
+            last_percent = -1
             start_time = time.time()
+            if not self.live:
+                self.window_end = self.align(self.new_line_num)
+                self.play_pos = self.window_end
+            self.scheduler.interval = self.frame_interval
+            self.scheduler.reset()
 
             while True:
-                if self.jump_out:
-                    if hasattr(self, 'out'):
-                        self.out.release()
+                # 暂停时阻塞在条件变量上（不占用CPU）；帧间等待可被停止请求打断
+                if not self.control.wait_running():
                     break
+                if self.control.paused:
+                    # 暂停中调节增益或跳转：只重绘当前屏幕
+                    self.render_window(self.window_end)
+                    self.emit_frame(self.window_end)
+                    continue
+                # 等待到下一个截止时刻；上一帧超时时ticks > 1，回放位置一次追赶ticks帧
+                ticks = self.scheduler.wait()
+                if not ticks:
+                    break
+                # 着色参数变化或跳转后需要整屏重绘（即使本帧没有新数据）
+                rerender = self.render_pending or self.render_key() != self.rendered_key
 
-                if self.is_continue:
-                    self.msleep(50)
-                    if self.new_line_num + self.speed < self.total_line_num:
-                        self.new_line_num += self.speed
-                        if self.new_line_num % self.total_line_num_dec_percent == 0:
-                            self.send_percent.emit(int(self.new_line_num / self.total_line_num_dec_percent))
+                if self.live:
+                    # 实时数据：渲染上一帧之后新到达的全部ping（最多一屏），没有新数据时不出帧
+                    head = self.ping_buffer.head
+                    if head == 0 or (head <= self.new_line_num and not rerender):
+                        continue
+                    length = min(max(head - self.new_line_num, 0), self.screen_size[1])
+                    self.live_skipped_num += head - self.new_line_num - length
+                    first = head - length
+                    self.new_line_num = head
+                    new_data = self.ping_buffer.read(first, length)
+                    self.pkg_len = min(self.ping_buffer.pkg_len, self.screen_size[0])
+                    self.stats.add(first, new_data)
+                else:
+                    # 回放位置按记录速率*倍速随真实时间推进，不足一列（decimation个ping）的部分留到下一帧；
+                    # 快速浏览时每列合并decimation个ping，每帧显示的列数不随倍速增长（显示开销恒定）
+                    d = self.decimation
+                    self.play_pos = max(self.play_pos, self.window_end) \
+                        + ticks * self.frame_interval * self.ping_rate * self.speed
+                    columns = min(int(self.play_pos - self.window_end) // d, self.screen_size[1])
+                    if columns == 0 and not rerender:
+                        continue
+                    first, length = self.window_end, columns * d
+                    if first + length < self.total_line_num:
+                        self.new_line_num = first
+                        percent = self.new_line_num // self.total_line_num_dec_percent
+                        if percent != last_percent:
+                            self.send_percent.emit(int(percent))
+                            last_percent = percent
                     else:
                         self.new_line_num = 0
                         self.send_percent.emit(self.percent_length)
                         break
+                    if d == 1:
+                        self.reader.set_playhead(first)     # 快速浏览不经过块缓存，无需预读
+                    new_data = self.read_columns(first, columns)
+                self.window_end = first + length
+                # screen_raw与瀑布图同步平移；推入前已与右端为first的屏幕一致时，推入后仍与当前屏幕一致
+                contiguous = self.raw_key == (self.source, self.live, first, self.column_pings, self.pkg_len)
+                self.screen_raw.push(new_data[:self.pkg_len])
+                self.raw_key = (self.source, self.live, self.window_end, self.column_pings, self.pkg_len) \
+                    if contiguous else None
+                # 参考值变化超过容差时整屏重绘；否则新列沿用屏幕上的参考值，同一屏幕不混用两种亮度尺度
+                rerender = rerender or self.reference_drifted(self.gain_reference(self.window_end))
+
+                if rerender:
+                    # 着色参数变化、跳转或参考值漂移：整屏重绘，本帧即生效
+                    self.render_window(self.window_end)
+                else:
+                    # 整段新数据先乘TVG增益向量，再一次查表着色，写入瀑布图写指针处
+                    threshold, denominator = self.gain_params(self.rendered_reference)
+                    strip = self.tvg.apply(new_data[:self.pkg_len])
+                    bottom = self.bottom_tracker.push(strip, first, self.column_pings)
+                    self.energy_gate.push(strip, threshold, denominator, bottom)
+                    self.waterfall.push(self.color_map.render(strip, threshold, denominator))
+                self.emit_frame(self.window_end)
+                # print('decode_thread.run() >> 当前队列长度 %d\n' % self.img_queue.qsize())
+                count += 1
+                if count % 10 == 0 and count >= 10:
+                    fps = int(10 / (time.time() - start_time))
+                    counters = self.img_queue.counters()
+                    timing = self.scheduler.counters()
+                    msg = 'FPS: %d ' % fps
+                    if counters['dropped'] or counters['aged']:
+                        msg += '丢帧: %d 超时: %d ' % (counters['dropped'], counters['aged'])
+                    if timing['overrun']:
+                        msg += '抖动: %.0f ms 追赶: %d ' % (timing['jitter_p99'], timing['dropped'])
+                    self.send_fps.emit(msg)
+                    start_time = time.time()
 
-                    denominator = np.max(self.data_tmp_buffer) * self.gain / 100  # 阈值为max的一定比例
-                    threshold = np.max(self.data_tmp_buffer) - denominator
-
-                    # 将raw_img左移
-                    self.raw_img[:, :1399-self.speed, :] = self.raw_img[:, self.speed:1399, :]
-                    # 填充末尾行
-                    for i in range(self.new_line_num, self.new_line_num+self.speed):
-                        # print('i=' + str(i) + ',  new_line_num=' + str(self.new_line_num))
-                        for j in range(self.pkg_len):
-                            if self.data_tmp_buffer[j, i] > threshold:
-                                index = int((self.data_tmp_buffer[j, i] - threshold) / denominator * 16)
-                            else:
-                                index = 0
-                            self.raw_img[j, i-self.new_line_num+1399-self.speed, :] = self.color_bar[index]
-
-                    self.img_queue.put(self.raw_img)
-                    # print('decode_thread.run() >> 当前队列长度 %d\n' % self.img_queue.qsize())
-                    count += 1
-                    if count % 10 == 0 and count >= 10:
-                        fps = int(10 / (time.time() - start_time))
-                        self.send_fps.emit('FPS: ' + str(fps) + ' ')
-                        start_time = time.time()
+            if hasattr(self, 'out'):
+                self.out.release()
 
         except Exception as e:
             self.send_msg.emit('decode_thread.run() >> %s' % e)
+
+        latency = self.control.stopped()
+        if latency is not None:
+            self.send_msg.emit('decode_thread >> 已停止，停止延迟：%.1f ms' % latency)
+
+    # 导出已处理部分的海底深度（CSV），返回导出的ping数
+    def export_bottom(self, path):
+        return self.bottom_tracker.export_csv(path, self.tvg.range_per_bin)
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def stop(self):
+        self.control.stop()
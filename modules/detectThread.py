@@ -15,15 +15,22 @@ import numpy as np
 import torch
 import torch.backends.cudnn as cudnn
 import os
+import queue
 import time
 import cv2
 from models.experimental import attempt_load
-from YoLoV5.datasets import LoadImages, LoadWebcam
-from YoLoV5.general import check_img_size, check_imshow, non_max_suppression, \
-    scale_coords
+from YoLoV5.general import check_img_size, non_max_suppression, scale_coords
 # from YoLoV5.plots import colors, plot_one_box, plot_one_box_PIL
 from YoLoV5.plots import Annotator, colors
 from YoLoV5.torch_utils import select_device
+from modules.bottomTracker import above_bottom, draw_bottom
+from modules.energyGate import gate_decision, shift_boxes
+from modules.fishTracker import FishTracker
+from modules.frameBatcher import FrameBatcher
+from modules.framePreprocessor import FramePreprocessor
+from modules.pipelineControl import ThreadControl
+from modules.predictionCache import PredictionCache
+from modules.stripDetector import StripDetector
 
 
 # 目标检测线程（based on YoloV5）
@@ -43,31 +50,103 @@ class YoloDetThread(QThread):
         self.source = '0'
         self.conf_thres = 0.25
         self.iou_thres = 0.45
-        self.jump_out = False                   # jump out of the loop
-        self.is_continue = True                 # continue/pause
+        self.control = ThreadControl()          # continue/pause/stop
+        self.control.add_waker(self.wake)
+        self.queue_timeout = 0.5                # 等待队列的最长时间（秒）
         self.percent_length = 1000              # progress bar
         self.save_fold = None                   # './result' 为节省磁盘空间，先不连续保存，改为通过cutButton触发单次保存
         self.img_queue = img_queue
         self.cnt_get_from_queue = 0
+        self.preprocessor = None                # 瀑布图 → 模型输入（预分配的NCHW张量）
+        self.imgsz = 640                        # 推理尺寸（长边，像素），CPU较慢时可减小
+        self.detect_every = 1                   # 每几帧推理一次（按推理耗时与出帧间隔自适应）
+        self.batcher = FrameBatcher(img_queue)  # 微批处理，默认batch_size=1（逐帧推理）
+        self.queue_size = img_queue.maxsize     # 逐帧推理时的帧队列容量，微批处理时按批大小扩大
+        self.incremental = False                # 增量检测：只对瀑布图新滚入的条带推理（逐帧按顺序，不合批）
+        self.strip_detector = None
+        self.prediction_cache = PredictionCache()   # 模型原始输出（NMS之前）的LRU缓存，调节阈值时只重做NMS
+        self.nms_pending = False                # 阈值已变化，当前画面待重新检测
+        self.last_item = None                   # 最近检测的一帧，供阈值变化时重新检测
+        self.tracker = FishTracker()            # NMS之后的多目标跟踪：持久编号与累计数量
+        self.energy_gating = True               # 能量门控：新滚入的列没有回波时不推理
+        self.gate_view = None                   # 上一检测帧的(generation, column)
+        self.gate_counts = {None: 0, 'empty': 0, 'shift': 0}    # 门控决策的次数（None为推理）
+        self.last_det = None                    # 上一检测帧的结果与column，门控跳过时左移沿用
+        self.last_det_column = 0
+
+    # 加载模型，返回模型、步长、类别名与（按步长取整后的）推理尺寸
+    def load_model(self, device, imgsz, half):
+        model = attempt_load(self.weights, map_location=device)  # load FP32 model
+        stride = int(model.stride.max())  # model stride
+        imgsz = check_img_size(imgsz, s=stride)  # check image size
+        names = model.module.names if hasattr(model, 'module') else model.names  # get class names
+        if half:
+            model.half()  # to FP16
+        if device.type != 'cpu':
+            model(torch.zeros(1, 3, imgsz, imgsz).to(device).type_as(next(model.parameters())))  # run once
+        self.current_weight = self.weights
+        self.preprocessor = None    # 换模型后步长可能不同，输入张量重新分配
+        self.tracker.reset()        # 类别可能不同，轨迹与累计数量从零开始
+        self.gate_view = None       # 下一帧推理，不沿用旧模型的结果
+        self.strip_detector = StripDetector(model, stride, imgsz, device=device,
+                                            dtype=torch.float16 if half else torch.float32)
+        return model, stride, names, imgsz
+
+    # 瀑布图（BGR，HWC）→ 模型输入张量的第index个位置。瀑布图尺寸固定，预处理器（缩放几何与输入张量）
+    # 只在首帧或换模型、改尺寸、改批大小后构造一次
+    def preprocess(self, im0, imgsz, stride, device, half, index=0):
+        dtype = torch.float16 if half else torch.float32
+        batch = self.batcher.batch_size
+        if index == 0 and (self.preprocessor is None
+                           or not self.preprocessor.matches(im0, imgsz, stride, dtype, batch)):
+            self.preprocessor = FramePreprocessor(im0.shape, imgsz, stride, dtype, device, batch)
+        return self.preprocessor(im0, index)
+
+    # 置信度/IoU阈值变化后调用：唤醒线程，当前画面立即按新阈值重新检测（暂停或没有新帧时也生效）
+    def request_nms(self):
+        self.nms_pending = True
+        self.control.wake()
+        self.wake()
+
+    # 开启/关闭增量检测，开启时从整帧检测重新开始
+    def set_incremental(self, enabled):
+        if enabled and self.strip_detector is not None:
+            self.strip_detector.reset()
+        self.incremental = enabled
+
+    # 开启/关闭能量门控
+    def set_energy_gating(self, enabled):
+        self.energy_gating = enabled
+
+    # 能量门控（见EnergyGate）：返回None（推理）、'empty'（屏幕上没有回波）或'shift'（沿用上一帧的结果左移），
+    # 并记录本帧供下一帧比较。参数为帧归还帧缓冲前复制的元数据
+    def gate(self, energy_column, generation, column, width):
+        last, self.gate_view = self.gate_view, (generation, column)
+        decision = gate_decision(energy_column, generation, column, width, last) if self.energy_gating else None
+        self.gate_counts[decision] += 1
+        return decision
+
+    # 开启/关闭微批处理：最多batch_size帧或自第一帧起最多等待timeout秒合并为一次推理，batch_size=1为逐帧推理。
+    # 帧队列容量扩大到不小于batch_size，推理期间到达的帧留在队列中凑成下一批，而不是被队列丢弃
+    # （解析线程按队列容量扩充帧缓冲池，见DecodeThread.emit_frame）；恢复逐帧推理时容量复原，延迟不变
+    def set_batch(self, batch_size, timeout=0.02):
+        self.batcher.batch_size = max(int(batch_size), 1)
+        self.batcher.timeout = timeout
+        self.img_queue.resize(max(self.batcher.batch_size, self.queue_size))
+
+    # 推理比出帧慢时，每detect_every帧推理一次，其余帧只显示原图，原图显示保持解析线程的帧率
+    # infer_time为最近一次推理耗时，frame_interval为实测的出帧间隔（秒）
+    def update_detect_every(self, infer_time, frame_interval):
+        if frame_interval > 0:
+            self.detect_every = max(int(np.ceil(infer_time / frame_interval)), 1)
 
     @torch.no_grad()
     def run(self,
-            imgsz=640,  # inference size (pixels)
             max_det=1000,  # maximum detections per image
             device='',  # cuda device, i.e. 0 or 0,1,2,3 or cpu
-            view_img=True,  # show results
-            save_txt=False,  # save results to *.txt
-            save_conf=False,  # save confidences in --save-txt labels
-            save_crop=False,  # save cropped prediction boxes
-            nosave=False,  # do not save images/videos
             classes=None,  # filter by class: --class 0, or --class 0 2 3
             agnostic_nms=False,  # class-agnostic NMS
             augment=False,  # augmented inference
-            visualize=False,  # visualize features
-            update=False,  # update all models
-            project='runs/detect',  # save results to project/name
-            name='exp',  # save results to project/name
-            exist_ok=False,  # existing project/name ok, do not increment
             line_thickness=3,  # bounding box thickness (pixels)
             hide_labels=False,  # hide labels
             hide_conf=False,  # hide confidences
@@ -78,148 +157,226 @@ class YoloDetThread(QThread):
         try:
             device = select_device(device)
             half &= device.type != 'cpu'  # half precision only supported on CUDA
+            cudnn.benchmark = True  # 瀑布图尺寸固定，可让cudnn选择最快的卷积算法
+            imgsz = self.imgsz
+            model, stride, names, imgsz = self.load_model(device, imgsz, half)
 
-            # Load model
-            model = attempt_load(self.weights, map_location=device)  # load FP32 model
-            num_params = 0
-            for param in model.parameters():
-                num_params += param.numel()
-            stride = int(model.stride.max())  # model stride
-            imgsz = check_img_size(imgsz, s=stride)  # check image size
-            names = model.module.names if hasattr(model, 'module') else model.names  # get class names
-            if half:
-                model.half()  # to FP16
-
-            # Dataloader
-            if self.source.isnumeric() or self.source.lower().startswith(('sonar://', 'rtmp://', 'http://', 'https://')):
-                view_img = check_imshow()
-                cudnn.benchmark = True  # set True to speed up constant image size inference
-                dataset = LoadWebcam(self.source, img_size=imgsz, stride=stride)
-                # bs = len(dataset)  # batch_size
-            else:
-                dataset = LoadImages(self.source, img_size=imgsz, stride=stride)
-
-            # Run inference
-            if device.type != 'cpu':
-                model(torch.zeros(1, 3, imgsz, imgsz).to(device).type_as(next(model.parameters())))  # run once
-            count = 0
-            jump_count = 0
+            count = 0               # 推理帧数
+            frame_count = 0         # 取得的帧数
+            infer_time = 0.0
+            infer_ema = 0.0         # 推理耗时的滑动平均（秒）
+            frame_interval = 0.0    # 实测出帧间隔（秒）
             start_time = time.time()
-            dataset = iter(dataset)
+            put_num = self.img_queue.counters()['put']
+
+            # 准备检测一帧：先查原始输出缓存（键为画面标识 + 模型），未命中时写入输入张量的下一个位置
+            # （增量检测时由条带检测器自行预处理），返回(图像, generation, column, 画面标识, 缓存项, 海底行号)
+            def prepare(im0, generation, column, frame_key, bottom, incremental=False):
+                entry = None
+                if not incremental:
+                    if frame_key is not None:
+                        entry = self.prediction_cache.get(frame_key + (self.current_weight, imgsz, half),
+                                                          self.conf_thres)
+                    if entry is None:
+                        self.preprocess(im0, imgsz, stride, device, half, len(accepted))
+                        accepted.append(im0)
+                return im0, generation, column, frame_key, entry, bottom
+
+            # 处理取出的每一帧：显示原图（界面线程异步使用，传递拷贝后立即归还帧缓冲），
+            # 需要检测的帧返回prepare()的结果；不检测的帧返回None。
+            # 归还后帧缓冲随时可能被解析线程重新取用并改写，之后只使用归还前复制的数据与元数据
+            def accept(frame):
+                nonlocal frame_count
+                self.cnt_get_from_queue = self.cnt_get_from_queue + 1
+                detect, generation, column, frame_key = frame.detect, frame.generation, frame.column, frame.key
+                energy_column = frame.energy_column
+                im0 = frame.data.copy()
+                bottom = frame.bottom.copy()
+                frame.release()
+                self.send_raw.emit(im0)
+                if not detect:
+                    return None     # 快速浏览且配置为跳过检测：只显示
+                frame_count += 1
+                if frame_count % self.detect_every:
+                    return None     # 推理跟不上出帧：本帧只显示
+                gate = self.gate(energy_column, generation, column, im0.shape[1])
+                if gate is not None:
+                    return im0, generation, column, frame_key, gate, bottom     # 不推理，也不预处理
+                return prepare(im0, generation, column, frame_key, bottom, incremental)
+
+            # 推理一批帧，返回每帧原图坐标的检测结果。缓存未命中的帧合并为一次推理，原始输出存入缓存，
+            # 之后只做NMS；增量检测时逐帧只对新滚入的条带推理，与上一帧左移后的结果拼接
+            def infer(batch, incremental):
+                if incremental:
+                    return [self.strip_detector(im0, generation, column, self.conf_thres, self.iou_thres, classes,
+                                                agnostic_nms, max_det) for im0, generation, column, _, _, _ in batch]
+                entries = [item[4] for item in batch]
+                missing = [i for i, entry in enumerate(entries) if entry is None]
+                if missing:
+                    img = self.preprocessor.tensor[:len(missing)]
+                    pred = model(img, augment=augment)[0]
+                    meta = img.shape[2:], self.preprocessor.ratio_pad
+                    for j, i in enumerate(missing):
+                        frame_key = batch[i][3]
+                        if frame_key is None:
+                            entries[i] = pred[j:j + 1], meta
+                        else:
+                            entries[i] = self.prediction_cache.put(frame_key + (self.current_weight, imgsz, half),
+                                                                   pred[j:j + 1], meta)
+                dets = []
+                for (im0, _, _, _, _, _), (rows, (shape, ratio_pad)) in zip(batch, entries):
+                    det = non_max_suppression(rows, self.conf_thres, self.iou_thres, classes, agnostic_nms,
+                                              max_det=max_det)[0]
+                    if len(det):
+                        # Rescale boxes from img_size to im0 size
+                        det[:, :4] = scale_coords(shape, det[:, :4], im0.shape, ratio_pad).round()
+                    dets.append(det)
+                return dets
+
+            # 检测一批帧，返回每帧的检测结果（numpy数组）。能量门控跳过的帧不推理：屏幕上没有回波时为空，
+            # 否则为上一检测帧的结果左移；其余帧一起推理。上边缘已在海底以下的框（海底回波、海底杂波）丢弃
+            def detect(batch, incremental=False):
+                results = iter(infer([item for item in batch if not isinstance(item[4], str)], incremental))
+                dets = []
+                for _, _, column, _, entry, bottom in batch:
+                    if isinstance(entry, str):
+                        det = np.zeros((0, 6), dtype=np.float32) if entry == 'empty' \
+                            else shift_boxes(self.last_det, column - self.last_det_column)
+                    else:
+                        det = to_numpy(next(results))
+                    det = det[above_bottom(det, bottom)]
+                    self.last_det, self.last_det_column = det, column
+                    dets.append(det)
+                return dets
+
+            # 标注与海底线画在拷贝上，原始图像（send_raw）不受影响；没有目标也没有海底时直接发送原图。
+            # ids为每个检测框的轨迹编号（0为未确认），统计（各类别当前/累计数量）只在轨迹有增减时发送
+            def emit(im0, det, ids, bottom):
+                if len(det):
+                    annotator = Annotator(im0.copy(), line_width=line_thickness, example=str(names))
+                    for (*xyxy, conf, cls), track_id in zip(reversed(det), reversed(ids)):
+                        c = int(cls)  # integer class
+                        name = f'{names[c]} #{track_id}' if track_id else names[c]
+                        label = None if hide_labels else (name if hide_conf else f'{name} {conf:.2f}')
+                        annotator.box_label(xyxy, label, color=colors(c, True))
+                    img = annotator.result()
+                else:
+                    img = im0
+                if not np.isnan(bottom).all():
+                    img = draw_bottom(img if len(det) else img.copy(), bottom)
+                self.send_img.emit(img)
+                if self.tracker.changed:
+                    self.send_statistic.emit(self.tracker.statistic(names))
 
             while True:
-                if self.jump_out:
-                    self.vid_cap.release()
-                    self.send_percent.emit(0)
+                if self.control.is_stopping:
                     self.send_msg.emit('已停止')
-                    if hasattr(self, 'out'):
-                        self.out.release()
                     break
                 # 检查模型是否有变更
-                if self.current_weight != self.weights:
-                    # Load model
-                    model = attempt_load(self.weights, map_location=device)  # load FP32 model
-                    num_params = 0
-                    for param in model.parameters():
-                        num_params += param.numel()
-                    stride = int(model.stride.max())  # model stride
-                    imgsz = check_img_size(imgsz, s=stride)  # check image size
-                    names = model.module.names if hasattr(model, 'module') else model.names  # get class names
-                    if half:
-                        model.half()  # to FP16
-                    # Run inference
-                    if device.type != 'cpu':
-                        model(torch.zeros(1, 3, imgsz, imgsz).to(device).type_as(next(model.parameters())))  # run once
-                    self.current_weight = self.weights
-
-                if self.is_continue:
-                    # 检查队列中是否有数据
-                    img_from_queue = self.img_queue.get()
-                    if img_from_queue is None:
-                        continue
-                    else:
-                        self.cnt_get_from_queue = self.cnt_get_from_queue + 1
-                        # print(time.time(), self.cnt_get_from_queue)
-
-                    # 将数据显示在主界面
-                    self.send_raw.emit(img_from_queue)
-                    continue    # for test：跳过以下代码
-
-                    path, img, im0s, self.vid_cap = next(dataset)
-                    # jump_count += 1
-                    # if jump_count % 5 != 0:
-                    #     continue
-                    count += 1
-                    if count % 30 == 0 and count >= 30:
-                        fps = int(30/(time.time()-start_time))
-                        self.send_fps.emit('FPS: '+str(fps)+' ')
-                        start_time = time.time()
-                    if self.vid_cap:
-                        percent = int(count/self.vid_cap.get(cv2.CAP_PROP_FRAME_COUNT)*self.percent_length)
-                        self.send_percent.emit(percent)
-                    else:
-                        percent = self.percent_length
+                if self.current_weight != self.weights or self.imgsz != imgsz:
+                    imgsz = self.imgsz
+                    model, stride, names, imgsz = self.load_model(device, imgsz, half)
+                    self.imgsz = imgsz
 
-                    statistic_dic = {name: 0 for name in names}
-                    img = torch.from_numpy(img).to(device)
-                    img = img.half() if half else img.float()  # uint8 to fp16/32
-                    img /= 255.0  # 0 - 255 to 0.0 - 1.0
-                    if img.ndimension() == 3:
-                        img = img.unsqueeze(0)
+                # 暂停时阻塞在条件变量上（不占用CPU），停止时立即返回False
+                if not self.control.wait_running():
+                    continue
+                accepted = []
+                if self.nms_pending:
+                    # 阈值变化：当前画面立即按新阈值整帧重新检测（缓存命中时只做NMS）；
+                    # 增量检测的拼接结果按旧阈值得到，下一帧检测到阈值变化时也会整帧重新开始
+                    self.nms_pending = False
+                    if self.last_item is not None:
+                        im0, generation, column, frame_key, _, bottom = self.last_item
+                        item = prepare(im0, generation, column, frame_key, bottom)
+                        det = detect([item])[0]
+                        emit(im0, det, self.tracker.assign(det), bottom)     # 同一画面，不更新轨迹
+                    continue
+                incremental = self.incremental      # 本批按收集开始时的模式处理
+                # 检查队列中是否有数据；停止时唤醒函数会放入None，超时只作为兜底
+                # 开启微批处理时收集多帧，每帧在取出时显示原图并写入输入张量
+                try:
+                    batch = self.batcher.collect(accept, first_timeout=self.queue_timeout)
+                except queue.Empty:
+                    continue
+                if not batch:
+                    continue
 
-                    pred = model(img, augment=augment)[0]
+                t0 = time.perf_counter()
+                dets = detect(batch, incremental)
+                elapsed = time.perf_counter() - t0
+                if accepted:
+                    elapsed += self.preprocessor.cost_ema * len(accepted)
+                infer_time += elapsed
+                elapsed /= len(batch)
+                infer_ema = elapsed if infer_ema == 0 else 0.8 * infer_ema + 0.2 * elapsed
+                self.update_detect_every(infer_ema, frame_interval)
 
-                    # Apply NMS
-                    pred = non_max_suppression(pred, self.conf_thres, self.iou_thres, classes, agnostic_nms, max_det=max_det)
-                    # Process detections
-                    for i, det in enumerate(pred):  # detections per image
-                        im0 = im0s.copy()
-                        annotator = Annotator(im0, line_width=line_thickness, example=str(names))
-                        if len(det):
-                            # Rescale boxes from img_size to im0 size
-                            det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im0.shape).round()
-
-                            # Write results
-                            for *xyxy, conf, cls in reversed(det):
-                                c = int(cls)  # integer class
-                                statistic_dic[names[c]] += 1
-                                label = None if hide_labels else (names[c] if hide_conf else f'{names[c]} {conf:.2f}')
-                                annotator.box_label(xyxy, label, color=colors(c, True))
-
-                    im0 = annotator.result()
-                    self.send_img.emit(im0)
-                    self.send_raw.emit(im0s if isinstance(im0s, np.ndarray) else im0s[0])
-                    self.send_statistic.emit(statistic_dic)
-                    if self.save_fold:
-                        os.makedirs(self.save_fold, exist_ok=True)
-                        if self.vid_cap is None:
-                            save_path = os.path.join(self.save_fold,
-                                                     time.strftime('%Y_%m_%d_%H_%M_%S',
-                                                                   time.localtime()) + '.jpg')
-                            cv2.imwrite(save_path, im0)
-                        else:
-                            if count == 1:
-                                ori_fps = int(self.vid_cap.get(cv2.CAP_PROP_FPS))
-                                if ori_fps == 0:
-                                    ori_fps = 25
-                                # width = int(self.vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                                # height = int(self.vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                                width, height = im0.shape[1], im0.shape[0]
-                                save_path = os.path.join(self.save_fold, time.strftime('%Y_%m_%d_%H_%M_%S', time.localtime()) + '.mp4')
-                                self.out = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*"mp4v"), ori_fps,
-                                                           (width, height))
-                            self.out.write(im0)
-                    if percent == self.percent_length:
-                        print(count)
-                        self.send_percent.emit(0)
-                        self.send_msg.emit('已完成')
-                        if hasattr(self, 'out'):
-                            self.out.release()
-                        break
+                # 按帧序跟踪：瀑布图的(generation, column, 帧下标)用于补偿屏幕左移
+                for (im0, generation, column, frame_key, _, bottom), det in zip(batch, dets):
+                    ids = self.tracker.update(det, generation, column, None if frame_key is None else frame_key[1])
+                    emit(im0, det, ids, bottom)
+                self.last_item = batch[-1]
+
+                count += len(batch)
+                if count >= 10:
+                    # 出帧间隔按队列放入的帧数计算（含检测线程来不及取而被丢弃的帧）
+                    elapsed = time.time() - start_time
+                    new_put_num = self.img_queue.counters()['put']
+                    if new_put_num > put_num:
+                        frame_interval = elapsed / (new_put_num - put_num)
+                    msg = '检测FPS: %d 推理: %.0f ms' % (count / elapsed, infer_time / count * 1000)
+                    if incremental:
+                        msg += '（增量，计算量 %.0f%%） ' % (self.strip_detector.counters()['pixel_ratio'] * 100)
+                    elif self.preprocessor is not None:
+                        msg += '（预处理 %.1f ms） ' % (self.preprocessor.cost_ema * 1000)
+                    else:
+                        msg += ' '
+                    cache = self.prediction_cache.counters()
+                    if cache['hit']:
+                        msg += '缓存命中: %d ' % cache['hit']
+                    if self.batcher.batch_size > 1:
+                        msg += '批: %.1f/%d ' % (self.batcher.mean_batch, self.batcher.batch_size)
+                    if self.detect_every > 1:
+                        msg += '每%d帧检测 ' % self.detect_every
+                    msg += '跟踪: %.2f ms ' % (self.tracker.cost_ema * 1000)
+                    skipped = self.gate_counts['empty'] + self.gate_counts['shift']
+                    if skipped:
+                        msg += '门控跳过: %.0f%% ' % (skipped / sum(self.gate_counts.values()) * 100)
+                    self.send_fps.emit(msg)
+                    count = 0
+                    infer_time = 0.0
+                    put_num = new_put_num
+                    start_time = time.time()
 
         except Exception as e:
             self.send_msg.emit('detect_thread.run() >> %s' % e)
 
+        latency = self.control.stopped()
+        if latency is not None:
+            self.send_msg.emit('detect_thread >> 已停止，停止延迟：%.1f ms' % latency)
+
+    # 向队列放入None，唤醒阻塞在img_queue.get()上的本线程
+    def wake(self):
+        try:
+            self.img_queue.put_nowait(None)
+        except queue.Full:
+            pass        # 队列已满时消费者不会阻塞
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def stop(self):
+        self.control.stop()
+
+
+# 检测结果（torch张量或numpy数组）→ CPU上的numpy数组
+def to_numpy(det):
+    return det.cpu().numpy() if isinstance(det, torch.Tensor) else det
+
 
 class TargetAugment():
     pass
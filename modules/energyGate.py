@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        energyGate.py
+@Author：      wzj
+@Description:  目标检测的能量门控。记录中大部分是空的水体，每帧仍要经过一次YOLO推理。
+               在数据解析线程中，对新滚入的列（TVG之后、着色之前的原始强度）做廉价的预判：
+                   1. 阈值：按当前增益的着色范围，(value - threshold) / denominator >= level的采样点视为回波；
+                      给出海底深度（每列的行号，NaN表示没有海底）时，只统计海底以上margin行之外的水体
+                   2. 连通域：新列与之前context列的掩码一起做连通域分析（目标跨越两次写入时不被截断），
+                      面积不小于min_area的连通域才算目标，孤立的噪点被忽略
+                   3. 记录最右一个含目标的列的累计下标energy_column（与瀑布图的column同一坐标，整屏重绘时从整屏重新计算）
+               检测线程据此决定是否推理：
+                   energy_column <= column - 屏幕宽度        屏幕上没有回波，结果为空
+                   energy_column <= 上一检测帧的column        自上一检测帧以来新滚入的列都没有回波，上一帧的结果左移即可
+                   否则                                       推理
+               运行本文件比较门控与逐帧检测的跳过率、耗时与召回率：python -m modules.energyGate --source data.txt
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+
+class EnergyGate(object):
+    def __init__(self, width=1400, level=0.25, min_area=12, context=16, margin=8):
+        self.width = width                  # 屏幕列数
+        self.level = level                  # 着色范围的比例，超过的采样点视为回波
+        self.min_area = min_area            # 目标连通域的最小面积（采样点数）
+        self.context = context              # 与新列一起做连通域分析的之前的列数
+        self.margin = margin                # 海底以上不统计的行数（海底回波的拖尾）
+        self.tail = None                    # 最近context列的掩码
+        self.column = 0                     # 累计写入的列数，与瀑布图的column同步
+        self.energy_column = -width         # 最右一个含目标的列（累计下标）
+        self.column_num = 0
+        self.active_num = 0
+        self.cost = 0.0                     # 最近一次的耗时（秒）
+
+    # 回波掩码（uint8，形状与data相同）；bottom为每列的海底行号（None表示没有海底检测）
+    def mask(self, data, threshold, denominator, bottom=None):
+        mask = data > threshold + self.level * denominator
+        if bottom is not None:
+            limit = np.nan_to_num(np.asarray(bottom, dtype=np.float32), nan=np.inf) - self.margin
+            mask &= np.arange(data.shape[0])[:, None] < limit[None, :]
+        return mask.view(np.uint8)
+
+    # 新写入的一段数据(pkg_len, n)，返回每列是否含目标
+    def push(self, data, threshold, denominator, bottom=None):
+        t0 = time.perf_counter()
+        mask = self.mask(data, threshold, denominator, bottom)
+        n = mask.shape[1]
+        if self.tail is not None and self.tail.shape[0] == mask.shape[0]:
+            full = np.concatenate([self.tail, mask], axis=1)
+        else:
+            full = mask
+        active = np.zeros(n, dtype=bool)
+        if full.any():
+            _, labels, stats, _ = cv2.connectedComponentsWithStats(full, connectivity=8)
+            large = stats[:, cv2.CC_STAT_AREA] >= self.min_area
+            large[0] = False        # 背景
+            if large.any():
+                active = large[labels[:, -n:]].any(axis=0)
+        self.tail = full[:, -self.context:].copy() if self.context else None
+        self.column += n
+        columns = np.flatnonzero(active)
+        if len(columns):
+            self.energy_column = self.column - n + 1 + columns[-1]
+        self.column_num += n
+        self.active_num += len(columns)
+        self.cost = time.perf_counter() - t0
+        return active
+
+    # 整屏重绘：从整屏数据(pkg_len, 屏幕宽度)重新计算，写入后column为0（与瀑布图一致）
+    def overwrite(self, data, threshold, denominator, bottom=None):
+        self.tail = None
+        self.column = -data.shape[1]
+        self.energy_column = -self.width
+        return self.push(data, threshold, denominator, bottom)
+
+    def counters(self):
+        return {'columns': self.column_num, 'active': self.active_num,
+                'active_ratio': self.active_num / self.column_num if self.column_num else 0.0}
+
+
+# 检测线程的门控决策：第一帧、画面不连续（generation变化）或有新回波时返回None（推理）；
+# 屏幕上没有回波返回'empty'；自上一检测帧以来没有新回波返回'shift'
+def gate_decision(energy_column, generation, column, width, last_view):
+    if energy_column is None:
+        return None
+    if energy_column <= column - width:
+        return 'empty'
+    if last_view is not None and last_view[0] == generation and energy_column <= last_view[1]:
+        return 'shift'
+    return None
+
+
+# 上一帧的检测结果(n, 6)左移shift列，移出屏幕的丢弃
+def shift_boxes(det, shift):
+    det = det[det[:, 2] > shift].copy()
+    det[:, [0, 2]] -= shift
+    det[:, 0] = np.maximum(det[:, 0], 0)
+    return det
+
+
+# 记录文件按回放流程生成帧，同时返回新列的原始强度（TVG之后）与着色参数：
+# (图像, generation, column, 新列强度, threshold, denominator)
+def recording_strips(path, frames, speed):
+    from modules.decodeThread import DecodeThread
+    from modules.framePool import FrameQueue
+    from modules.intensityStats import IntensityStats
+    from modules.udpReplayer import open_recording
+
+    decoder = DecodeThread(FrameQueue())
+    source = open_recording(path)
+    data = np.concatenate([source.read_block(b) for b in range(source.block_num)], axis=1)
+    stats = IntensityStats()
+    stats.add(0, data)
+    width = decoder.screen_size[1]
+    pkg_len = min(source.pkg_len, decoder.screen_size[0])
+    waterfall = decoder.waterfall
+    end = 0
+    for k in range(frames):
+        first, end = end, (min(width, data.shape[1]) if k == 0 else end + speed)
+        if end > data.shape[1]:
+            return
+        gain = decoder.tvg.vector(pkg_len) if decoder.tvg.enabled else None
+        reference = stats.reference(decoder.gain_mode, decoder.gain_percentile, end - width, end, gain)
+        denominator = reference * decoder.gain / 100
+        strip = decoder.tvg.apply(data[:pkg_len, first:end])
+        waterfall.push(decoder.color_map.render(strip, reference - denominator, denominator))
+        yield waterfall.view(), waterfall.generation, waterfall.column, strip, reference - denominator, denominator
+
+
+# 没有记录文件时：暗色带噪声的水体中稀疏地放置示例图片（目标），强度取灰度，按列滚动经过瀑布图
+def sparse_strips(frames, speed, screen_size=(800, 1400), gap=2.0, seed=0):
+    from modules.waterfall import Waterfall
+
+    rng = np.random.default_rng(seed)
+    height, width = screen_size
+    length = width + frames * speed
+    panorama = rng.normal(30, 8, (height, length, 3)).clip(0, 255).astype(np.uint8)
+    images = [cv2.imread('data/images/%s.jpg' % name) for name in ('bus', 'zidane')]
+    x = int(rng.uniform(0, width))
+    while x < length:
+        im = images[rng.integers(len(images))]
+        h = int(rng.uniform(0.25, 0.5) * height)
+        im = cv2.resize(im, (im.shape[1] * h // im.shape[0], h))
+        w = min(im.shape[1], length - x)
+        y = int(rng.uniform(0, height - h))
+        panorama[y:y + h, x:x + w] = im[:, :w]
+        x += w + int(rng.exponential(gap * width))       # 目标之间的空水体，平均gap屏
+    gray = cv2.cvtColor(panorama, cv2.COLOR_BGR2GRAY).astype(np.uint16)
+    waterfall = Waterfall(height, width)
+    end = 0
+    for k in range(frames):
+        first, end = end, (width if k == 0 else end + speed)
+        waterfall.push(panorama[:, first:end])
+        yield waterfall.view(), waterfall.generation, waterfall.column, gray[:, first:end], 0, 255
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default='weights/yolov5n.pt', help='model path')
+    parser.add_argument('--source', type=str, default='', help='hex .txt recording (sparse sample images when empty)')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--frames', type=int, default=300, help='frame number')
+    parser.add_argument('--speed', type=int, default=10, help='new columns per frame')
+    parser.add_argument('--level', type=float, default=0.25, help='fraction of the colour range counted as echo')
+    parser.add_argument('--min-area', type=int, default=12, help='minimum blob area (samples)')
+    parser.add_argument('--conf', type=float, default=0.25, help='confidence threshold')
+    parser.add_argument('--iou', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--report-conf', type=float, default=0.5, help='confidence of the "confident boxes" report')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 每帧做整帧检测（不门控，作为参照），同时按门控决策推理或沿用上一帧左移后的结果；
+    # 统计跳过率、节省的推理时间，以及门控结果相对参照的召回率与精确率。低置信度目标在逐帧检测中本身也时有时无，
+    # 另外统计置信度不低于--report-conf的框，并以逐帧检测自身的帧间一致性（上一帧结果左移后与本帧配对）作为参考
+    import torch
+    from models.experimental import attempt_load
+    from modules.stripDetector import StripDetector, match_boxes
+
+    opt = parse_opt()
+    model = attempt_load(opt.weights, map_location='cpu')
+    detector = StripDetector(model, int(model.stride.max()), opt.imgsz)
+    nms_args = opt.conf, opt.iou, None, False, False, (), 1000
+    frames = recording_strips(opt.source, opt.frames, opt.speed) if opt.source \
+        else sparse_strips(opt.frames, opt.speed)
+    gate = None
+    totals = np.zeros((4, 2), dtype=np.int64)      # 召回、精确、置信召回、置信精确：(配对数, 框数)
+    stable = np.zeros((2, 2), dtype=np.int64)      # 逐帧检测帧间一致性：全部、置信
+    previous = None
+    decisions = {None: 0, 'empty': 0, 'shift': 0}
+    ungated_time = infer_time = gate_time = 0.0
+    last_view, last_det = None, None
+    with torch.no_grad():
+        for im0, generation, column, strip, threshold, denominator in frames:
+            if gate is None:
+                gate = EnergyGate(im0.shape[1], opt.level, opt.min_area)
+            gate.push(strip, threshold, denominator)       # 第一帧的整屏也是写入瀑布图的，column同步
+            gate_time += gate.cost
+            t0 = time.perf_counter()
+            reference = detector.detect_full(im0, nms_args)
+            infer = time.perf_counter() - t0
+            ungated_time += infer
+            decision = gate_decision(gate.energy_column, generation, column, im0.shape[1], last_view)
+            decisions[decision] += 1
+            if decision == 'empty':
+                det = np.zeros((0, 6))
+            elif decision == 'shift':
+                det = shift_boxes(last_det, column - last_view[1])
+            else:
+                det = reference
+                infer_time += infer
+            confident = reference[reference[:, 4] >= opt.report_conf]
+            for row, (a, b) in enumerate([(reference, det), (det, reference), (confident, det),
+                                          (det[det[:, 4] >= opt.report_conf], reference)]):
+                totals[row] += match_boxes(a, b)[:2]
+            if previous is not None:
+                moved = shift_boxes(previous, column - last_view[1])
+                stable[0] += match_boxes(moved, reference)[:2]
+                stable[1] += match_boxes(moved[moved[:, 4] >= opt.report_conf], reference)[:2]
+            previous = reference
+            last_view, last_det = (generation, column), det
+    frame_num = sum(decisions.values())
+    skipped = decisions['empty'] + decisions['shift']
+    ratio = totals[:, 0] / np.maximum(totals[:, 1], 1)
+    print('%d frames, %d columns per frame, active columns %.1f%%: skipped %d (%.1f%%; empty %d, shifted %d), '
+          'gate %.2f ms/frame, inference %.1f ms/frame ungated vs %.1f ms/frame gated'
+          % (frame_num, opt.speed, gate.counters()['active_ratio'] * 100, skipped, skipped / frame_num * 100,
+             decisions['empty'], decisions['shift'], gate_time / frame_num * 1000, ungated_time / frame_num * 1000,
+             infer_time / frame_num * 1000))
+    print('all boxes vs ungated (conf>=%.2f): ungated %d, gated %d, recall %.3f, precision %.3f, '
+          'ungated vs its previous frame %.3f'
+          % (opt.conf, totals[0, 1], totals[1, 1], ratio[0], ratio[1], stable[0, 0] / max(stable[0, 1], 1)))
+    print('confident boxes (conf>=%.2f): recall %.3f, precision %.3f, ungated vs its previous frame %.3f'
+          % (opt.report_conf, ratio[2], ratio[3], stable[1, 0] / max(stable[1, 1], 1)))
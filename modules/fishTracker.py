@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        fishTracker.py
+@Author：      wzj
+@Description:  检测结果的多目标跟踪（NMS之后）。逐帧统计类别数量时，同一条鱼在屏幕上停留多少帧就被计数多少次；
+               跟踪后每个目标有持久的编号，可以得到真实的累计数量，统计只在轨迹变化时更新。
+               与SORT/ByteTrack相同的思路，按瀑布图的特点简化运动模型：
+                   1. 运动预测：回波在瀑布图中随屏幕左移，同一generation内两帧column之差即左移列数；
+                      在此基础上为每条轨迹维护框四条边的速度（平滑后的残差），应对回波的延伸与深度变化。
+                      generation变化时：帧下标相同（增益/TVG等整屏重绘）位置不变，否则（跳转）结束所有轨迹
+                   2. 关联（两级）：高置信度检测框先与全部轨迹按IoU代价矩阵做最优分配（匈牙利算法），
+                      剩余轨迹再与低置信度检测框按更严格的IoU分配；只在同类别之间配对
+                   3. 未配对的高置信度检测框新建轨迹，连续命中min_hits次后确认并分配编号、计入累计数量；
+                      确认的轨迹失配超过max_age帧或移出屏幕左侧时结束，未确认的轨迹失配即丢弃
+               IoU、预测与状态更新都以numpy数组整体计算：框按x1排序后只计算水平方向重叠的框对，
+               互为唯一候选的框对直接配对，只有存在竞争的行列才组成代价矩阵交给匈牙利算法。
+               运行本文件在模拟的滚动场景中测试耗时与计数准确性：python -m modules.fishTracker
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+# 两组框（xyxy）中水平方向有重叠的框对(i, j)及其IoU。框按x1排序后二分查找候选区间，
+# 只计算可能相交的框对（目标沿屏幕分散，候选数约为框数的常数倍，而不是两组框数之积）
+def overlap_iou(a, b):
+    order = np.argsort(b[:, 0])
+    x1 = b[order, 0]
+    lo = np.searchsorted(x1, a[:, 0] - (b[:, 2] - b[:, 0]).max(), side='left')
+    hi = np.searchsorted(x1, a[:, 2], side='right')
+    counts = np.maximum(hi - lo, 0)
+    starts = np.cumsum(counts) - counts
+    i = np.repeat(np.arange(len(a)), counts)
+    j = order[np.arange(counts.sum()) - np.repeat(starts - lo, counts)]
+    a, b = a[i], b[j]
+    w = np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0])
+    h = np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1])
+    inter = np.where((w > 0) & (h > 0), w * h, 0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return i, j, inter / (area_a + area_b - inter + 1e-6)
+
+
+class FishTracker(object):
+    def __init__(self, match_thres=0.3, low_match_thres=0.5, high_thres=0.5, min_hits=3, max_age=30, smooth=0.05):
+        self.match_thres = match_thres          # 高置信度检测框与轨迹配对的最小IoU
+        self.low_match_thres = low_match_thres  # 低置信度检测框与剩余轨迹配对的最小IoU
+        self.high_thres = high_thres            # 高/低置信度的分界，只有高置信度检测框新建轨迹
+        self.min_hits = min_hits                # 连续命中次数达到后确认轨迹
+        self.max_age = max_age                  # 确认的轨迹最多连续失配的帧数
+        self.smooth = smooth                    # 速度的平滑系数
+        self.reset()
+
+    # 清除所有轨迹与累计数量（开始检测、模型变更时调用）
+    def reset(self):
+        self.boxes = np.zeros((0, 4))           # 预测/最近配对的框（屏幕坐标）
+        self.velocity = np.zeros((0, 4))        # 框四条边每帧的位移（已扣除屏幕左移）
+        self.cls = np.zeros(0, dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int64)  # 0为未确认
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.age = np.zeros(0, dtype=np.int64)  # 连续失配的帧数
+        self.next_id = 1
+        self.totals = {}                        # 类别 → 累计确认的轨迹数
+        self.view = None                        # 上一帧的(generation, column, 帧下标)
+        self.changed = True                     # 确认的轨迹有增减，统计需要更新
+        self.update_num = 0
+        self.cost = 0.0                         # 最近一帧的耗时（秒）
+        self.cost_ema = 0.0
+
+    # 按掩码保留轨迹
+    def keep(self, mask):
+        if mask.all():
+            return
+        self.boxes, self.velocity, self.cls = self.boxes[mask], self.velocity[mask], self.cls[mask]
+        self.ids, self.hits, self.age = self.ids[mask], self.hits[mask], self.age[mask]
+
+    # 相对上一帧的左移列数；画面不连续时返回None
+    def scroll(self, generation, column, index):
+        last, self.view = self.view, (generation, column, index)
+        if last is None or generation == last[0]:
+            return 0 if last is None else column - last[1]
+        if index is not None and index == last[2]:
+            return 0        # 整屏按新参数重绘，位置不变
+        return None
+
+    # 轨迹track_idx与检测框det_idx按同类别IoU最优分配，返回配对的(轨迹索引, 检测框索引)。
+    # 只有一个候选且对方也只有这一个候选的框对直接配对，其余的行列组成代价矩阵交给匈牙利算法
+    def associate(self, boxes, cls, track_idx, det_idx, thres):
+        if len(track_idx) == 0 or len(det_idx) == 0:
+            return track_idx[:0], det_idx[:0]
+        i, j, iou = overlap_iou(self.boxes[track_idx], boxes[det_idx])
+        ok = (iou >= thres) & (self.cls[track_idx[i]] == cls[det_idx[j]])
+        i, j, iou = i[ok], j[ok], iou[ok]
+        row_num, col_num = np.bincount(i, minlength=len(track_idx)), np.bincount(j, minlength=len(det_idx))
+        unique = (row_num[i] == 1) & (col_num[j] == 1)
+        pair_i, pair_j = i[unique], j[unique]
+        if not unique.all():
+            rows, cols = np.unique(i[~unique]), np.unique(j[~unique])
+            cost = np.zeros((len(rows), len(cols)))
+            cost[np.searchsorted(rows, i[~unique]), np.searchsorted(cols, j[~unique])] = iou[~unique]
+            r, c = linear_sum_assignment(cost, maximize=True)
+            ok = cost[r, c] > 0
+            pair_i, pair_j = np.concatenate([pair_i, rows[r[ok]]]), np.concatenate([pair_j, cols[c[ok]]])
+        return track_idx[pair_i], det_idx[pair_j]
+
+    # 输入一帧的检测结果det(n, 6: xyxy, conf, cls，屏幕坐标)与该帧的(generation, column, 帧下标)，
+    # 返回每个检测框所属的轨迹编号（未确认或未配对为0）
+    def update(self, det, generation, column, index=None):
+        t0 = time.perf_counter()
+        det = np.asarray(det, dtype=np.float64).reshape(-1, 6)
+        boxes, conf, cls = det[:, :4], det[:, 4], det[:, 5].astype(np.int64)
+        confirmed_num = np.count_nonzero(self.ids)
+
+        # 预测：随屏幕左移并加上速度；画面不连续时结束所有轨迹，移出屏幕左侧的轨迹结束
+        shift = self.scroll(generation, column, index)
+        if shift is None:
+            self.keep(np.zeros(len(self.ids), dtype=bool))
+        else:
+            self.boxes[:, [0, 2]] -= shift
+            self.boxes += self.velocity
+            self.keep(self.boxes[:, 2] > 0)
+
+        # 两级关联：高置信度检测框与全部轨迹，低置信度检测框与剩余轨迹
+        high = conf >= self.high_thres
+        t1, d1 = self.associate(boxes, cls, np.arange(len(self.ids)), np.flatnonzero(high), self.match_thres)
+        free = np.ones(len(self.ids), dtype=bool)
+        free[t1] = False
+        t2, d2 = self.associate(boxes, cls, np.flatnonzero(free), np.flatnonzero(~high), self.low_match_thres)
+        matched_t, matched_d = np.concatenate([t1, t2]), np.concatenate([d1, d2])
+
+        # 配对的轨迹更新框与速度，失配的轨迹只累加失配帧数
+        self.velocity[matched_t] += self.smooth * (boxes[matched_d] - self.boxes[matched_t])
+        self.boxes[matched_t] = boxes[matched_d]
+        self.hits[matched_t] += 1
+        self.age += 1
+        self.age[matched_t] = 0
+
+        # 未配对的高置信度检测框新建轨迹
+        high[d1] = False
+        born = np.flatnonzero(high)
+        if len(born):
+            self.boxes = np.concatenate([self.boxes, boxes[born]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((len(born), 4))])
+            self.cls = np.concatenate([self.cls, cls[born]])
+            self.ids = np.concatenate([self.ids, np.zeros(len(born), dtype=np.int64)])
+            self.hits = np.concatenate([self.hits, np.ones(len(born), dtype=np.int64)])
+            self.age = np.concatenate([self.age, np.zeros(len(born), dtype=np.int64)])
+
+        # 确认命中次数足够的轨迹，分配编号并计入累计数量
+        confirm = np.flatnonzero((self.ids == 0) & (self.hits >= self.min_hits))
+        if len(confirm):
+            self.ids[confirm] = np.arange(self.next_id, self.next_id + len(confirm))
+            self.next_id += len(confirm)
+            for c, n in zip(*np.unique(self.cls[confirm], return_counts=True)):
+                self.totals[int(c)] = self.totals.get(int(c), 0) + int(n)
+
+        det_ids = np.zeros(len(det), dtype=np.int64)
+        det_ids[matched_d] = self.ids[matched_t]
+        det_ids[born] = self.ids[-len(born):] if len(born) else 0
+
+        # 结束失配过久的确认轨迹与失配的未确认轨迹
+        self.keep(np.where(self.ids > 0, self.age <= self.max_age, self.age == 0))
+        self.changed = self.changed or len(confirm) > 0 or np.count_nonzero(self.ids) != confirmed_num + len(confirm)
+
+        self.update_num += 1
+        self.cost = time.perf_counter() - t0
+        self.cost_ema = self.cost if self.cost_ema == 0 else 0.9 * self.cost_ema + 0.1 * self.cost
+        return det_ids
+
+    # 不改变轨迹，只查询当前画面检测框所属的轨迹编号（同一画面按新阈值重新检测时使用）
+    def assign(self, det):
+        det = np.asarray(det, dtype=np.float64).reshape(-1, 6)
+        det_ids = np.zeros(len(det), dtype=np.int64)
+        t, d = self.associate(det[:, :4], det[:, 5].astype(np.int64), np.flatnonzero((self.ids > 0) & (self.age == 0)),
+                              np.arange(len(det)), self.match_thres)
+        det_ids[d] = self.ids[t]
+        return det_ids
+
+    # 按类别名返回(当前确认的轨迹数, 累计数量)，并清除changed标记
+    def statistic(self, names):
+        self.changed = False
+        current = dict(zip(*np.unique(self.cls[self.ids > 0], return_counts=True)))
+        return {names[c]: (int(current.get(c, 0)), total) for c, total in self.totals.items()}
+
+    def counters(self):
+        return {'tracks': int(np.count_nonzero(self.ids)), 'tentative': int(np.count_nonzero(self.ids == 0)),
+                'total': self.next_id - 1, 'cost_ema': self.cost_ema}
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--targets', type=str, default='10,100,300', help='comma separated mean targets on screen')
+    parser.add_argument('--frames', type=int, default=1000, help='frame number')
+    parser.add_argument('--speed', type=int, default=2, help='new columns per frame')
+    parser.add_argument('--miss', type=float, default=0.1, help='probability that a target is not detected')
+    parser.add_argument('--jitter', type=float, default=2.0, help='box jitter (pixels)')
+    parser.add_argument('--false', type=float, default=2.0, help='false detections per frame')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 模拟瀑布图滚动：目标固定在数据坐标中（随屏幕左移，深度缓慢漂移），每帧以一定概率漏检、框抖动，
+    # 另有随机的误检。比较跟踪的累计数量与真实出现的目标数、逐帧计数之和，统计编号切换与每帧耗时
+    opt = parse_opt()
+    height, width = 800, 1400
+    for target_num in [int(n) for n in opt.targets.split(',')]:
+        rng = np.random.default_rng(0)
+        length = width + opt.frames * opt.speed
+        fish_num = int(target_num * length / width)
+        x = rng.uniform(0, length, fish_num)
+        y = rng.uniform(0, height - 60, fish_num)
+        size = rng.uniform(20, 60, (fish_num, 2))
+        drift = rng.normal(0, 0.1, fish_num)
+        tracker = FishTracker()
+        owner = {}                          # 轨迹编号 → 真实目标
+        seen = np.zeros(fish_num, dtype=bool)
+        per_frame = 0
+        costs = []
+        for k in range(opt.frames):
+            right = width + k * opt.speed   # 屏幕右端对应的数据列
+            sx = x - (right - width)
+            on = (sx + size[:, 0] > 0) & (sx < width)
+            detected = np.flatnonzero(on & (rng.random(fish_num) >= opt.miss))
+            seen[detected] = True
+            top = y[detected] + drift[detected] * k
+            det = np.column_stack([sx[detected], top, sx[detected] + size[detected, 0], top + size[detected, 1],
+                                   rng.uniform(0.3, 0.95, len(detected)), np.zeros(len(detected))])
+            det[:, :4] += rng.normal(0, opt.jitter, (len(detected), 4))
+            false_num = rng.poisson(opt.false)
+            fx, fy = rng.uniform(0, width - 40, false_num), rng.uniform(0, height - 40, false_num)
+            det = np.concatenate([det, np.column_stack([fx, fy, fx + 30, fy + 30, rng.uniform(0.25, 0.6, false_num),
+                                                        np.zeros(false_num)])])
+            per_frame += len(det)
+            t0 = time.perf_counter()
+            ids = tracker.update(det, 0, k * opt.speed, right)
+            costs.append(time.perf_counter() - t0)
+            for i, track_id in zip(detected, ids[:len(detected)]):
+                if track_id:
+                    owner.setdefault(int(track_id), set()).add(int(i))
+        truth = int(seen.sum())
+        tracks_per_fish = np.bincount(np.concatenate([list(fish) for fish in owner.values()] + [[]]).astype(int),
+                                      minlength=fish_num)[seen]
+        costs = np.array(costs[10:]) * 1000
+        print('%d targets on screen (%d seen): tracker %.3f ms/frame (p99 %.3f ms), cumulative count %d '
+              '(%.1f%% of truth), per-frame count sum %d, fish split into several tracks %d, tracks on several fish %d'
+              % (target_num, truth, costs.mean(), np.percentile(costs, 99), tracker.next_id - 1,
+                 (tracker.next_id - 1) / truth * 100, per_frame, np.count_nonzero(tracks_per_fish > 1),
+                 sum(len(fish) > 1 for fish in owner.values())))
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        frameBatcher.py
+@Author：      wzj
+@Description:  目标检测的微批处理（可选）。检测线程默认每帧推理一次（batch=1）；队列积压时（高倍速、快速浏览），
+               每次前向的固定开销（逐层调度、内存分配）被重复支付。开启后，从队列收集最多batch_size帧，
+               或自第一帧起最多等待timeout秒，合并为一次批量前向，结果按帧序拆分。
+                   batch_size = 1    与逐帧推理相同，不等待
+                   等待期间到达的帧立即取出（原图照常显示），不会因等待而被队列丢弃
+               代价是延迟：每帧的结果最多推迟timeout + 一次批量推理的时间。
+               运行本文件测试不同批大小的吞吐量与延迟：python -m modules.frameBatcher
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class FrameBatcher(object):
+    def __init__(self, img_queue, batch_size=1, timeout=0.02):
+        self.img_queue = img_queue
+        self.batch_size = batch_size        # 每批最多帧数
+        self.timeout = timeout              # 自第一帧起最多等待的时间（秒）
+        self.batch_num = 0
+        self.frame_num = 0
+
+    # 收集一批。first_timeout秒内没有帧时抛出queue.Empty；收到唤醒标记None时提前返回。
+    # accept(frame)处理取出的每一帧（显示原图、归还帧缓冲），返回需要检测的数据，返回None表示该帧不参与检测
+    def collect(self, accept, first_timeout=None):
+        batch = []
+        deadline = None
+        batch_size = self.batch_size        # 界面线程可能在收集期间修改批大小，本批按开始时的大小
+        while len(batch) < batch_size:
+            if deadline is None:
+                frame = self.img_queue.get(timeout=first_timeout)
+            else:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    frame = self.img_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if frame is None:
+                break
+            item = accept(frame)
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.perf_counter() + self.timeout
+        if batch:
+            self.batch_num += 1
+            self.frame_num += len(batch)
+        return batch
+
+    @property
+    def mean_batch(self):
+        return self.frame_num / self.batch_num if self.batch_num else 0.0
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default='weights/yolov5n.pt', help='model path')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--batches', type=str, default='1,2,4,8', help='comma separated batch sizes')
+    parser.add_argument('--rate', type=float, default=40.0, help='frames/s offered by the producer')
+    parser.add_argument('--timeout', type=float, default=0.1, help='batch timeout (s)')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per batch size')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 生产者按--rate放入帧（队列容量为批大小，满时丢弃最旧的帧），消费者批量推理；
+    # 统计每个批大小下的吞吐量（帧/秒）、丢帧与延迟（入队到得到结果）
+    import torch
+    from models.experimental import attempt_load
+    from YoLoV5.general import non_max_suppression
+    from modules.framePool import FramePool, FrameQueue
+    from modules.framePreprocessor import FramePreprocessor
+
+    opt = parse_opt()
+    model = attempt_load(opt.weights, map_location='cpu')
+    stride = int(model.stride.max())
+    rng = np.random.default_rng(0)
+    shape = (800, 1400, 3)
+    image = rng.integers(0, 256, size=shape, dtype=np.uint8)
+
+    for batch_size in [int(b) for b in opt.batches.split(',')]:
+        img_queue = FrameQueue(maxsize=max(batch_size, 2), policy='drop_oldest')
+        pool = FramePool(img_queue.maxsize + 2, shape)
+        batcher = FrameBatcher(img_queue, batch_size, opt.timeout)
+        preprocessor = FramePreprocessor(shape, opt.imgsz, stride, batch=batch_size)
+        stop_event = threading.Event()
+
+        def produce():
+            t0 = time.perf_counter()
+            k = 0
+            while not stop_event.is_set():
+                frame = pool.acquire(timeout=0.1)
+                if frame is not None:
+                    frame.data[:] = image
+                    img_queue.put(frame)
+                k += 1
+                time.sleep(max(t0 + k / opt.rate - time.perf_counter(), 0))
+
+        # 取出的帧先写入输入张量的下一个位置，再归还帧缓冲
+        def accept(frame):
+            index = len(accepted)
+            preprocessor(frame.data, index)
+            accepted.append(frame.timestamp)
+            frame.release()
+            return index
+
+        with torch.no_grad():
+            model(preprocessor.tensor)      # warm up
+            producer = threading.Thread(target=produce)
+            producer.start()
+            latency, infer = [], []
+            t_start = time.perf_counter()
+            while time.perf_counter() - t_start < opt.duration:
+                accepted = []
+                try:
+                    batch = batcher.collect(accept, first_timeout=0.5)
+                except queue.Empty:
+                    continue
+                t0 = time.perf_counter()
+                pred = non_max_suppression(model(preprocessor.tensor[:len(batch)])[0], 0.25, 0.45)
+                done = time.perf_counter()
+                infer.append((done - t0) / len(batch))
+                latency.extend(done - t for t in accepted)
+            elapsed = time.perf_counter() - t_start
+            stop_event.set()
+            producer.join()
+        counters = img_queue.counters()
+        print('batch %d: %.1f frames/s (mean batch %.1f), %.1f ms inference per frame, latency mean %.0f ms '
+              'p95 %.0f ms, dropped %d of %d'
+              % (batch_size, batcher.frame_num / elapsed, batcher.mean_batch, np.mean(infer) * 1000,
+                 np.mean(latency) * 1000, np.percentile(latency, 95) * 1000, counters['dropped'], counters['put']))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        framePool.py
+@Author：      wzj
+@Description:  预分配帧缓冲池与有界帧队列，用于数据解析线程（生产者）与目标检测线程（消费者）之间传递图像。
+               原实现使用无界queue.Queue()，且每帧放入的是同一个可变的raw_img：检测落后时队列无限增长，
+               消费者还可能读到入队后被修改的图像。此处：
+                   FramePool   固定数量的预分配帧，生产者acquire()取得空闲帧并写入，消费者用完后release()归还
+                   FrameQueue  有界队列，队满时的策略可配置：
+                                   'block'        生产者等待
+                                   'drop_oldest'  丢弃最旧的帧
+                                   'latest'       只保留最新的一帧
+                               并统计丢弃帧数、超时（等待过久）帧数
+               内存占用固定；推理慢于播放时，延迟也有上界。
+@Created：     2026/10/18
+@Modified:
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class Frame(object):
+    def __init__(self, pool, shape):
+        self.pool = pool
+        self.data = np.zeros(shape, dtype=np.uint8)
+        self.index = 0              # 帧对应的ping下标（最新一列）
+        self.timestamp = 0.0        # 入队时刻
+        self.detect = True          # 是否需要目标检测（快速浏览且配置为跳过检测时为False）
+        self.generation = 0         # 瀑布图整屏重写的次数（见Waterfall）
+        self.column = 0             # 瀑布图累计写入的列数，同一generation内两帧之差为左移的列数
+        self.key = None             # 画面标识(数据源, 帧下标, 着色参数, 增益参考值)，相同时画面相同，用于缓存检测结果
+        self.energy_column = None   # 最右一个含目标回波的列（与column同一坐标，见EnergyGate），None表示未知
+        self.bottom = np.full(shape[1], np.nan, dtype=np.float32)  # 每列的海底行号（见BottomTracker），NaN表示没有
+
+    def release(self):
+        self.pool.release(self)
+
+
+class FramePool(object):
+    def __init__(self, size, shape):
+        self.shape = shape
+        self.frames = [Frame(self, shape) for _ in range(size)]
+        self.free = deque(self.frames)
+        self.cond = threading.Condition()
+
+    # 取得一个空闲帧，timeout秒内没有空闲帧时返回None
+    def acquire(self, timeout=None):
+        with self.cond:
+            if not self.cond.wait_for(lambda: len(self.free) > 0, timeout):
+                return None
+            return self.free.popleft()
+
+    def release(self, frame):
+        with self.cond:
+            self.free.append(frame)
+            self.cond.notify()
+
+    # 扩充到至少size帧（不缩小，已借出的帧照常归还）
+    def grow(self, size):
+        with self.cond:
+            while len(self.frames) < size:
+                frame = Frame(self, self.shape)
+                self.frames.append(frame)
+                self.free.append(frame)
+            self.cond.notify_all()
+
+
+class FrameQueue(object):
+    POLICIES = ('block', 'drop_oldest', 'latest')
+
+    def __init__(self, maxsize=2, policy='drop_oldest', max_age=1.0):
+        assert policy in self.POLICIES
+        self.maxsize = maxsize
+        self.policy = policy
+        self.max_age = max_age          # 帧在队列中等待超过max_age秒记为超时
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.put_num = 0
+        self.dropped_num = 0
+        self.aged_num = 0
+
+    def _full(self):
+        return sum(item is not None for item in self.items) >= self.maxsize
+
+    def _drop(self, frame):
+        self.dropped_num += 1
+        frame.release()
+
+    # 放入一帧。'block'策略下timeout秒内队列仍满时丢弃该帧并返回False
+    def put(self, frame, timeout=None):
+        with self.cond:
+            self.put_num += 1
+            frame.timestamp = time.perf_counter()
+            if self.policy == 'latest':
+                for item in [i for i in self.items if i is not None]:
+                    self.items.remove(item)
+                    self._drop(item)
+            elif self.policy == 'drop_oldest':
+                while self._full():
+                    oldest = next(i for i in self.items if i is not None)
+                    self.items.remove(oldest)
+                    self._drop(oldest)
+            elif not self.cond.wait_for(lambda: not self._full(), timeout):
+                self._drop(frame)
+                return False
+            self.items.append(frame)
+            self.cond.notify_all()
+            return True
+
+    # 修改队列容量；缩小时按队满策略丢弃多出的最旧帧
+    def resize(self, maxsize):
+        with self.cond:
+            self.maxsize = max(int(maxsize), 1)
+            while sum(item is not None for item in self.items) > self.maxsize:
+                oldest = next(i for i in self.items if i is not None)
+                self.items.remove(oldest)
+                self._drop(oldest)
+            self.cond.notify_all()
+
+    # 放入唤醒标记None（不受队列容量限制），用于停止时唤醒消费者
+    def put_nowait(self, item):
+        with self.cond:
+            self.items.append(item)
+            self.cond.notify_all()
+
+    # 取出一帧，timeout秒内没有数据时抛出queue.Empty；取得None表示被唤醒
+    def get(self, timeout=None):
+        with self.cond:
+            if not self.cond.wait_for(lambda: len(self.items) > 0, timeout):
+                raise queue.Empty
+            item = self.items.popleft()
+            if item is not None and time.perf_counter() - item.timestamp > self.max_age:
+                self.aged_num += 1
+            self.cond.notify_all()
+        return item
+
+    # 清空队列，帧归还到缓冲池
+    def clear(self):
+        with self.cond:
+            for item in self.items:
+                if item is not None:
+                    item.release()
+            self.items.clear()
+            self.cond.notify_all()
+
+    def qsize(self):
+        with self.cond:
+            return len(self.items)
+
+    def counters(self):
+        return {'put': self.put_num, 'dropped': self.dropped_num, 'aged': self.aged_num}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        framePreprocessor.py
+@Author：      wzj
+@Description:  瀑布图 → 模型输入的预处理。原流程每帧依次执行letterbox（缩放 + 填充，生成新图像）、
+               BGR→RGB切片与transpose、np.ascontiguousarray、torch.from_numpy、.float()、/= 255，
+               共有多次整幅图像的拷贝与内存分配。瀑布图尺寸固定（800×1400），因此：
+                   1. 缩放比例、缩放后尺寸与上下左右填充只在构造时计算一次
+                   2. 输入张量（NCHW，float32/float16/bfloat16）预分配，填充区域一次性写入灰色(114/255)，之后不再改动
+                   3. 每帧只有两遍：cv2.resize写入预分配的缓冲区；每个通道一次torch.mul，
+                      同时完成BGR→RGB、HWC→CHW、uint8→浮点与归一化，直接写入输入张量的有效区域
+               输出与YoLoV5的letterbox(auto=True) + 原转换流程一致。每帧耗时记录在cost中，由检测线程显示。
+               batch > 1时输入张量为(batch, 3, H, W)，第i帧写入第i个位置，用于批量推理。
+               指定ratio时按该比例缩放（用于增量检测的条带：与整帧相同的缩放比例，目标尺度一致）。
+               运行本文件比较两种流程的耗时与结果：python -m modules.framePreprocessor
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+import torch
+
+PAD_VALUE = 114         # 填充灰度，与letterbox一致
+
+
+class FramePreprocessor(object):
+    def __init__(self, shape, imgsz=640, stride=32, dtype=torch.float32, device='cpu', batch=1, ratio=None):
+        self.shape = tuple(shape[:2])           # 输入图像的(高, 宽)
+        self.imgsz = imgsz
+        self.stride = stride
+        height, width = self.shape
+        # 与letterbox(auto=True)相同的几何：按长边缩放，填充到stride的整数倍，左右（上下）平分
+        self.ratio = ratio if ratio is not None else min(imgsz / height, imgsz / width)
+        self.new_unpad = int(round(width * self.ratio)), int(round(height * self.ratio))      # (宽, 高)
+        dw, dh = -self.new_unpad[0] % stride, -self.new_unpad[1] % stride
+        self.pad = dw / 2, dh / 2
+        self.top, self.left = int(round(dh / 2 - 0.1)), int(round(dw / 2 - 0.1))
+        bottom, right = int(round(dh / 2 + 0.1)), int(round(dw / 2 + 0.1))
+        self.input_shape = (self.top + self.new_unpad[1] + bottom, self.left + self.new_unpad[0] + right)
+
+        self.resized = np.empty((self.new_unpad[1], self.new_unpad[0], 3), dtype=np.uint8) \
+            if self.new_unpad != (width, height) else None
+        self.tensor = torch.full((batch, 3) + self.input_shape, PAD_VALUE / 255.0, dtype=dtype, device=device)
+        self.rois = [self.tensor[i, :, self.top:self.top + self.new_unpad[1], self.left:self.left + self.new_unpad[0]]
+                     for i in range(batch)]
+        # CPU上直接写入ROI；其它设备先在CPU上转换为uint8的CHW，再一次拷贝上传
+        self.on_cpu = self.tensor.device.type == 'cpu'
+        self.cost = 0.0             # 最近一帧的耗时（秒）
+        self.cost_ema = 0.0         # 耗时的滑动平均（秒）
+
+    # 是否适用于该图像与参数（不适用时由调用方重新构造）
+    def matches(self, im, imgsz, stride, dtype, batch=1):
+        return im.shape[:2] == self.shape and (imgsz, stride, dtype, batch) == \
+            (self.imgsz, self.stride, self.tensor.dtype, len(self.tensor))
+
+    # BGR（HWC，uint8）图像 → 输入张量的第index个位置，返回前index+1帧组成的(index+1, 3, H, W)张量（会被后续帧覆盖）
+    def __call__(self, im, index=0):
+        t0 = time.perf_counter()
+        if self.resized is not None:
+            cv2.resize(im, self.new_unpad, dst=self.resized, interpolation=cv2.INTER_LINEAR)
+            im = self.resized
+        src = torch.from_numpy(im)
+        roi = self.rois[index]
+        if self.on_cpu:
+            for c in range(3):
+                torch.mul(src[:, :, 2 - c], 1 / 255.0, out=roi[c])
+        else:
+            roi.copy_(src.permute(2, 0, 1).flip(0).to(self.tensor.device, non_blocking=True))
+            roi.mul_(1 / 255.0)
+        self.cost = time.perf_counter() - t0
+        self.cost_ema = self.cost if self.cost_ema == 0 else 0.9 * self.cost_ema + 0.1 * self.cost
+        return self.tensor[:index + 1]
+
+    # 供scale_coords使用的(ratio, pad)，与letterbox的返回值含义相同
+    @property
+    def ratio_pad(self):
+        return (self.ratio, self.ratio), self.pad
+
+
+# 原流程：letterbox + 逐步转换
+def reference_preprocess(im, imgsz, stride):
+    from YoLoV5.augmentations import letterbox
+    img = letterbox(im, imgsz, stride=stride, auto=True)[0]
+    img = img.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
+    img = np.ascontiguousarray(img)
+    img = torch.from_numpy(img).float()
+    img /= 255.0
+    return img.unsqueeze(0)
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--height', type=int, default=800, help='frame height')
+    parser.add_argument('--width', type=int, default=1400, help='frame width')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--frames', type=int, default=200, help='frame number')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    rng = np.random.default_rng(0)
+    im = rng.integers(0, 256, size=(opt.height, opt.width, 3), dtype=np.uint8)
+
+    t0 = time.perf_counter()
+    for _ in range(opt.frames):
+        expected = reference_preprocess(im, opt.imgsz, 32)
+    reference = (time.perf_counter() - t0) / opt.frames * 1000
+
+    for dtype in (torch.float32, torch.bfloat16):
+        preprocessor = FramePreprocessor(im.shape, opt.imgsz, 32, dtype)
+        t0 = time.perf_counter()
+        for _ in range(opt.frames):
+            result = preprocessor(im)
+        fused = (time.perf_counter() - t0) / opt.frames * 1000
+        print('%s -> %s %s: letterbox + convert %.2f ms, fused %.2f ms (%.1fx), max abs diff %.4f'
+              % ((opt.height, opt.width), tuple(result.shape), str(dtype).split('.')[-1], reference, fused,
+                 reference / fused, (result.float() - expected).abs().max().item()))
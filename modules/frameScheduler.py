@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        frameScheduler.py
+@Author：      wzj
+@Description:  按单调时钟截止时刻调度帧。原实现每帧固定msleep(50)后再做耗时不定的工作，
+               实际帧间隔 = 50ms + 渲染耗时，帧率随负载漂移，回放速度与记录的ping速率无关。
+               此处第k帧的截止时刻为t0 + k*interval，等待时间扣除已用的工作时间：
+                   1. 工作超时（错过若干截止时刻）时，wait()返回经过的帧数ticks，调用方据此一次前进ticks帧的数据
+                      （追赶，跳过的帧不显示），回放时间轴始终与真实时间一致
+                   2. 停顿超过max_catch_up帧（暂停、跳转、系统卡顿）时重新同步，不追赶，避免画面跳跃
+                   3. 统计抖动（唤醒时刻与截止时刻之差）、超时次数、丢弃帧数与重新同步次数
+               等待通过ThreadControl.sleep()进行，可被停止请求打断。
+               运行本文件比较固定sleep与截止时刻调度：python -m modules.frameScheduler
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+
+from modules.pipelineControl import ThreadControl
+
+
+class FrameScheduler(object):
+    def __init__(self, interval=0.05, control=None, max_catch_up=5, history=200):
+        self.interval = interval                # 目标帧间隔（秒）
+        self.control = control if control is not None else ThreadControl()
+        self.max_catch_up = max_catch_up        # 最多追赶的帧数，超过后重新同步
+        self.lateness = deque(maxlen=history)   # 最近若干帧的唤醒延迟（秒）
+        self.deadline = None
+        self.reset()
+
+    # 清除统计，下一次wait()从当前时刻重新开始计时
+    def reset(self):
+        self.deadline = None
+        self.lateness.clear()
+        self.frame_num = 0
+        self.overrun_num = 0        # 错过截止时刻（工作超时）的次数
+        self.dropped_num = 0        # 因追赶而跳过显示的帧数
+        self.resync_num = 0         # 停顿过长而重新同步的次数
+        self.start_time = time.perf_counter()
+
+    # 等待到下一个截止时刻，返回经过的帧数（正常为1，超时追赶时大于1）；请求停止时返回0
+    def wait(self):
+        now = time.perf_counter()
+        if self.deadline is None:
+            self.deadline = now + self.interval
+        remaining = self.deadline - now
+        if remaining > 0 and not self.control.sleep(remaining):
+            return 0
+        if self.control.is_stopping:
+            return 0
+        now = time.perf_counter()
+        late = max(now - self.deadline, 0.0)
+        ticks = 1 + int(late // self.interval)
+        if ticks > self.max_catch_up + 1:
+            # 停顿过长：从当前时刻重新开始，不追赶
+            self.resync_num += 1
+            self.deadline = now + self.interval
+            ticks = 1
+        else:
+            if ticks > 1:
+                self.overrun_num += 1
+                self.dropped_num += ticks - 1
+            self.deadline += ticks * self.interval
+        self.lateness.append(late)
+        self.frame_num += 1
+        return ticks
+
+    def counters(self):
+        lateness = np.array(self.lateness) * 1000 if self.lateness else np.zeros(1)
+        elapsed = time.perf_counter() - self.start_time
+        return {'fps': self.frame_num / elapsed if elapsed > 0 else 0.0,
+                'jitter_mean': float(lateness.mean()), 'jitter_p99': float(np.percentile(lateness, 99)),
+                'jitter_max': float(lateness.max()), 'overrun': self.overrun_num,
+                'dropped': self.dropped_num, 'resync': self.resync_num}
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interval', type=float, default=0.05, help='frame interval (s)')
+    parser.add_argument('--frames', type=int, default=100, help='frame number')
+    parser.add_argument('--work', type=float, default=0.02, help='mean work per frame (s)')
+    parser.add_argument('--spike', type=float, default=0.12, help='occasional long frame (s)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 每帧工作耗时不定（偶有长帧）时，比较固定sleep与截止时刻调度的实际帧率与回放时间轴
+    opt = parse_opt()
+    rng = np.random.default_rng(0)
+    work = rng.uniform(0, 2 * opt.work, opt.frames)
+    work[::25] = opt.spike
+
+    t0 = time.perf_counter()
+    for w in work:
+        time.sleep(opt.interval)
+        time.sleep(w)
+    fixed = time.perf_counter() - t0
+
+    scheduler = FrameScheduler(opt.interval)
+    ticks = 0
+    t0 = time.perf_counter()
+    for w in work:
+        ticks += scheduler.wait()
+        time.sleep(w)
+    scheduled = time.perf_counter() - t0
+
+    target = opt.frames * opt.interval
+    print('target %.2f s for %d frames' % (target, opt.frames))
+    print('fixed sleep : %.2f s, %.1f fps, playback position lags %.0f%%'
+          % (fixed, opt.frames / fixed, (1 - target / fixed) * 100))
+    print('deadlines   : %.2f s for %d ticks (%.1f ticks/s), counters %s'
+          % (scheduled, ticks, ticks / scheduled,
+             {k: round(v, 2) for k, v in scheduler.counters().items()}))
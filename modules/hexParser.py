@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        hexParser.py
+@Author：      wzj
+@Description:  单波束探鱼仪hex文本记录的批量解析。
+               每行记录（hex字符）：[0:12]帧头，[12:16]包长度pkg_len（小端），[16:]共pkg_len个uint16采样点（小端）。
+               整段文本一次性 hex → bytes（bytes.fromhex为C实现，并自动跳过换行等空白），
+               再通过NumPy视图按小端uint16读取；各行pkg_len不一致时按不规则（ragged）数组处理。
+               含非hex字符或hex字符数为奇数的行（记录中途截断、乱码）视为空行（pkg_len为0，采样点全0），
+               只转换其余各行，一行损坏不影响其它行。
+               运行本文件可在合成的20000行数据上对比逐点解析与批量解析的耗时：
+                   python -m modules.hexParser --lines 20000 --pkg-len 800
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+HEAD_BYTES = 6                      # 帧头字节数
+LEN_BYTES = 2                       # 包长度字节数
+DATA_OFFSET = HEAD_BYTES + LEN_BYTES    # 采样点起始字节
+GATHER_CHUNK = 4096                 # 不规则行分块拷贝的行数，限制临时索引数组的内存
+HEX_DIGITS = np.zeros(256, dtype=bool)  # 字节是否为hex字符
+HEX_DIGITS[np.frombuffer(b'0123456789abcdefABCDEF', dtype=np.uint8)] = True
+
+
+# 统计文本行数，与readlines()的行数一致（末尾无换行的最后一行也计入）
+def count_lines(text):
+    if not text:
+        return 0
+    return text.count(b'\n') + (0 if text.endswith(b'\n') else 1)
+
+
+# 计算每行的起始位置及hex字符数（不含行尾的\r\n）
+def line_spans(text, max_lines=None):
+    buf = np.frombuffer(text, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord('\n'))
+    if len(buf) and buf[-1] != ord('\n'):
+        ends = np.append(ends, len(buf))
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    if max_lines is not None:
+        starts, ends = starts[:max_lines], ends[:max_lines]
+    # 去掉行尾的\r
+    has_cr = np.zeros(len(ends), dtype=bool)
+    valid = ends > starts
+    has_cr[valid] = buf[ends[valid] - 1] == ord('\r')
+    return starts, ends - starts - has_cr
+
+
+# 损坏的行：含非hex字符或hex字符数为奇数（只在整段转换失败时检查）
+def bad_lines(text, starts, hex_lens):
+    invalid = ~HEX_DIGITS[np.frombuffer(text, dtype=np.uint8)]
+    counts = np.zeros(len(invalid) + 1, dtype=np.int64)
+    np.cumsum(invalid, out=counts[1:])
+    return (counts[starts + hex_lens] > counts[starts]) | (hex_lens % 2 == 1)
+
+
+# 批量解析hex记录，返回(pkg_lens, data)
+#   pkg_lens: 每行的包长度，形状为(行数,)，损坏的行为0
+#   data:     uint16矩阵，形状为(max(pkg_lens), 行数)，第i列为第i行的采样点，较短的行末尾补0
+def parse_hex_records(text, max_lines=None):
+    if isinstance(text, str):
+        text = text.encode('ascii', errors='replace')
+    starts, hex_lens = line_spans(text, max_lines)
+    line_num = len(starts)
+    if line_num == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.uint16)
+
+    # 只转换需要的行，末尾可能存在的残缺行不参与 bytes.fromhex
+    stop = int(starts[-1] + hex_lens[-1])
+    try:
+        blob = bytes.fromhex(text[:stop].decode('ascii'))
+    except ValueError:
+        # 存在损坏的行（非hex字符、奇数个hex字符）：按空行处理，只拼接有效行再转换
+        hex_lens = np.where(bad_lines(text[:stop], starts, hex_lens), 0, hex_lens)
+        blob = bytes.fromhex(b''.join(text[a:a + n] for a, n in zip(starts.tolist(), hex_lens.tolist()) if n)
+                             .decode('ascii'))
+    arr = np.frombuffer(blob, dtype=np.uint8)
+
+    line_bytes = hex_lens // 2
+    offsets = np.zeros(line_num, dtype=np.int64)
+    np.cumsum(line_bytes[:-1], out=offsets[1:])
+
+    # 包长度（小端），并按每行实际字节数截断，避免越界
+    pkg_lens = np.zeros(line_num, dtype=np.int64)
+    has_head = line_bytes >= DATA_OFFSET
+    head = offsets[has_head] + HEAD_BYTES
+    pkg_lens[has_head] = arr[head].astype(np.int64) | (arr[head + 1].astype(np.int64) << 8)
+    pkg_lens = np.minimum(pkg_lens, np.maximum(line_bytes - DATA_OFFSET, 0) // 2)
+
+    height = int(pkg_lens.max())
+    data = np.zeros((height, line_num), dtype=np.uint16)
+    if height == 0:
+        return pkg_lens, data
+
+    if np.all(pkg_lens == height) and np.all(line_bytes == line_bytes[0]):
+        # 常见情况：所有行等长，直接以固定步长的uint16视图读取，无需索引数组
+        view = np.ndarray((line_num, height), dtype='<u2', buffer=blob,
+                          offset=DATA_OFFSET, strides=(int(line_bytes[0]), 2))
+        data[:] = view.T
+        return pkg_lens, data
+
+    # 不规则行：按包长度分组，分块gather后以uint16视图写入
+    for length in np.unique(pkg_lens):
+        if length == 0:
+            continue
+        rows = np.flatnonzero(pkg_lens == length)
+        cols = np.arange(2 * length) + DATA_OFFSET
+        for k in range(0, len(rows), GATHER_CHUNK):
+            r = rows[k:k + GATHER_CHUNK]
+            data[:length, r] = arr[offsets[r, None] + cols].view('<u2').T
+    return pkg_lens, data
+
+
+# 逐点解析（原load_data_to_mem中的实现），仅用于正确性校验与性能对比
+def _parse_hex_records_loop(lines, line_num, height):
+    data = np.zeros((height, line_num), dtype=np.uint16)
+    pkg_len = 0
+    for i in range(line_num):
+        line_str = lines[i]
+        pkg_len = int(line_str[14:16], 16)*256 + int(line_str[12:14], 16)
+        for j in range(pkg_len):
+            data[j, i] = int(line_str[18+j*4:20+j*4], 16)*256 + int(line_str[16+j*4:18+j*4], 16)
+    return pkg_len, data
+
+
+# 采样点(line_num, pkg_len)按记录文件格式编码：每行帧头 + 包长度 + 采样点
+def format_records(samples):
+    line_num, pkg_len = samples.shape
+    head = np.zeros((line_num, HEAD_BYTES), dtype=np.uint8)
+    length = np.full((line_num, 1), pkg_len, dtype='<u2').view(np.uint8)
+    raw = np.hstack([head, length, np.ascontiguousarray(samples, dtype='<u2').view(np.uint8)])
+    return '\n'.join(row.tobytes().hex().upper() for row in raw) + '\n'
+
+
+# 生成合成数据：随机采样点
+def make_synthetic_records(line_num, pkg_len, seed=0):
+    rng = np.random.default_rng(seed)
+    return format_records(rng.integers(0, 65536, size=(line_num, pkg_len), dtype=np.uint16))
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=20000, help='synthetic line number')
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per line')
+    parser.add_argument('--skip-loop', action='store_true', help='skip the slow per-sample reference parser')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    path = os.path.join(tempfile.mkdtemp(), 'synthetic.txt')
+    with open(path, 'w') as f:
+        f.write(make_synthetic_records(opt.lines, opt.pkg_len))
+    print('synthetic file: %s, %.1f MB' % (path, os.path.getsize(path) / 1e6))
+
+    t0 = time.perf_counter()
+    with open(path, 'rb') as f:
+        pkg_lens, data = parse_hex_records(f.read())
+    t_vec = time.perf_counter() - t0
+    print('vectorized: %.3f s' % t_vec)
+
+    if not opt.skip_loop:
+        t0 = time.perf_counter()
+        with open(path, 'r') as f:
+            lines = f.readlines()
+        _, ref = _parse_hex_records_loop(lines, len(lines), opt.pkg_len)
+        t_loop = time.perf_counter() - t0
+        print('per-sample loop: %.3f s' % t_loop)
+        print('identical: %s, speedup: x%.0f' % (np.array_equal(ref, data), t_loop / t_vec))
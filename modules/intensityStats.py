@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        intensityStats.py
+@Author：      wzj
+@Description:  回波强度统计，用于计算数字增益的阈值（threshold）与分母（denominator）。
+               原实现每帧对整个数据缓存求两次np.max；此处在数据加载时按块增量统计一次：
+                   1. 65536级直方图：全局最大值及鲁棒的百分位数（如99.9%）
+                   2. 每个ping的最大值，以及按pyramid_block个ping分块、逐级两两取max的块最大值金字塔，
+                      任意窗口[start, stop)的最大值只需O(pyramid_block + log n)，可用于局部/窗口自动增益
+                   3. 每个深度采样点（bin）的最大值：开启TVG时参考值按补偿后的数据计算（全局最大值模式下精确，
+                      其余模式按全局最大值的变化比例缩放），显示亮度不随补偿整体变暗
+               回放时由后台扫描线程与读取器逐块送入；实时数据按新到达的ping增量送入，
+               此时给出capacity：每个ping的最大值及金字塔为capacity个ping的环形缓冲，只保留最近的数据，内存不随运行时间增长。
+               调节增益只需对缓存的参考值重新缩放，不再访问原始数据。
+@Created：     2026/10/18
+@Modified:
+"""
+
+import threading
+
+import numpy as np
+
+
+class IntensityStats(object):
+    def __init__(self, pyramid_block=64, capacity=None):
+        self.pyramid_block = pyramid_block
+        self.capacity = -(-capacity // pyramid_block) * pyramid_block if capacity else None   # 环形缓冲的ping数
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.hist = np.zeros(65536, dtype=np.int64)     # 采样值直方图
+            self.cdf = None                                 # 直方图累加，按需计算
+            self.seen = set()                               # 已统计的数据段起点，避免重复统计
+            self.ping_max = np.zeros(0, dtype=np.uint16)    # 每个ping的最大值
+            self.bin_max = np.zeros(0, dtype=np.uint16)     # 每个bin的最大值
+            self.pyramid = []                               # 第k层每项为pyramid_block*2^k个ping的最大值
+            self.ping_num = 0                               # 已统计的ping数（最大下标+1）
+            self.max_value = 0
+            if self.capacity:
+                self._reserve(self.capacity)
+
+    # 统计一段数据，data形状为(pkg_len, n)，start为其首个ping的下标。同一start只统计一次；
+    # 环形缓冲（实时数据）只接受追加在已统计数据之后的数据
+    def add(self, start, data):
+        n = data.shape[1]
+        if n == 0:
+            return
+        hist = np.bincount(data.ravel(), minlength=65536)
+        col_max = data.max(axis=0)
+        row_max = data.max(axis=1)
+        with self.lock:
+            if self.capacity:
+                if start < self.ping_num:
+                    return
+            elif start in self.seen:
+                return
+            else:
+                self.seen.add(start)
+            self.hist += hist
+            self.cdf = None
+            self.max_value = max(self.max_value, int(col_max.max()))
+            if len(row_max) > len(self.bin_max):
+                self.bin_max = np.pad(self.bin_max, (0, len(row_max) - len(self.bin_max)))
+            np.maximum(self.bin_max[:len(row_max)], row_max, out=self.bin_max[:len(row_max)])
+            stop = start + n
+            if self.capacity:
+                # 跳过的ping（实时数据来不及处理的部分）清零，环形缓冲中不残留更早的数据
+                lo = max(self.ping_num, stop - self.capacity)
+                values = np.zeros(stop - lo, dtype=np.uint16)
+                values[max(start - lo, 0):] = col_max[max(lo - start, 0):]
+                self.ping_max[np.arange(lo, stop) % self.capacity] = values
+                for a, b in self._segments(lo, stop):
+                    self._update_pyramid(a, b)
+            else:
+                self._reserve(stop)
+                self.ping_max[start:stop] = col_max
+                self._update_pyramid(start, stop)
+            self.ping_num = max(self.ping_num, stop)
+
+    # 实时数据：追加在已统计数据之后
+    def append(self, data):
+        self.add(self.ping_num, data)
+
+    # 百分位数，q取值0~100
+    def percentile(self, q):
+        with self.lock:
+            if self.cdf is None:
+                self.cdf = np.cumsum(self.hist)
+            total = self.cdf[-1]
+            if total == 0:
+                return 0
+            return int(np.searchsorted(self.cdf, total * q / 100.0))
+
+    # 窗口[start, stop)内的最大值；环形缓冲时只统计仍保留的最近capacity个ping
+    def window_max(self, start, stop):
+        with self.lock:
+            start, stop = max(start, 0), min(stop, self.ping_num)
+            if self.capacity:
+                start = max(start, self.ping_num - self.capacity)
+            if stop <= start:
+                return 0
+            return max(self._range_max(a, b) for a, b in self._segments(start, stop))
+
+    # ping下标[start, stop)在ping_max中的位置区间（环形缓冲时可能分为两段）
+    def _segments(self, start, stop):
+        if not self.capacity:
+            return [(start, stop)]
+        lo, hi = start % self.capacity, (stop - 1) % self.capacity + 1
+        if lo < hi:
+            return [(lo, hi)]
+        return [(lo, self.capacity), (0, hi)]
+
+    # ping_max中位置区间[start, stop)的最大值，完整覆盖的块查金字塔
+    def _range_max(self, start, stop):
+        if stop <= start:
+            return 0
+        b = self.pyramid_block
+        lo, hi = -(-start // b), stop // b          # 完整覆盖的块[lo, hi)
+        if hi <= lo:
+            return int(self.ping_max[start:stop].max())
+        result = max(int(self.ping_max[start:lo * b].max(initial=0)),
+                     int(self.ping_max[hi * b:stop].max(initial=0)))
+        for level in self.pyramid:
+            if lo >= hi:
+                break
+            if lo & 1:
+                result = max(result, int(level[lo]))
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = max(result, int(level[hi]))
+            lo //= 2
+            hi //= 2
+        return result
+
+    # 增益参考值：mode为'max'（全局最大值）、'percentile'（全局百分位数）或'window'（窗口最大值）；
+    # gain为TVG的增益向量（(pkg_len, 1)，见TvgGain.vector()），给出时返回补偿后数据的参考值
+    def reference(self, mode='max', q=99.9, start=0, stop=0, gain=None):
+        if mode == 'percentile':
+            reference = self.percentile(q)
+        elif mode == 'window':
+            reference = self.window_max(start, stop)
+        else:
+            reference = self.max_value
+        if gain is not None:
+            reference = int(reference * self.gain_scale(gain))
+        return reference
+
+    # TVG补偿后与补偿前全局最大值之比（不超过1）
+    def gain_scale(self, gain):
+        with self.lock:
+            n = min(len(self.bin_max), len(gain))
+            raw = int(self.bin_max[:n].max(initial=0))
+            if raw == 0:
+                return 1.0
+            return float((self.bin_max[:n] * gain.ravel()[:n]).max()) / raw
+
+    # 按需扩容ping_max及各层金字塔（容量翻倍）
+    def _reserve(self, n):
+        if n <= len(self.ping_max):
+            return
+        b = self.pyramid_block
+        capacity = -(-max(n, 2 * len(self.ping_max), 4 * b) // b) * b
+        ping_max = np.zeros(capacity, dtype=np.uint16)
+        ping_max[:len(self.ping_max)] = self.ping_max
+        self.ping_max = ping_max
+        pyramid = []
+        size = capacity // b
+        while True:
+            level = np.zeros(size, dtype=np.uint16)
+            if len(pyramid) < len(self.pyramid):
+                old = self.pyramid[len(pyramid)]
+                level[:len(old)] = old
+            pyramid.append(level)
+            if size == 1:
+                break
+            size = -(-size // 2)
+        self.pyramid = pyramid
+
+    # 只重新计算[start, stop)所在的块及其上层
+    def _update_pyramid(self, start, stop):
+        b = self.pyramid_block
+        lo, hi = start // b, -(-stop // b)
+        self.pyramid[0][lo:hi] = self.ping_max[lo * b:hi * b].reshape(-1, b).max(axis=1)
+        for k in range(1, len(self.pyramid)):
+            lo, hi = lo // 2, -(-hi // 2)
+            below = self.pyramid[k - 1]
+            pairs = below[2 * lo:2 * hi]
+            if len(pairs) % 2:
+                pairs = np.append(pairs, 0)
+            self.pyramid[k][lo:lo + len(pairs) // 2] = pairs.reshape(-1, 2).max(axis=1)
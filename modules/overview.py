@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        overview.py
+@Author：      wzj
+@Description:  整个记录文件的缩略回波图（显示在进度条上方），用于快速找到有目标的位置。
+               由数据解析线程的后台扫描逐块送入：深度方向每row_factor个采样点、时间方向每bin_lines个ping
+               取最大值（max-pooling），细小的鱼迹在降采样后仍然可见。
+               缩略图列数与进度条刻度数相同，第k列对应进度条的第k格；内存占用固定为rows*width个uint16，与文件长度无关。
+               建成后保存在数据文件旁（<文件名>.ovw），再次打开同一文件时直接读取。
+               运行本文件测试构建速度：python -m modules.overview
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+from modules.dataCache import source_signature
+
+
+OVERVIEW_MAGIC = b'SBPO'
+OVERVIEW_VERSION = 1
+OVERVIEW_SUFFIX = '.ovw'
+OVERVIEW_HEADER_FMT = '<4sHHIIIIQQQ16s'     # magic, version, 保留, 行数, 列数, row_factor, bin_lines, ping数, 源文件大小, mtime(ns), 摘要
+OVERVIEW_HEADER_SIZE = 64
+
+
+class Overview(object):
+    def __init__(self, line_num, pkg_len, width=1000, height=100):
+        self.line_num = line_num
+        self.pkg_len = pkg_len
+        self.bin_lines = max(-(-line_num // width), 1)         # 每列对应的ping数
+        self.row_factor = max(-(-pkg_len // height), 1)        # 每行对应的采样点数
+        self.data = np.zeros((max(-(-pkg_len // self.row_factor), 1), max(-(-line_num // self.bin_lines), 1)),
+                             dtype=np.uint16)
+        self.added_lines = 0        # 已送入的ping数
+        self.complete = False
+
+    # 送入一段数据，block形状为(pkg_len, n)，start为首个ping的下标
+    def add(self, start, block):
+        n = block.shape[1]
+        if n == 0:
+            return
+        bins = (start + np.arange(n)) // self.bin_lines
+        firsts = np.concatenate(([0], np.flatnonzero(np.diff(bins)) + 1))
+        cols = bins[firsts]
+        # 先在时间方向池化（列数大幅减少），再在深度方向池化
+        pooled = np.maximum.reduceat(block[:self.pkg_len], firsts, axis=1)
+        pooled = np.maximum.reduceat(pooled, np.arange(0, len(pooled), self.row_factor), axis=0)
+        rows = len(pooled)
+        self.data[:rows, cols] = np.maximum(self.data[:rows, cols], pooled)
+        self.added_lines += n
+
+    # 着色为BGR图像，参考值为整个文件的最大值
+    def render(self, color_map, gain):
+        reference = int(self.data.max())
+        denominator = reference * gain / 100
+        return color_map.render(self.data, reference - denominator, denominator)
+
+    @staticmethod
+    def cache_path(source):
+        return source + OVERVIEW_SUFFIX
+
+    def save(self, source):
+        size, mtime_ns, digest = source_signature(source)
+        rows, cols = self.data.shape
+        header = struct.pack(OVERVIEW_HEADER_FMT, OVERVIEW_MAGIC, OVERVIEW_VERSION, 0, rows, cols,
+                             self.row_factor, self.bin_lines, self.line_num, size, mtime_ns, digest)
+        path = self.cache_path(source)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(header.ljust(OVERVIEW_HEADER_SIZE, b'\0'))
+                f.write(self.data.astype('<u2').tobytes())
+            os.replace(tmp_path, path)
+        except OSError:
+            pass        # 数据文件所在目录不可写时不缓存
+
+    # 读取缓存，源文件已变化或参数不一致时返回None
+    @classmethod
+    def load(cls, source, line_num, pkg_len, width=1000, height=100):
+        overview = cls(line_num, pkg_len, width, height)
+        try:
+            with open(cls.cache_path(source), 'rb') as f:
+                header = f.read(OVERVIEW_HEADER_SIZE)
+                magic, version, _, rows, cols, row_factor, bin_lines, cached_lines, size, mtime_ns, digest = \
+                    struct.unpack(OVERVIEW_HEADER_FMT, header[:struct.calcsize(OVERVIEW_HEADER_FMT)])
+                if magic != OVERVIEW_MAGIC or version != OVERVIEW_VERSION \
+                        or (rows, cols) != overview.data.shape or (row_factor, bin_lines) != \
+                        (overview.row_factor, overview.bin_lines) or cached_lines != line_num \
+                        or (size, mtime_ns, digest) != source_signature(source):
+                    return None
+                data = np.frombuffer(f.read(), dtype='<u2')
+        except (OSError, struct.error):
+            return None
+        if data.size != rows * cols:
+            return None
+        overview.data = data.reshape(rows, cols).astype(np.uint16)
+        overview.added_lines = line_num
+        overview.complete = True
+        return overview
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pings', type=int, default=1000000, help='ping number')
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per ping')
+    parser.add_argument('--block', type=int, default=1024, help='pings per block')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 构建速度与正确性：按块送入，与对整幅数据直接max-pooling的结果比较
+    opt = parse_opt()
+    rng = np.random.default_rng(0)
+    block = rng.integers(0, 1000, size=(opt.pkg_len, opt.block), dtype=np.uint16)
+    block[rng.integers(0, opt.pkg_len, 20), rng.integers(0, opt.block, 20)] = 60000     # 孤立的强回波
+    overview = Overview(opt.pings, opt.pkg_len)
+    t0 = time.perf_counter()
+    for start in range(0, opt.pings, opt.block):
+        overview.add(start, block[:, :min(opt.block, opt.pings - start)])
+    elapsed = time.perf_counter() - t0
+    print('%d pings: %.2f s (%.1f us per block), overview %s, %.0f KB'
+          % (opt.pings, elapsed, elapsed / -(-opt.pings // opt.block) * 1e6, overview.data.shape,
+             overview.data.nbytes / 1024))
+
+    small = Overview(10000, opt.pkg_len)
+    full = np.tile(block, (1, -(-10000 // opt.block)))[:, :10000]
+    for start in range(0, 10000, 777):
+        small.add(start, full[:, start:start + 777])
+    rows, cols = small.data.shape
+    padded = np.zeros((rows * small.row_factor, cols * small.bin_lines), dtype=np.uint16)
+    padded[:opt.pkg_len, :10000] = full
+    expected = padded.reshape(rows, small.row_factor, cols, small.bin_lines).max(axis=(1, 3))
+    print('matches direct max-pooling:', np.array_equal(small.data, expected),
+          '; strong echoes kept:', int((small.data == 60000).sum()))
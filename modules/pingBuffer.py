@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        pingBuffer.py
+@Author：      wzj
+@Description:  实时数据的ping环形缓冲区。UDP接收线程写入，数据解析线程读取。
+               ping下标单调递增（head为已写入的ping总数），缓冲区只保留最近capacity个ping；
+               read()的接口与pingReader.PingReader一致，解析线程可以用同样的方式渲染回放数据与实时数据。
+@Created：     2026/10/18
+@Modified:
+"""
+
+import threading
+
+import numpy as np
+
+
+class PingRingBuffer(object):
+    def __init__(self, height=800, capacity=16384):
+        self.height = height
+        self.capacity = capacity
+        self.data = np.zeros((height, capacity), dtype=np.uint16)
+        self.head = 0               # 已写入的ping总数，下一个ping的下标
+        self.pkg_len = 0            # 最近一个ping的包长度
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.data[:] = 0
+            self.head = 0
+            self.pkg_len = 0
+
+    # 写入n个ping，samples形状为(n, pkg_len)（与网络包中的排列一致）
+    def write(self, samples):
+        n, pkg_len = samples.shape
+        pkg_len = min(pkg_len, self.height)
+        with self.lock:
+            head = self.head
+            if n > self.capacity:           # 只保留最新的capacity个ping
+                samples = samples[n - self.capacity:]
+                head += n - self.capacity
+                n = self.capacity
+            pos = head % self.capacity
+            first = min(n, self.capacity - pos)
+            self._write_columns(pos, samples[:first], pkg_len)
+            if first < n:
+                self._write_columns(0, samples[first:], pkg_len)
+            self.head = head + n
+            self.pkg_len = pkg_len
+
+    # 写入n个空白ping（丢包时占位，保持时间轴连续）
+    def write_blank(self, n):
+        self.write(np.zeros((n, self.pkg_len), dtype=np.uint16))
+
+    def _write_columns(self, pos, samples, pkg_len):
+        n = len(samples)
+        self.data[:pkg_len, pos:pos + n] = samples[:, :pkg_len].T
+        self.data[pkg_len:, pos:pos + n] = 0
+
+    # 读取[start, start+count)的ping，返回形状为(pkg_len, count)的uint16矩阵；已被覆盖或尚未写入的部分补0
+    def read(self, start, count):
+        with self.lock:
+            out = np.zeros((self.pkg_len, count), dtype=np.uint16)
+            lo = max(start, self.head - self.capacity, 0)
+            hi = min(start + count, self.head)
+            while lo < hi:
+                pos = lo % self.capacity
+                n = min(hi - lo, self.capacity - pos)
+                out[:, lo - start:lo - start + n] = self.data[:self.pkg_len, pos:pos + n]
+                lo += n
+            return out
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        pingReader.py
+@Author：      wzj
+@Description:  流式ping读取：不再把整个记录文件加载进内存，只在播放位置前后保留一个滑动窗口，
+               后台线程按播放方向预读，内存占用与文件长度无关。
+               数据源：
+                   TextPingSource  hex文本记录，按块定位并解析
+                   CachePingSource 已解析的二进制缓存（内存映射）
+               PingReader按固定行数分块缓存ping，窗口外的块被淘汰。
+               PingIndex为hex文本建立并持久化行偏移索引，跳转到任意位置只需读取目标屏幕所需的ping。
+               运行本文件可测试大文件的跳转延迟：python -m modules.pingReader --mb 1000
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from modules.hexParser import parse_hex_records
+from modules.dataCache import source_signature
+
+
+SCAN_CHUNK = 16 * 1024 * 1024       # 扫描换行符时每次读取的字节数
+INDEX_MAGIC = b'SBPI'
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx'
+INDEX_HEADER_FMT = '<4sHHIQQQ16s'   # magic, version, 保留, stride, 行数, 源文件大小, 源文件mtime(ns), 摘要
+INDEX_HEADER_SIZE = 64
+
+
+# 行偏移索引：记录每stride行首行的字节偏移，保存在数据文件旁（<文件名>.idx），
+# 再次打开时直接读取，无需重新扫描；定位任意行只需读取其所在的stride行
+class PingIndex(object):
+    def __init__(self, path, stride=256):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.stride = stride
+        self.offsets = None         # 第k个元素为第k*stride行的字节偏移，最后一个元素为文件大小
+        self.line_num = 0           # 文件总行数（与readlines()一致）
+        if not self.load():
+            self.build()
+            self.save()
+
+    def load(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = f.read(INDEX_HEADER_SIZE)
+                magic, version, _, stride, line_num, size, mtime_ns, digest = \
+                    struct.unpack(INDEX_HEADER_FMT, header[:struct.calcsize(INDEX_HEADER_FMT)])
+                if magic != INDEX_MAGIC or version != INDEX_VERSION or stride != self.stride \
+                        or (size, mtime_ns, digest) != source_signature(self.path):
+                    return False
+                offsets = np.frombuffer(f.read(), dtype='<i8')
+        except (OSError, struct.error):
+            return False
+        if len(offsets) != (line_num + stride - 1) // stride + 1:
+            return False
+        self.offsets = offsets.astype(np.int64)
+        self.line_num = line_num
+        return True
+
+    # 顺序扫描一遍文件，统计行数并记录每stride行的字节偏移
+    def build(self):
+        offsets = [np.zeros(1, dtype=np.int64)]
+        line_num = 0
+        pos = 0
+        last = b''
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = f.read(SCAN_CHUNK)
+                if not chunk:
+                    break
+                nl = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n'))
+                # 第j个换行符之后是第(line_num+j+1)行的起点
+                first = (-line_num - 1) % self.stride
+                offsets.append(nl[first::self.stride].astype(np.int64) + pos + 1)
+                line_num += len(nl)
+                pos += len(chunk)
+                last = chunk[-1:]
+        if pos and last != b'\n':
+            line_num += 1
+        offsets = np.concatenate(offsets)
+        self.offsets = np.append(offsets[offsets < pos], pos)
+        self.line_num = line_num
+
+    def save(self):
+        size, mtime_ns, digest = source_signature(self.path)
+        header = struct.pack(INDEX_HEADER_FMT, INDEX_MAGIC, INDEX_VERSION, 0, self.stride, self.line_num,
+                             size, mtime_ns, digest)
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(header.ljust(INDEX_HEADER_SIZE, b'\0'))
+                f.write(self.offsets.astype('<i8').tobytes())
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass        # 数据文件所在目录不可写时只在内存中使用索引
+
+    # 读取[start, stop)行的原始文本：从start所在stride的起点读起，再跳过多余的行
+    def read_lines(self, start, stop):
+        first = start // self.stride
+        last = min((stop + self.stride - 1) // self.stride, len(self.offsets) - 1)
+        with open(self.path, 'rb') as f:
+            f.seek(int(self.offsets[first]))
+            text = f.read(int(self.offsets[last] - self.offsets[first]))
+        skip = start - first * self.stride
+        if skip:
+            nl = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == ord('\n'))
+            text = text[nl[skip - 1] + 1:] if skip <= len(nl) else b''
+        return text
+
+    # 读取第line行附近起的count行原始文本（快速预览用）：按所在stride的平均行长估计字节偏移，
+    # 从其后的第一个行首读起，不读取stride内前面的行；行长不均匀时实际起始行有偏差
+    def read_near(self, line, count):
+        k = min(line // self.stride, len(self.offsets) - 2)
+        lo, hi = int(self.offsets[k]), int(self.offsets[k + 1])
+        line_len = (hi - lo) / max(min(self.stride, self.line_num - k * self.stride), 1)
+        start = max(lo + int((line - k * self.stride) * line_len) - 1, lo)
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            text = f.read(int(line_len * (count + 2)) + 1)
+        if start > lo:
+            text = text[text.find(b'\n') + 1:]     # 从估计位置之后的第一个行首开始（找不到时为空）
+        return text[:text.rfind(b'\n') + 1]       # 去掉末尾不完整的行
+
+
+# hex文本数据源
+class TextPingSource(object):
+    def __init__(self, path, block_lines=1024, index=None):
+        self.path = path
+        self.block_lines = block_lines
+        self.index = index if index is not None else PingIndex(path)
+        self.total_line_num = max(self.index.line_num - 1, 0)     # 与原实现一致，最后一行（可能不完整）不使用
+        self.pkg_len = 0
+        if self.total_line_num > 0:
+            self.pkg_len = int(parse_hex_records(self.index.read_lines(0, 1), 1)[0][0])
+
+    @property
+    def block_num(self):
+        return (self.total_line_num + self.block_lines - 1) // self.block_lines
+
+    # 读取并解析[start, start+count)行，返回形状为(pkg_len, 行数)的uint16矩阵
+    def read_lines(self, start, count):
+        stop = min(start + count, self.total_line_num)
+        _, data = parse_hex_records(self.index.read_lines(start, stop), stop - start)
+        return _fit_height(data, self.pkg_len)
+
+    # 读取第start行附近起的count行（快速预览用，见PingIndex.read_near），不足count行时补0
+    def read_near(self, start, count):
+        _, data = parse_hex_records(self.index.read_near(start, count), count)
+        out = np.zeros((self.pkg_len, count), dtype=np.uint16)
+        out[:, :data.shape[1]] = _fit_height(data, self.pkg_len)
+        return out
+
+    def read_block(self, block):
+        return self.read_lines(block * self.block_lines, self.block_lines)
+
+
+# 二进制缓存数据源，data为DataCache.load()返回的(行数, pkg_len)内存映射
+class CachePingSource(object):
+    def __init__(self, pkg_len, data, block_lines=1024):
+        self.data = data
+        self.block_lines = block_lines
+        self.total_line_num = len(data)
+        self.pkg_len = pkg_len
+
+    @property
+    def block_num(self):
+        return (self.total_line_num + self.block_lines - 1) // self.block_lines
+
+    def read_lines(self, start, count):
+        return np.ascontiguousarray(self.data[start:start + count].T)
+
+    def read_near(self, start, count):
+        return self.read_lines(start, count)
+
+    def read_block(self, block):
+        return self.read_lines(block * self.block_lines, self.block_lines)
+
+
+# 各行pkg_len不一致时，统一补0/截断到数据源的pkg_len
+def _fit_height(data, height):
+    if data.shape[0] == height:
+        return data
+    out = np.zeros((height, data.shape[1]), dtype=np.uint16)
+    h = min(height, data.shape[0])
+    out[:h] = data[:h]
+    return out
+
+
+class PingReader(object):
+    def __init__(self, source, behind_lines=2800, ahead_lines=4200, on_block=None, on_error=None):
+        self.source = source
+        self.on_block = on_block                # 新块加载完成后的回调on_block(首行下标, data)，用于增量统计
+        self.on_error = on_error                # 首次读取失败时的回调on_error(块号, 异常)，只调用一次
+        self.block_lines = source.block_lines
+        self.total_line_num = source.total_line_num
+        self.pkg_len = source.pkg_len
+        self.behind_lines = behind_lines        # 播放位置之前保留的行数
+        self.ahead_lines = ahead_lines          # 播放位置之后预读的行数
+        self.capacity = (behind_lines + ahead_lines) // self.block_lines + 3    # 最多缓存的块数
+        self.blocks = OrderedDict()             # 块号 → (pkg_len, block_lines) uint16
+        self.loading = set()                    # 正在加载的块号
+        self.failed = {}                        # 读取失败的块号 → 异常，不再重试，读取时返回空白块
+        self.playhead = 0
+        self.hit_num = 0
+        self.miss_num = 0
+        self.cond = threading.Condition()
+        self.closed = False
+        self.prefetch_thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+        self.prefetch_thread.start()
+
+    # 更新播放位置，唤醒预读线程
+    def set_playhead(self, line):
+        with self.cond:
+            self.playhead = line
+            self.cond.notify_all()
+
+    # 读取[start, start+count)行，返回形状为(pkg_len, count)的uint16矩阵；超出文件范围的部分补0
+    def read(self, start, count):
+        out = np.zeros((self.pkg_len, count), dtype=np.uint16)
+        start_block = max(start, 0) // self.block_lines
+        stop = min(start + count, self.total_line_num)
+        stop_block = (stop - 1) // self.block_lines + 1 if stop > max(start, 0) else start_block
+        for block in range(start_block, stop_block):
+            data = self._get_block(block)
+            b0 = block * self.block_lines
+            lo, hi = max(start, b0), min(stop, b0 + data.shape[1])
+            out[:, lo - start:hi - start] = data[:, lo - b0:hi - b0]
+        return out
+
+    # 不经过块缓存直接从数据源读取[start, start+count)行（快速浏览时一屏跨越的ping数远超缓存窗口），超出文件范围的部分补0
+    def read_direct(self, start, count):
+        out = np.zeros((self.pkg_len, count), dtype=np.uint16)
+        lo, hi = max(start, 0), min(start + count, self.total_line_num)
+        if hi > lo:
+            out[:, lo - start:hi - start] = self.source.read_lines(lo, hi - lo)
+        return out
+
+    # 读取第start行附近的count行（快速预览用，hex文本按平均行长定位，不保证恰好从第start行开始），超出文件范围时补0
+    def read_near(self, start, count):
+        start = min(max(start, 0), self.total_line_num - 1)
+        count = min(count, self.total_line_num - start)
+        if count <= 0:
+            return np.zeros((self.pkg_len, 0), dtype=np.uint16)
+        return self.source.read_near(start, count)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.blocks.clear()
+            self.cond.notify_all()
+
+    def _get_block(self, block):
+        with self.cond:
+            while block in self.loading:        # 预读线程正在加载，等待其完成
+                self.cond.wait()
+            if block in self.blocks:
+                self.hit_num += 1
+                self.blocks.move_to_end(block)
+                return self.blocks[block]
+            if block in self.failed:
+                return self._blank(block)
+            self.miss_num += 1
+            self.loading.add(block)
+        return self._load(block)
+
+    def _load(self, block):
+        error = None
+        try:
+            data = self.source.read_block(block)
+        except (OSError, ValueError) as e:
+            data, error = None, e
+        finally:
+            with self.cond:
+                self.loading.discard(block)
+                if error is not None:
+                    first = not self.failed
+                    self.failed[block] = error
+                self.cond.notify_all()
+        if error is not None:
+            if first and self.on_error is not None:
+                self.on_error(block, error)
+            return self._blank(block)
+        if self.on_block is not None:
+            self.on_block(block * self.block_lines, data)
+        with self.cond:
+            if not self.closed:
+                self.blocks[block] = data
+                self._evict()
+        return data
+
+    # 读取失败的块以空白（全0）代替
+    def _blank(self, block):
+        lines = min(self.block_lines, self.total_line_num - block * self.block_lines)
+        return np.zeros((self.pkg_len, max(lines, 0)), dtype=np.uint16)
+
+    # 窗口内应当缓存的块号范围[first, last]
+    def _wanted(self):
+        first = max(self.playhead - self.behind_lines, 0) // self.block_lines
+        last = min(self.playhead + self.ahead_lines, self.total_line_num - 1) // self.block_lines
+        return first, max(last, first)
+
+    def _evict(self):
+        first, last = self._wanted()
+        for block in list(self.blocks):
+            if len(self.blocks) <= self.capacity:
+                break
+            if not first <= block <= last:
+                del self.blocks[block]
+        while len(self.blocks) > self.capacity:
+            self.blocks.popitem(last=False)
+
+    # 预读线程：优先加载播放位置之后的块，再补齐之前的块
+    def _next_missing(self):
+        if self.total_line_num == 0:
+            return None
+        first, last = self._wanted()
+        current = max(self.playhead, 0) // self.block_lines
+        order = list(range(current, last + 1)) + list(range(current - 1, first - 1, -1))
+        for block in order:
+            if block not in self.blocks and block not in self.loading and block not in self.failed:
+                return block
+        return None
+
+    def _prefetch_loop(self):
+        while True:
+            with self.cond:
+                block = self._next_missing()
+                while block is None and not self.closed:
+                    self.cond.wait()
+                    block = self._next_missing()
+                if self.closed:
+                    return
+                self.loading.add(block)
+            self._load(block)       # 读取失败的块记入failed，不再重试
+
+
+# 生成指定大小的合成hex记录文件（重复写入一段随机行，生成速度快）
+def _make_large_file(path, size_mb, pkg_len):
+    from modules.hexParser import make_synthetic_records
+    chunk = make_synthetic_records(1000, pkg_len).encode('ascii')
+    with open(path, 'wb') as f:
+        for _ in range(max(int(size_mb * 1e6 / len(chunk)), 1)):
+            f.write(chunk)
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mb', type=float, default=1000, help='synthetic file size (MB)')
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per line')
+    parser.add_argument('--seeks', type=int, default=50, help='random seek number')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 跳转延迟测试：python -m modules.pingReader --mb 1000
+    opt = parse_opt()
+    path = os.path.join(tempfile.mkdtemp(), 'synthetic.txt')
+    _make_large_file(path, opt.mb, opt.pkg_len)
+    print('synthetic file: %s, %.1f MB' % (path, os.path.getsize(path) / 1e6))
+
+    t0 = time.perf_counter()
+    PingIndex(path)
+    print('first open (scan + save index): %.3f s' % (time.perf_counter() - t0))
+    t0 = time.perf_counter()
+    source = TextPingSource(path)
+    print('reopen (load index): %.3f s, %d lines' % (time.perf_counter() - t0, source.total_line_num))
+
+    rng = np.random.default_rng(0)
+    latency = []
+    for target in rng.integers(0, max(source.total_line_num - 1400, 1), opt.seeks):
+        t0 = time.perf_counter()
+        source.read_lines(int(target), 1400)      # 目标屏幕所需的ping
+        latency.append(time.perf_counter() - t0)
+    latency = np.array(latency) * 1000
+    print('seek latency (one screen): mean %.1f ms, max %.1f ms' % (latency.mean(), latency.max()))
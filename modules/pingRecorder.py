@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        pingRecorder.py
+@Author：      wzj
+@Description:  实时数据的异步原始记录。UDP接收线程把收到的ping交给记录器（submit()只入队，不等待磁盘），
+               专用的写线程从有界队列取出后以大缓冲顺序写入，队列满时丢弃并计数，接收与显示链路不会被磁盘阻塞。
+               文件格式（小端）：
+                   文件头64字节    magic b'SBPR'、版本、创建时间
+                   数据块          块头'<4sIIHHd'：b'PCHK'、载荷字节数、ping数n、pkg_len、保留、接收时刻
+                                   载荷：n个uint32序号 + n*pkg_len个uint16采样点（按ping排列）
+               每个数据块在<文件名>.idx中追加一条(首个ping下标, 块偏移)，回放时二分查找即可定位任意ping。
+               文件按大小或时长轮转。counters()给出写入吞吐量、队列深度、丢弃数等。
+               写入出错（磁盘满、I/O错误）时写线程记录异常（error，counters()中的'error'）后退出，
+               之后提交的数据直接丢弃并计数；stop()有超时，不会因写线程已退出而阻塞。
+               运行本文件测试写入吞吐量：python -m modules.pingRecorder
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+RECORD_MAGIC = b'SBPR'
+RECORD_VERSION = 1
+RECORD_SUFFIX = '.sbpr'
+RECORD_HEADER_FMT = '<4sHHd'        # magic, version, 保留, 创建时间
+RECORD_HEADER_SIZE = 64
+CHUNK_MAGIC = b'PCHK'
+CHUNK_HEADER_FMT = '<4sIIHHd'       # magic, 载荷字节数, ping数, pkg_len, 保留, 接收时刻
+CHUNK_HEADER_SIZE = struct.calcsize(CHUNK_HEADER_FMT)
+INDEX_SUFFIX = '.idx'
+INDEX_DTYPE = np.dtype([('ping', '<u8'), ('offset', '<u8')])
+
+
+class PingRecorder(object):
+    def __init__(self, directory, max_bytes=1024 ** 3, max_seconds=3600, queue_size=256,
+                 buffer_bytes=8 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes              # 单个文件的最大字节数，超过后轮转
+        self.max_seconds = max_seconds          # 单个文件的最长时长（秒），超过后轮转
+        self.buffer_bytes = buffer_bytes        # 文件写缓冲大小
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.error = None                       # 写线程退出的异常，None表示正常
+        self.paths = []                         # 已创建的记录文件
+        self.file = None
+        self.index_file = None
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.chunk_num = 0
+        self.ping_num = 0
+        self.byte_num = 0
+        self.dropped_num = 0                    # 队列满时丢弃的ping数
+        self.max_depth = 0                      # 队列深度峰值
+        self.write_time = 0.0                   # 写线程花在写入上的时间（秒）
+        self.rate_time = time.perf_counter()
+        self.rate_bytes = 0
+        self.byte_rate = 0.0                    # byte/s
+
+    @property
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.reset_counters()
+        self.error = None
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    # 提交一批ping，samples形状为(n, pkg_len)；从不阻塞，队列满或写线程未运行（未启动、出错退出）时丢弃并返回False。
+    # 调用后不得再修改samples
+    def submit(self, seqs, samples):
+        if not self.is_running:
+            self.dropped_num += len(samples)
+            return False
+        try:
+            self.queue.put_nowait((time.time(), seqs, samples))
+        except queue.Full:
+            self.dropped_num += len(samples)
+            return False
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    # 写完队列中已有的数据后停止；写线程已退出或timeout秒内未写完时不再等待，返回是否已停止
+    def stop(self, timeout=5.0):
+        if self.thread is None:
+            return True
+        if self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.thread.join(timeout)
+        stopped = not self.thread.is_alive()
+        if stopped:
+            # 写线程出错退出时队列中剩余的数据无法写入，计为丢弃
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item:
+                    self.dropped_num += len(item[2])
+            self.thread = None
+        return stopped
+
+    def counters(self):
+        now = time.perf_counter()
+        if now - self.rate_time >= 1.0:
+            self.byte_rate = (self.byte_num - self.rate_bytes) / (now - self.rate_time)
+            self.rate_time, self.rate_bytes = now, self.byte_num
+        return {'chunk': self.chunk_num, 'ping': self.ping_num, 'byte': self.byte_num, 'byte_rate': self.byte_rate,
+                'depth': self.queue.qsize(), 'max_depth': self.max_depth, 'dropped': self.dropped_num,
+                'write_time': self.write_time, 'file': len(self.paths),
+                'error': None if self.error is None else str(self.error)}
+
+    def _open(self):
+        name = time.strftime('live_%Y%m%d_%H%M%S', time.localtime())
+        path = os.path.join(self.directory, name + RECORD_SUFFIX)
+        k = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, '%s_%d%s' % (name, k, RECORD_SUFFIX))
+            k += 1
+        self.file = open(path, 'wb', buffering=self.buffer_bytes)
+        self.index_file = open(path + INDEX_SUFFIX, 'wb')
+        header = struct.pack(RECORD_HEADER_FMT, RECORD_MAGIC, RECORD_VERSION, 0, time.time())
+        self.file.write(header.ljust(RECORD_HEADER_SIZE, b'\0'))
+        self.file_bytes = RECORD_HEADER_SIZE
+        self.file_pings = 0
+        self.file_time = time.perf_counter()
+        self.paths.append(path)
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            self.index_file.close()
+            self.file = None
+            self.index_file = None
+
+    def _write_chunk(self, timestamp, seqs, samples):
+        if self.file is None or self.file_bytes >= self.max_bytes \
+                or time.perf_counter() - self.file_time >= self.max_seconds:
+            self._close()
+            self._open()
+        n, pkg_len = samples.shape
+        seqs = np.ascontiguousarray(seqs, dtype='<u4')
+        samples = np.ascontiguousarray(samples, dtype='<u2')
+        size = seqs.nbytes + samples.nbytes
+        self.index_file.write(np.array([(self.file_pings, self.file_bytes)], dtype=INDEX_DTYPE).tobytes())
+        self.file.write(struct.pack(CHUNK_HEADER_FMT, CHUNK_MAGIC, size, n, pkg_len, 0, timestamp))
+        self.file.write(memoryview(seqs).cast('B'))
+        self.file.write(memoryview(samples).cast('B'))
+        self.file_bytes += CHUNK_HEADER_SIZE + size
+        self.file_pings += n
+        self.chunk_num += 1
+        self.ping_num += n
+        self.byte_num += CHUNK_HEADER_SIZE + size
+
+    def _write_loop(self):
+        last_flush = time.perf_counter()
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=1.0)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    t0 = time.perf_counter()
+                    self._write_chunk(*item)
+                    self.write_time += time.perf_counter() - t0
+                # 每秒把缓冲写入文件，异常退出时最多丢失约1秒的数据
+                if self.file is not None and time.perf_counter() - last_flush >= 1.0:
+                    self.file.flush()
+                    self.index_file.flush()
+                    last_flush = time.perf_counter()
+        except Exception as e:
+            self.error = e
+        finally:
+            try:
+                self._close()
+            except OSError as e:
+                self.error = self.error or e
+                self.file = None
+                self.index_file = None
+
+
+# 读取记录文件：按索引定位数据块，接口与pingReader中的数据源一致（read_block()返回(pkg_len, n)）
+class RecordingSource(object):
+    def __init__(self, path, block_lines=1024):
+        self.path = path
+        self.block_lines = block_lines
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, version, _, self.created = struct.unpack(
+            RECORD_HEADER_FMT, self.data[:struct.calcsize(RECORD_HEADER_FMT)].tobytes())
+        if magic != RECORD_MAGIC or version != RECORD_VERSION:
+            raise ValueError('not a ping recording: %s' % path)
+        self.index = self._load_index()
+        self.total_line_num = 0
+        self.pkg_len = 0
+        if len(self.index):
+            _, _, _, last_n, _ = self._chunk(len(self.index) - 1)
+            self.total_line_num = int(self.index['ping'][-1]) + last_n
+            self.pkg_len = max(self._chunk(k)[4] for k in range(len(self.index)))
+
+    # 索引缺失或不完整（写入中断）时，顺序扫描块头重建
+    def _load_index(self):
+        try:
+            index = np.fromfile(self.path + INDEX_SUFFIX, dtype=INDEX_DTYPE)
+        except (OSError, ValueError):
+            index = np.zeros(0, dtype=INDEX_DTYPE)
+        index = index[index['offset'] < len(self.data)]
+        entries = []
+        ping, offset = (0, RECORD_HEADER_SIZE)
+        if len(index):
+            ping, offset = int(index['ping'][-1]), int(index['offset'][-1])
+            entries = index[:-1].tolist()
+        while offset + CHUNK_HEADER_SIZE <= len(self.data):
+            magic, size, n, _, _, _ = struct.unpack(
+                CHUNK_HEADER_FMT, self.data[offset:offset + CHUNK_HEADER_SIZE].tobytes())
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER_SIZE + size > len(self.data):
+                break
+            entries.append((ping, offset))
+            ping, offset = ping + n, offset + CHUNK_HEADER_SIZE + size
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    # 第k个数据块：(序号, 采样点(n, pkg_len), 接收时刻, n, pkg_len)
+    def _chunk(self, k):
+        offset = int(self.index['offset'][k])
+        _, size, n, pkg_len, _, timestamp = struct.unpack(
+            CHUNK_HEADER_FMT, self.data[offset:offset + CHUNK_HEADER_SIZE].tobytes())
+        body = offset + CHUNK_HEADER_SIZE
+        seqs = self.data[body:body + 4 * n].view('<u4')
+        samples = self.data[body + 4 * n:body + size].view('<u2').reshape(n, pkg_len)
+        return seqs, samples, timestamp, n, pkg_len
+
+    @property
+    def block_num(self):
+        return (self.total_line_num + self.block_lines - 1) // self.block_lines
+
+    # 读取[start, start+count)的ping，返回形状为(pkg_len, 行数)的uint16矩阵
+    def read_lines(self, start, count):
+        stop = min(start + count, self.total_line_num)
+        out = np.zeros((self.pkg_len, max(stop - start, 0)), dtype=np.uint16)
+        k = int(np.searchsorted(self.index['ping'], start, side='right')) - 1
+        while 0 <= k < len(self.index) and self.index['ping'][k] < stop:
+            first = int(self.index['ping'][k])
+            _, samples, _, n, pkg_len = self._chunk(k)
+            lo, hi = max(start - first, 0), min(stop - first, n)
+            col = first + lo - start
+            out[:pkg_len, col:col + hi - lo] = samples[lo:hi].T
+            k += 1
+        return out
+
+    def read_block(self, block):
+        return self.read_lines(block * self.block_lines, self.block_lines)
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pings', type=int, default=200000, help='ping number to record')
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per ping')
+    parser.add_argument('--batch', type=int, default=16, help='pings per submit')
+    parser.add_argument('--max-mb', type=float, default=100, help='rotate size (MB)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 写入吞吐量测试：模拟接收线程按批提交，测量提交耗时（接收线程的开销）与写线程吞吐量，并校验回读数据
+    opt = parse_opt()
+    directory = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    pattern = rng.integers(0, 65536, size=(1024, opt.pkg_len), dtype=np.uint16)
+    recorder = PingRecorder(directory, max_bytes=int(opt.max_mb * 1e6))
+    recorder.start()
+
+    submit_time = []
+    t0 = time.perf_counter()
+    for start in range(0, opt.pings, opt.batch):
+        n = min(opt.batch, opt.pings - start)
+        rows = np.arange(start, start + n) % len(pattern)
+        samples = pattern[rows]
+        t1 = time.perf_counter()
+        recorder.submit(np.arange(start, start + n, dtype=np.uint32), samples)
+        submit_time.append(time.perf_counter() - t1)
+        if recorder.queue.qsize() > recorder.queue.maxsize // 2:
+            time.sleep(0.001)           # 模拟接收端的到达间隔，避免测试本身把队列灌满
+    recorder.stop()
+    elapsed = time.perf_counter() - t0
+
+    counters = recorder.counters()
+    submit_time = np.array(submit_time) * 1e6
+    print('recorded %d pings, %.1f MB in %d file(s), %.2f s, %.0f MB/s (writer busy %.2f s)'
+          % (counters['ping'], counters['byte'] / 1e6, counters['file'], elapsed,
+             counters['byte'] / 1e6 / elapsed, counters['write_time']))
+    print('submit: mean %.1f us, max %.1f us; queue max depth %d, dropped %d'
+          % (submit_time.mean(), submit_time.max(), counters['max_depth'], counters['dropped']))
+
+    t0 = time.perf_counter()
+    total, identical = 0, True
+    for path in recorder.paths:
+        source = RecordingSource(path)
+        data = source.read_lines(0, source.total_line_num)
+        rows = (np.arange(total, total + source.total_line_num) % len(pattern))
+        identical &= np.array_equal(data, pattern[rows].T)
+        total += source.total_line_num
+    print('read back %d pings in %.2f s, data identical: %s' % (total, time.perf_counter() - t0, identical))
+    source = RecordingSource(recorder.paths[-1])
+    t0 = time.perf_counter()
+    for start in rng.integers(0, max(source.total_line_num - 1400, 1), 50):
+        source.read_lines(int(start), 1400)
+    print('seek latency (one screen): %.2f ms' % ((time.perf_counter() - t0) / 50 * 1000))
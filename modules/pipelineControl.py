@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        pipelineControl.py
+@Author：      wzj
+@Description:  线程的暂停/继续/停止控制。
+               原实现在暂停时以while True空转检查is_continue（占满一个CPU核），
+               检测线程阻塞在img_queue.get()上，收到下一帧之前无法响应jump_out。
+               此处改为条件变量：
+                   1. 暂停时线程阻塞在条件变量上，不占用CPU，继续或停止时立即唤醒
+                   2. 帧间等待（原msleep）可被停止请求打断
+                   3. 停止时调用注册的唤醒函数（如向队列放入None），唤醒阻塞在队列上的消费者
+                   4. 记录从请求停止到线程退出的延迟，便于监测
+                   5. wake()唤醒暂停中的线程处理一次请求（如参数变化后重绘），不改变暂停状态
+@Created：     2026/10/18
+@Modified:
+"""
+
+import threading
+import time
+
+
+class ThreadControl(object):
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.paused = False
+        self.stopping = False
+        self.woken = False              # 暂停中被wake()唤醒
+        self.stop_time = None           # 请求停止的时刻
+        self.stop_latency = None        # 最近一次从请求停止到线程退出的延迟（秒）
+        self.wakers = []                # 停止时调用的唤醒函数
+
+    def add_waker(self, waker):
+        self.wakers.append(waker)
+
+    # 线程启动前调用，清除上一次的停止请求
+    def reset(self):
+        with self.cond:
+            self.paused = False
+            self.stopping = False
+            self.woken = False
+            self.stop_time = None
+
+    def pause(self):
+        with self.cond:
+            self.paused = True
+
+    def resume(self):
+        with self.cond:
+            self.paused = False
+            self.cond.notify_all()
+
+    def wake(self):
+        with self.cond:
+            self.woken = True
+            self.cond.notify_all()
+
+    def stop(self):
+        with self.cond:
+            if not self.stopping:
+                self.stopping = True
+                self.stop_time = time.perf_counter()
+            self.cond.notify_all()
+        for waker in self.wakers:
+            waker()
+
+    @property
+    def is_stopping(self):
+        return self.stopping
+
+    # 暂停时阻塞，直到继续、停止或被wake()唤醒（此时paused仍为True）；返回False表示已请求停止。timeout为None时一直等待
+    def wait_running(self, timeout=None):
+        with self.cond:
+            self.cond.wait_for(lambda: not self.paused or self.stopping or self.woken, timeout)
+            self.woken = False
+            return not self.stopping
+
+    # 可被停止请求打断的等待；返回False表示已请求停止
+    def sleep(self, seconds):
+        with self.cond:
+            if seconds > 0:
+                self.cond.wait_for(lambda: self.stopping, seconds)
+            return not self.stopping
+
+    # 线程退出前调用，记录停止延迟（毫秒），没有停止请求时返回None
+    def stopped(self):
+        with self.cond:
+            if self.stop_time is None:
+                return None
+            self.stop_latency = time.perf_counter() - self.stop_time
+            return self.stop_latency * 1000
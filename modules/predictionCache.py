@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        predictionCache.py
+@Author：      wzj
+@Description:  模型原始输出（NMS之前）的LRU缓存。调节置信度/IoU阈值只影响NMS，不必重新推理：
+                   1. 键为(数据源, 帧下标, 着色参数, 模型, 推理尺寸)，同一画面再次出现（暂停、回看已播放的片段）时直接取用
+                   2. NMS先丢弃目标置信度(obj) <= conf_thres的候选框，因此只保存obj > floor的行：
+                      conf_thres >= floor时NMS结果与完整输出完全相同，每帧占用从数MB降到数十KB；
+                      conf_thres < floor时视为未命中，重新推理
+                   3. 按字节数限制容量，超出时淘汰最久未使用的帧
+               运行本文件比较重新推理与只做NMS的耗时，并校验结果一致：python -m modules.predictionCache
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache(object):
+    def __init__(self, max_bytes=64 * 1024 * 1024, floor=0.01):
+        self.max_bytes = max_bytes
+        self.floor = floor                  # 只保存obj > floor的候选框（界面置信度的最小步长）
+        self.entries = OrderedDict()        # 键 → (候选框, 附加信息)
+        self.bytes = 0
+        self.lock = threading.Lock()        # 检测线程写入，界面线程可能读取统计
+        self.hit_num = 0
+        self.miss_num = 0
+
+    # 取出缓存的候选框(1, n, 5 + 类别数)与附加信息；没有或conf_thres低于floor时返回None
+    def get(self, key, conf_thres):
+        with self.lock:
+            entry = self.entries.get(key) if conf_thres >= self.floor else None
+            if entry is None:
+                self.miss_num += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hit_num += 1
+            return entry
+
+    # 保存一帧的原始输出pred(1, N, 5 + 类别数)，返回(过滤后的候选框, 附加信息)，之后的NMS应使用过滤后的候选框
+    def put(self, key, pred, meta=None):
+        rows = pred[:, pred[0, :, 4] > self.floor].detach().to('cpu', copy=True)
+        entry = rows, meta
+        size = rows.element_size() * rows.nelement()
+        with self.lock:
+            if key in self.entries:
+                old = self.entries.pop(key)[0]
+                self.bytes -= old.element_size() * old.nelement()
+            self.entries[key] = entry
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, (old, _) = self.entries.popitem(last=False)
+                self.bytes -= old.element_size() * old.nelement()
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def counters(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.bytes, 'hit': self.hit_num, 'miss': self.miss_num}
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default='weights/yolov5n.pt', help='model path')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--repeat', type=int, default=10, help='repetitions per measurement')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 在示例图片上：完整推理 + NMS 与 缓存命中后只做NMS 的耗时；多组阈值下两者的检测结果应完全相同
+    import cv2
+    import torch
+    from models.experimental import attempt_load
+    from YoLoV5.general import non_max_suppression
+    from modules.framePreprocessor import FramePreprocessor
+
+    opt = parse_opt()
+    model = attempt_load(opt.weights, map_location='cpu')
+    im = cv2.resize(cv2.imread('data/images/zidane.jpg'), (1400, 800))
+    preprocessor = FramePreprocessor(im.shape, opt.imgsz, int(model.stride.max()))
+    cache = PredictionCache()
+    with torch.no_grad():
+        img = preprocessor(im)
+        model(img)      # warm up
+        t0 = time.perf_counter()
+        for _ in range(opt.repeat):
+            pred = model(img)[0]
+            non_max_suppression(pred, 0.25, 0.45)
+        infer = (time.perf_counter() - t0) / opt.repeat
+        cache.put('frame', pred)
+
+        t0 = time.perf_counter()
+        for _ in range(opt.repeat):
+            rows, _ = cache.get('frame', 0.25)
+            non_max_suppression(rows, 0.25, 0.45)
+        nms_only = (time.perf_counter() - t0) / opt.repeat
+
+        identical = True
+        for conf in (0.01, 0.1, 0.25, 0.5, 0.8):
+            for iou in (0.2, 0.45, 0.7):
+                expected = non_max_suppression(pred, conf, iou)[0]
+                result = non_max_suppression(cache.get('frame', conf)[0], conf, iou)[0]
+                identical &= expected.shape == result.shape and torch.equal(expected, result)
+    counters = cache.counters()
+    print('inference + NMS %.1f ms, cached NMS only %.2f ms (%.0fx); cached rows %d of %d (%.0f KB vs %.0f KB); '
+          'identical for all thresholds: %s'
+          % (infer * 1000, nms_only * 1000, infer / nms_only, cache.entries['frame'][0].shape[1], pred.shape[1],
+             counters['bytes'] / 1024, pred.element_size() * pred.nelement() / 1024, identical))
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        stripDetector.py
+@Author：      wzj
+@Description:  利用瀑布图滚动的增量检测。相邻两帧只差左移若干列（新列在右端），整帧重复推理浪费算力。
+               帧携带瀑布图的(generation, column)，同一generation内两帧column之差即左移列数shift：
+                   1. 上一帧的检测框左移shift列，移出屏幕的丢弃
+                   2. 只对最右端shift + overlap列的条带推理（与整帧相同的缩放比例，目标尺度不变），
+                      overlap为感受野/目标宽度留出的重叠；条带宽度按stride取整，预处理器按宽度缓存
+                   3. 拼接：完全在条带内的旧框由条带的结果取代；跨过条带左边界的旧框与贴左边界的新框
+                      （同一目标被条带截断的两部分）按同类别、交集/较小框面积（IoS）配对，合并为外接框
+                   条带之外的旧框保持不变。宽度超过条带的目标只能由外接框近似，此时应增大overlap
+               以下情况整帧推理：首帧、整屏重写（增益/TVG/跳转，generation变化）、左移过多（条带超过半屏）、
+               置信度/IoU阈值变化；shift为0（同一画面）时直接返回上一帧的结果。
+               卷积网络的计算量与输入面积成正比，按输入像素数统计相对整帧推理的计算量。
+               运行本文件在记录数据上比较增量检测与逐帧整帧检测：python -m modules.stripDetector --source data.txt
+               （不给出--source时使用合成声呐记录；tests/test_stripDetector.py在合成记录上检查召回率、精确率与计算量）
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from YoLoV5.general import non_max_suppression, scale_coords
+from modules.framePreprocessor import FramePreprocessor
+
+
+# 两组框（xyxy）两两之间的交集面积 / 较小框面积
+def box_ios(a, b):
+    w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return w * h / np.maximum(np.minimum(area_a[:, None], area_b[None, :]), 1e-6)
+
+
+class StripDetector(object):
+    def __init__(self, model, stride, imgsz=640, overlap=96, max_strip=0.5, merge_thres=0.5,
+                 device='cpu', dtype=torch.float32):
+        self.model = model
+        self.stride = stride
+        self.imgsz = imgsz
+        self.overlap = overlap              # 新列左侧额外推理的列数（原图像素）
+        self.max_strip = max_strip          # 条带宽度超过屏幕宽度的该比例时改为整帧推理
+        self.merge_thres = merge_thres      # 新旧框配对的IoS阈值
+        self.device = device
+        self.dtype = dtype
+        self.full_preprocessor = None
+        self.preprocessors = {}             # 条带宽度（列） → FramePreprocessor
+        self.boxes = np.zeros((0, 6), dtype=np.float32)     # 上一帧的结果（xyxy, conf, cls），当前帧坐标
+        self.key = None                     # 上一帧的(generation, 阈值...)，变化时整帧推理
+        self.column = 0
+        self.full_num = 0
+        self.strip_num = 0
+        self.reuse_num = 0
+        self.pixels = 0                     # 实际推理的输入像素数
+        self.full_pixels = 0                # 每帧都整帧推理时的输入像素数
+
+    def reset(self):
+        self.boxes = np.zeros((0, 6), dtype=np.float32)
+        self.key = None
+
+    # 对图像（整帧或条带）推理，preprocessor决定缩放几何；返回原图坐标的检测框
+    def infer(self, im, preprocessor, nms_args):
+        img = preprocessor(im)
+        pred = self.model(img)[0]
+        det = non_max_suppression(pred, *nms_args)[0]
+        if len(det):
+            det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im.shape, preprocessor.ratio_pad)
+        self.pixels += img.shape[2] * img.shape[3]
+        return det.float().cpu().numpy()
+
+    def detect_full(self, im0, nms_args):
+        if self.full_preprocessor is None or self.full_preprocessor.shape != im0.shape[:2]:
+            self.full_preprocessor = FramePreprocessor(im0.shape, self.imgsz, self.stride, self.dtype, self.device)
+            self.preprocessors = {}
+        self.full_num += 1
+        return self.infer(im0, self.full_preprocessor, nms_args)
+
+    # 条带宽度：覆盖shift + overlap列，缩放后按stride取整并用满取整后的宽度
+    def strip_columns(self, shift, ratio):
+        cells = -(-int(np.ceil((shift + self.overlap) * ratio)) // self.stride)
+        return int(cells * self.stride / ratio)
+
+    # 新框与旧框拼接，left为条带左边界（列），edge为视为贴边（被条带截断）的距离（列）。
+    # 完全在条带内的旧框由条带的结果取代；伸出条带左侧的旧框保留，与贴条带左边界的新框（同一目标被截断的两部分）
+    # 配对时合并为外接框
+    def stitch(self, old, new, left, edge, agnostic):
+        kept, candidates = old[old[:, 2] <= left], old[(old[:, 0] < left) & (old[:, 2] > left)]
+        if len(new) and len(candidates):
+            ios = box_ios(new[:, :4], candidates[:, :4])
+            if not agnostic:
+                ios[new[:, 5, None] != candidates[None, :, 5]] = 0
+            merged = (ios >= self.merge_thres) & (new[:, 0] <= left + edge)[:, None]
+            for i in np.flatnonzero(merged.any(axis=1)):
+                partners = candidates[merged[i]]
+                new[i, 0] = partners[:, 0].min()
+                new[i, 1] = min(new[i, 1], partners[:, 1].min())
+                new[i, 3] = max(new[i, 3], partners[:, 3].max())
+                new[i, 4] = max(new[i, 4], partners[:, 4].max())
+            candidates = candidates[~merged.any(axis=0)]
+        return np.concatenate([kept, candidates, new])
+
+    # 检测一帧，generation、column取自帧（Frame）；返回当前帧坐标的检测框(n, 6)：xyxy, conf, cls
+    def __call__(self, im0, generation, column, conf_thres=0.25, iou_thres=0.45, classes=None, agnostic=False,
+                 max_det=1000):
+        nms_args = (conf_thres, iou_thres, classes, agnostic)
+        nms_args += (False, (), max_det)
+        height, width = im0.shape[:2]
+        key = (generation, conf_thres, iou_thres, classes, agnostic, im0.shape)
+        shift = column - self.column
+        self.column = column
+        ratio = min(self.imgsz / height, self.imgsz / width)
+        full_pixels = (-(-int(round(height * ratio)) // self.stride) * self.stride) \
+            * (-(-int(round(width * ratio)) // self.stride) * self.stride)
+        self.full_pixels += full_pixels
+
+        if key == self.key and shift == 0:
+            self.reuse_num += 1
+            return self.boxes.copy()
+        strip = self.strip_columns(shift, ratio) if key == self.key and shift > 0 else width
+        self.key = key
+        if strip > width * self.max_strip:
+            self.boxes = self.detect_full(im0, nms_args)
+            return self.boxes.copy()
+
+        # 旧框左移，移出屏幕的丢弃
+        old = self.boxes
+        old[:, [0, 2]] -= shift
+        old = old[old[:, 2] > 0]
+        old[:, 0] = np.maximum(old[:, 0], 0)
+
+        left = width - strip
+        if strip not in self.preprocessors:
+            self.preprocessors[strip] = FramePreprocessor((height, strip), self.imgsz, self.stride, self.dtype,
+                                                          self.device, ratio=ratio)
+        new = self.infer(im0[:, left:], self.preprocessors[strip], nms_args)
+        new[:, [0, 2]] += left
+        self.strip_num += 1
+        self.boxes = self.stitch(old, new, left, 8 / ratio, agnostic)      # 8个输入像素以内视为贴边
+        return self.boxes.copy()
+
+    # 相对逐帧整帧推理的输入像素比例（约等于计算量比例）
+    def counters(self):
+        return {'full': self.full_num, 'strip': self.strip_num, 'reuse': self.reuse_num,
+                'pixel_ratio': self.pixels / self.full_pixels if self.full_pixels else 0.0}
+
+
+# 两组检测框两两之间的IoU，类别不同时为0
+def class_iou(a, b):
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    iou = inter / (area_a[:, None] + area_b[None, :] - inter + 1e-6)
+    iou[a[:, 5, None] != b[None, :, 5]] = 0
+    return iou
+
+
+# 两组检测框按同类别、IoU≥thres贪心配对，返回(配对数, a的框数, b的框数)
+def match_boxes(a, b, thres=0.5):
+    if len(a) == 0 or len(b) == 0:
+        return 0, len(a), len(b)
+    iou = class_iou(a, b)
+    matched = 0
+    while iou.size and iou.max() >= thres:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        iou[i, :] = 0
+        iou[:, j] = 0
+        matched += 1
+    return matched, len(a), len(b)
+
+
+# 记录文件按回放流程（TVG、着色、瀑布图滚动，参数取数据解析线程的默认值）生成帧：每帧新增speed列，
+# 返回(图像, generation, column)
+def recording_frames(path, frames, speed):
+    from modules.energyGate import recording_strips
+    for im0, generation, column, _, _, _ in recording_strips(path, frames, speed):
+        yield im0, generation, column
+
+
+# 合成声呐记录（没有记录文件时使用，也是测试数据）：暗色噪声水体中，示例图片的灰度作为回波强度嵌入深处，
+# 依次间隔gap个ping排列，经完整的回放流程（解析、着色、瀑布图滚动）后模型能识别其中的目标；写入path（十六进制文本）
+def synthetic_recording(path, pings, pkg_len=800, height=400, gap=100, seed=0):
+    import cv2
+    from modules.hexParser import format_records
+
+    rng = np.random.default_rng(seed)
+    echo = rng.normal(1500, 400, (pkg_len, pings))
+    images = [cv2.cvtColor(cv2.imread('data/images/%s.jpg' % name), cv2.COLOR_BGR2GRAY) for name in ('zidane', 'bus')]
+    images = [cv2.resize(im, (im.shape[1] * height // im.shape[0], height)) for im in images]
+    x, k, top = 0, 0, pkg_len - height - 20
+    while x < pings:
+        im = images[k % len(images)]
+        w = min(im.shape[1], pings - x)
+        echo[top:top + height, x:x + w] = im[:, :w] * 250.0
+        x, k = x + w + gap, k + 1
+    with open(path, 'w') as f:
+        f.write(format_records(echo.T.clip(0, 65535).astype(np.uint16)))
+    return path
+
+
+# 每帧分别做整帧检测与增量检测，以整帧检测为参照统计增量检测的召回率与精确率，以及计算量与耗时。
+# 阈值附近的低置信度目标在整帧检测中本身也时有时无，另外统计置信度不低于report_conf的框，
+# 并以整帧检测自身的帧间一致性（上一帧结果左移后与本帧配对）作为参考。
+# 移出条带的框不再重新检测，整帧检测在之后的帧中可能不再给出同一目标，按本帧计算的精确率因此偏低；
+# precision_seen为增量检测的框与本帧或之前任一帧整帧检测的框（左移到本帧坐标）配对的比例，即增量检测没有凭空产生框
+def compare_detection(model, stride, frames, imgsz=640, overlap=96, conf=0.25, iou=0.45, report_conf=0.4):
+    full = StripDetector(model, stride, imgsz)
+    incremental = StripDetector(model, stride, imgsz, overlap)
+    totals = np.zeros((4, 2), dtype=np.int64)     # 召回、精确、置信召回、置信精确：(配对数, 框数)
+    stable = np.zeros((2, 2), dtype=np.int64)     # 整帧检测帧间一致性：全部、置信
+    seen = np.zeros((4, 2), dtype=np.int64)       # 与本帧或之前整帧检测配对的增量检测框：全部、置信
+    history = np.zeros((0, 6), dtype=np.float32)  # 之前各帧整帧检测的框，当前帧坐标
+    previous, previous_column = None, 0
+    full_time = inc_time = 0.0
+    with torch.no_grad():
+        for im0, generation, column in frames:
+            t0 = time.perf_counter()
+            reference = full.detect_full(im0, (conf, iou, None, False, False, (), 1000))
+            t1 = time.perf_counter()
+            result = incremental(im0, generation, column, conf, iou)
+            t2 = time.perf_counter()
+            full_time += t1 - t0
+            inc_time += t2 - t1
+            confident_reference = reference[reference[:, 4] >= report_conf]
+            for row, (a, b) in enumerate([(reference, result), (result, reference), (confident_reference, result),
+                                          (result[result[:, 4] >= report_conf], reference)]):
+                totals[row] += match_boxes(a, b)[:2]
+            if previous is not None:
+                previous[:, [0, 2]] -= column - previous_column
+                stable[0] += match_boxes(previous, reference)[:2]
+                stable[1] += match_boxes(previous[previous[:, 4] >= report_conf], reference)[:2]
+                history[:, [0, 2]] -= column - previous_column
+            history = np.concatenate([history[history[:, 2] > 0], reference])
+            for row, boxes in enumerate([result, result[result[:, 4] >= report_conf]]):
+                if len(boxes):
+                    seen[row] += (int((class_iou(boxes, history) >= 0.5).any(axis=1).sum()), len(boxes))
+            previous, previous_column = reference, column
+    counters = incremental.counters()
+    frame_num = max(counters['full'] + counters['strip'] + counters['reuse'], 1)
+    ratio = totals[:, 0] / np.maximum(totals[:, 1], 1)
+    return {'frames': frame_num, 'boxes': (int(totals[0, 1]), int(totals[1, 1])),
+            'confident_boxes': (int(totals[2, 1]), int(totals[3, 1])),
+            'recall': ratio[0], 'precision': ratio[1], 'confident_recall': ratio[2], 'confident_precision': ratio[3],
+            'precision_seen': seen[0, 0] / max(seen[0, 1], 1), 'confident_precision_seen': seen[1, 0] / max(seen[1, 1], 1),
+            'stability': stable[0, 0] / max(stable[0, 1], 1), 'confident_stability': stable[1, 0] / max(stable[1, 1], 1),
+            'full_ms': full_time / frame_num * 1000, 'incremental_ms': inc_time / frame_num * 1000,
+            'counters': counters}
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default='weights/yolov5n.pt', help='model path')
+    parser.add_argument('--source', type=str, default='', help='hex .txt recording (synthetic recording when empty)')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--frames', type=int, default=300, help='frame number')
+    parser.add_argument('--speed', type=int, default=2, help='new columns per frame')
+    parser.add_argument('--overlap', type=int, default=96, help='overlap columns left of the new ones')
+    parser.add_argument('--conf', type=float, default=0.25, help='confidence threshold')
+    parser.add_argument('--iou', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--report-conf', type=float, default=0.4, help='confidence of the "confident boxes" report')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 增量检测与逐帧整帧检测的比较（见compare_detection）；没有记录文件时使用合成声呐记录
+    import os
+    import tempfile
+    from models.experimental import attempt_load
+
+    opt = parse_opt()
+    model = attempt_load(opt.weights, map_location='cpu')
+    source = opt.source or synthetic_recording(os.path.join(tempfile.mkdtemp(), 'synthetic.txt'),
+                                               1400 + opt.frames * opt.speed)
+    r = compare_detection(model, int(model.stride.max()), recording_frames(source, opt.frames, opt.speed),
+                          opt.imgsz, opt.overlap, opt.conf, opt.iou, opt.report_conf)
+    print('%d frames, %d columns per frame: full-frame %.1f ms/frame, incremental %.1f ms/frame, '
+          'input pixels (FLOPs) %.1f%% of full-frame, %s'
+          % (r['frames'], opt.speed, r['full_ms'], r['incremental_ms'], r['counters']['pixel_ratio'] * 100,
+             r['counters']))
+    print('all boxes (conf>=%.2f): full-frame %d, incremental %d, recall %.3f, precision %.3f '
+          '(vs full-frame so far %.3f), full-frame vs its previous frame %.3f'
+          % ((opt.conf,) + r['boxes'] + (r['recall'], r['precision'], r['precision_seen'], r['stability'])))
+    print('confident boxes (conf>=%.2f): recall %.3f, precision %.3f (vs full-frame so far %.3f), '
+          'full-frame vs its previous frame %.3f'
+          % (opt.report_conf, r['confident_recall'], r['confident_precision'], r['confident_precision_seen'],
+             r['confident_stability']))
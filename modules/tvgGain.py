@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        tvgGain.py
+@Author：      wzj
+@Description:  时变增益（TVG）/ 吸收补偿。回波随距离R按扩散损失（20logR：鱼群等体积目标；40logR：单体目标）
+               与吸收损失（往返2αR）衰减，补偿增益（dB）：
+                   G(R) = spreading * log10(R) + 2 * α * R
+               每个深度采样点（bin）对应的距离固定，增益只与bin有关，因此预先计算每个bin的线性增益向量，
+               新数据按列广播相乘即可（每帧一次乘法）；只有吸收系数、扩散系数或pkg_len变化时才重新计算向量。
+               增益向量归一化为最大值1（最深处），补偿后的数值不超过原始数值；浅处变暗，增益参考值需按补偿后的数据计算
+               （IntensityStats.reference()的gain参数）。扩散补偿默认关闭（spreading=0），由用户开启；
+               每个bin的距离range_per_bin取决于声呐的采样率，在config/setting.json中设置。
+               运行本文件比较每帧开销：python -m modules.tvgGain
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+class TvgGain(object):
+    def __init__(self, spreading=0, absorption=0.0, range_per_bin=0.05, min_range=1.0):
+        self.spreading = spreading              # 扩散系数：20（20logR）、40（40logR）或0（不补偿扩散）
+        self.absorption = absorption            # 吸收系数α（dB/100m），对应界面的吸收滑块
+        self.range_per_bin = range_per_bin      # 每个采样点对应的距离（m）
+        self.min_range = min_range              # 近场距离（m），小于此距离时按此距离计算，避免log(R)趋于负无穷
+        self.key = None                         # 缓存向量对应的参数
+        self.gain = None                        # 每个bin的线性增益，形状为(pkg_len, 1)
+
+    @property
+    def enabled(self):
+        return self.spreading > 0 or self.absorption > 0
+
+    # 每个bin的线性增益向量（按参数缓存），形状为(pkg_len, 1)，可直接与(pkg_len, n)的数据广播相乘
+    def vector(self, pkg_len):
+        key = (pkg_len, self.spreading, self.absorption, self.range_per_bin, self.min_range)
+        if key != self.key:
+            r = np.maximum((np.arange(pkg_len) + 0.5) * self.range_per_bin, self.min_range)
+            db = self.spreading * np.log10(r) + 2 * self.absorption / 100.0 * r
+            db -= db.max()
+            self.gain = (10 ** (db / 20)).astype(np.float32).reshape(-1, 1)
+            self.key = key
+        return self.gain
+
+    # 对(pkg_len, n)的uint16数据做增益补偿，返回同形状的uint16矩阵（可继续使用着色查找表）
+    def apply(self, data, out=None):
+        if not self.enabled or data.size == 0:
+            return data
+        gain = self.vector(data.shape[0])
+        if out is None:
+            out = np.empty(data.shape, dtype=np.uint16)
+        np.multiply(data, gain, out=out, casting='unsafe')
+        return out
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per ping')
+    parser.add_argument('--columns', type=int, default=6, help='new columns per frame')
+    parser.add_argument('--frames', type=int, default=2000, help='frame number')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # 每帧开销：缓存增益向量后一次乘法 vs 每帧重新计算增益曲线
+    opt = parse_opt()
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 65536, size=(opt.pkg_len, opt.columns), dtype=np.uint16)
+    tvg = TvgGain(spreading=20, absorption=5)
+
+    t0 = time.perf_counter()
+    for _ in range(opt.frames):
+        result = tvg.apply(data)
+    cached = (time.perf_counter() - t0) / opt.frames * 1e6
+
+    t0 = time.perf_counter()
+    for _ in range(opt.frames):
+        r = np.maximum((np.arange(opt.pkg_len) + 0.5) * tvg.range_per_bin, tvg.min_range)
+        db = tvg.spreading * np.log10(r) + 2 * tvg.absorption / 100.0 * r
+        naive = (data * (10 ** ((db - db.max()) / 20)).astype(np.float32)[:, None]).astype(np.uint16)
+    recompute = (time.perf_counter() - t0) / opt.frames * 1e6
+
+    print('per frame (%d x %d): cached vector %.1f us, recompute %.1f us, identical: %s'
+          % (opt.pkg_len, opt.columns, cached, recompute, np.array_equal(result, naive)))
+    gain_db = 20 * np.log10(tvg.vector(opt.pkg_len).ravel())
+    print('gain at %.0f m / %.0f m / %.0f m: %.1f / %.1f / %.1f dB'
+          % (opt.pkg_len * tvg.range_per_bin / 4, opt.pkg_len * tvg.range_per_bin / 2, opt.pkg_len * tvg.range_per_bin,
+             gain_db[opt.pkg_len // 4], gain_db[opt.pkg_len // 2], gain_db[-1]))
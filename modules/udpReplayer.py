@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        udpReplayer.py
+@Author：      wzj
+@Description:  记录回放器：读取hex文本记录（有缓存时使用二进制缓存），按udpPortThread的记录格式以UDP发送，
+               无需探鱼仪即可按可控的速率驱动实时数据链路，用于压力测试。
+                   速率    --rate指定ping/s；--realtime N为实时速率的N倍；--rate 0为尽快发送
+                   突发    --burst每次连续发送的ping数，突发之间按平均速率等待
+                   丢包    --loss按概率跳过ping（序号照常递增，接收端可按序号统计丢失）
+               发送按截止时刻调度（第i个突发在t0 + i*burst/rate时发出），不会因单次sleep误差累积漂移。
+               默认在本进程内启动接收链路（UDP接收线程 → 数据解析线程 → 模拟检测的消费者），
+               报告接收端实际维持的ping速率、丢包、解析跳过的ping及丢帧；--sweep依次测试多个速率，
+               找出链路开始丢数据前的最大ping速率。--no-receive只发送，由运行中的主程序接收。
+               例：python -m modules.udpReplayer --source data.txt --realtime 10
+                   python -m modules.udpReplayer --sweep 1000,5000,20000,0
+@Created：     2026/10/18
+@Modified:
+"""
+
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from modules.dataCache import DataCache
+from modules.pingReader import TextPingSource, CachePingSource
+from modules.udpPortThread import pack_pings, parse_address, MAX_DATAGRAM, SEQ_MOD
+
+REALTIME_RATE = 40.0        # 实时ping速率（ping/s），与回放默认帧速一致：每0.05秒前进2列
+
+
+# 打开记录：有有效缓存时内存映射缓存，否则流式解析hex文本
+def open_recording(path, data_cache=None):
+    data_cache = data_cache if data_cache is not None else DataCache()
+    cached = data_cache.load(path)
+    if cached is not None:
+        return CachePingSource(*cached)
+    return TextPingSource(path)
+
+
+class PingReplayer(object):
+    def __init__(self, source, address='udp://127.0.0.1:5555', rate=REALTIME_RATE, burst=1, loss=0.0,
+                 pings_per_datagram=1, loop=False, seed=0):
+        self.source = source                # TextPingSource或CachePingSource
+        self.address = address
+        self.rate = rate                    # ping/s，0表示尽快发送
+        self.burst = max(burst, 1)          # 每个突发连续发送的ping数
+        self.loss = loss                    # 跳过ping的概率
+        self.pings_per_datagram = max(pings_per_datagram, 1)
+        self.loop = loop                    # 发送完后从头循环
+        self.rng = np.random.default_rng(seed)
+        self.sent_num = 0                   # 已发送的ping数
+        self.skipped_num = 0                # 按loss跳过的ping数
+        self.datagram_num = 0
+        self.error_num = 0                  # 发送失败（如ENOBUFS）的包数
+        self.late_num = 0                   # 突发发出时已晚于截止时刻的次数
+        self.elapsed = 0.0
+
+    # 按块读出ping，生成形状为(n, pkg_len)的采样点
+    def pings(self):
+        while True:
+            for block in range(self.source.block_num):
+                yield np.ascontiguousarray(self.source.read_block(block).T)
+            if not self.loop:
+                return
+
+    def run(self, stop_event=None, max_pings=None, duration=None):
+        host, port = parse_address(self.address)
+        host = '127.0.0.1' if host == '0.0.0.0' else host
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        seq = 0
+        burst_num = 0
+        t0 = time.perf_counter()
+        try:
+            for samples in self.pings():
+                records = pack_pings(samples, seq)
+                seq = (seq + len(records)) % SEQ_MOD
+                keep = self.rng.random(len(records)) >= self.loss if self.loss > 0 else np.ones(len(records), bool)
+                per_datagram = max(min(self.pings_per_datagram, MAX_DATAGRAM // records.shape[1]), 1)
+                for pos in range(0, len(records), self.burst):
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    if max_pings is not None and self.sent_num + self.skipped_num >= max_pings:
+                        return
+                    if duration is not None and time.perf_counter() - t0 >= duration:
+                        return
+                    if self.rate > 0:
+                        deadline = t0 + burst_num * self.burst / self.rate
+                        wait = deadline - time.perf_counter()
+                        if wait > 0:
+                            time.sleep(wait)
+                        elif wait < -0.01:
+                            self.late_num += 1
+                    burst_num += 1
+                    chunk = records[pos:pos + self.burst][keep[pos:pos + self.burst]]
+                    self.skipped_num += min(self.burst, len(records) - pos) - len(chunk)
+                    for i in range(0, len(chunk), per_datagram):
+                        try:
+                            sock.sendto(chunk[i:i + per_datagram].tobytes(), (host, port))
+                            self.sent_num += len(chunk[i:i + per_datagram])
+                            self.datagram_num += 1
+                        except OSError:
+                            self.error_num += 1
+        finally:
+            self.elapsed = time.perf_counter() - t0
+            sock.close()
+
+    def counters(self):
+        return {'sent': self.sent_num, 'skipped': self.skipped_num, 'datagram': self.datagram_num,
+                'error': self.error_num, 'late': self.late_num, 'elapsed': self.elapsed,
+                'send_rate': self.sent_num / self.elapsed if self.elapsed > 0 else 0.0}
+
+
+# 本进程内的接收链路：UDP接收线程 → 数据解析线程（实时模式）→ 模拟检测线程的消费者（拷贝后归还帧）
+class LocalPipeline(object):
+    def __init__(self, address, record_dir=''):
+        from modules.decodeThread import DecodeThread
+        from modules.framePool import FrameQueue
+        from modules.udpPortThread import UdpPortThread
+
+        self.img_queue = FrameQueue(maxsize=2, policy='drop_oldest')
+        self.decode_thread = DecodeThread(self.img_queue)
+        self.decode_thread.source = address
+        self.udp_thread = UdpPortThread(self.decode_thread.ping_buffer)
+        self.udp_thread.address = address
+        if record_dir:
+            from modules.pingRecorder import PingRecorder
+            self.udp_thread.recorder = PingRecorder(record_dir)
+        self.frame_num = 0
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def consume(self):
+        while not self.stop_event.is_set():
+            try:
+                frame = self.img_queue.get(timeout=0.1)
+            except Exception:
+                continue
+            if frame is not None:
+                frame.data.copy()
+                frame.release()
+                self.frame_num += 1
+
+    def start(self):
+        self.threads = [threading.Thread(target=self.udp_thread.run),
+                        threading.Thread(target=self.decode_thread.run),
+                        threading.Thread(target=self.consume)]
+        for thread in self.threads:
+            thread.start()
+        time.sleep(0.2)
+
+    # 等待接收端取完内核缓冲区中的数据后停止
+    def stop(self, expected=None, timeout=2.0):
+        t0 = time.perf_counter()
+        while expected is not None and self.udp_thread.ping_num + self.udp_thread.lost_num < expected \
+                and time.perf_counter() - t0 < timeout:
+            time.sleep(0.01)
+        time.sleep(2 * self.decode_thread.frame_interval)
+        self.udp_thread.stop()
+        self.decode_thread.stop()
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+
+    def counters(self):
+        counters = self.udp_thread.counters()
+        counters.update(self.img_queue.counters())
+        counters['decode_skipped'] = self.decode_thread.live_skipped_num
+        counters['frame'] = self.frame_num
+        return counters
+
+
+def replay_once(source, opt, rate, address):
+    pipeline = None if opt.no_receive else LocalPipeline(address, opt.record)
+    if pipeline is not None:
+        pipeline.start()
+    replayer = PingReplayer(source, address, rate, opt.burst, opt.loss, opt.per_datagram,
+                            opt.loop or opt.duration is not None)
+    replayer.run(max_pings=opt.pings, duration=opt.duration)
+    sent = replayer.counters()
+    received = None
+    if pipeline is not None:
+        pipeline.stop(expected=sent['sent'] + sent['skipped'])
+        received = pipeline.counters()
+    return sent, received
+
+
+def _make_recording(pings, pkg_len):
+    from modules.hexParser import make_synthetic_records
+    path = os.path.join(tempfile.mkdtemp(), 'synthetic.txt')
+    with open(path, 'w') as f:
+        f.write(make_synthetic_records(pings + 1, pkg_len))
+    return path
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', type=str, default='', help='hex .txt recording (synthetic when empty)')
+    parser.add_argument('--address', type=str, default='udp://127.0.0.1:5555', help='receiver address')
+    parser.add_argument('--rate', type=float, default=None, help='ping/s, 0 for as fast as possible')
+    parser.add_argument('--realtime', type=float, default=1.0, help='multiple of real-time rate')
+    parser.add_argument('--sweep', type=str, default='', help='comma separated rates, e.g. 1000,5000,0')
+    parser.add_argument('--burst', type=int, default=1, help='pings sent back-to-back per burst')
+    parser.add_argument('--per-datagram', type=int, default=1, help='ping records per datagram')
+    parser.add_argument('--loss', type=float, default=0.0, help='probability of skipping a ping')
+    parser.add_argument('--pings', type=int, default=None, help='stop after this many pings')
+    parser.add_argument('--duration', type=float, default=None, help='stop after this many seconds (loops source)')
+    parser.add_argument('--loop', action='store_true', help='loop the recording')
+    parser.add_argument('--record', type=str, default='', help='also record received pings into this directory')
+    parser.add_argument('--no-receive', action='store_true', help='send only, receiver runs elsewhere')
+    parser.add_argument('--pkg-len', type=int, default=800, help='samples per ping of the synthetic recording')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    path = opt.source or _make_recording(opt.pings or 20000, opt.pkg_len)
+    source = open_recording(path)
+    print('recording: %s, %d pings x %d samples' % (path, source.total_line_num, source.pkg_len))
+
+    if opt.sweep:
+        rates = [float(r) for r in opt.sweep.split(',')]
+    else:
+        rates = [opt.rate if opt.rate is not None else REALTIME_RATE * opt.realtime]
+    for rate in rates:
+        sent, received = replay_once(source, opt, rate, opt.address)
+        print('rate %s: sent %d (skipped %d) in %d datagrams, %.0f ping/s, send errors %d, late bursts %d'
+              % ('max' if rate <= 0 else '%.0f' % rate, sent['sent'], sent['skipped'], sent['datagram'],
+                 sent['send_rate'], sent['error'], sent['late']))
+        if received is not None:
+            print('    received %d (%.0f ping/s), lost in transit %d, seq lost %d, bad bytes %d, '
+                  'decode skipped %d, frames %d, frames dropped %d'
+                  % (received['ping'], received['ping'] / max(sent['elapsed'], 1e-9),
+                     max(sent['sent'] - received['ping'], 0), received['lost'], received['bad_bytes'],
+                     received['decode_skipped'], received['frame'], received['dropped']))
+            if 'record_ping' in received:
+                print('    recorded %d pings, %.1f MB, queue max depth %d, recorder dropped %d'
+                      % (received['record_ping'], received['record_byte'] / 1e6, received['record_max_depth'],
+                         received['record_dropped']))
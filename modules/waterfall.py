@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        waterfall.py
+@Author：      wzj
+@Description:  环形缓冲区瀑布图。
+               原实现每帧把整幅raw_img左移speed列（约3.3MB内存拷贝）后再填充末尾列；
+               此处新列直接写入写指针head处并循环覆盖最旧的列，每帧内存访问量只与新列数有关。
+               需要按时间顺序（左旧右新）的图像时：
+                   slices() 返回两段视图，可直接分别使用，无拷贝
+                   view()   一次拷贝拼接为连续图像
+               background为标量、dtype为uint16时缓存单通道的原始强度（与瀑布图逐列对应，见DecodeThread.screen_raw）。
+@Created：     2026/10/18
+@Modified:
+"""
+
+import numpy as np
+
+
+class Waterfall(object):
+    def __init__(self, height, width, background=(65, 65, 65), dtype=np.uint8):
+        self.height = height
+        self.width = width
+        self.background = background
+        self.buffer = np.full((height, width) + np.shape(background), background, dtype=dtype)
+        self.head = 0           # 写指针，同时也是最旧一列的位置
+        self.generation = 0     # 整屏重写的次数，变化时屏幕内容不再是上一帧的平移
+        self.column = 0         # 本次整屏重写之后累计写入的列数，两帧之差即屏幕左移的列数
+
+    def clear(self):
+        self.buffer[:] = self.background
+        self.head = 0
+        self.generation += 1
+        self.column = 0
+
+    # 整屏重写：写指针归零，rows行以下恢复背景色，返回前rows行的视图（按时间顺序）供调用方直接写入
+    def overwrite(self, rows):
+        self.buffer[rows:] = self.background
+        self.head = 0
+        self.generation += 1
+        self.column = 0
+        return self.buffer[:rows]
+
+    # 写入新列，strip形状为(rows, n, 3)（单通道时为(rows, n)），rows <= height，未覆盖的行保持原值
+    def push(self, strip):
+        rows, n = strip.shape[:2]
+        self.column += n
+        if n >= self.width:         # 新列数超过屏幕宽度时只保留最新的width列
+            strip = strip[:, n - self.width:]
+            n = self.width
+        first = min(n, self.width - self.head)
+        self.buffer[:rows, self.head:self.head + first] = strip[:, :first]
+        if first < n:
+            self.buffer[:rows, :n - first] = strip[:, first:]
+        self.head = (self.head + n) % self.width
+
+    # 按时间顺序的两段视图(旧, 新)，左右拼接即为当前屏幕
+    def slices(self):
+        return self.buffer[:, self.head:], self.buffer[:, :self.head]
+
+    # 拼接为连续图像，out不为None时写入out（形状为(height, width, 3)）
+    def view(self, out=None):
+        if out is None:
+            out = np.empty_like(self.buffer)
+        older, newer = self.slices()
+        split = older.shape[1]
+        out[:, :split] = older
+        out[:, split:] = newer
+        return out
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project：     sonarGUI
+@File：        test_stripDetector.py
+@Author：      wzj
+@Description:  增量检测（StripDetector）与逐帧整帧检测的比较测试：合成声呐记录经完整回放流程滚动，
+               以整帧检测为参照检查增量检测的召回率、精确率与计算量（输入像素比例）。
+               需要weights/yolov5n.pt，运行：python -m pytest tests 或 python -m unittest tests.test_stripDetector
+@Created：     2026/10/18
+@Modified:
+"""
+
+import os
+import tempfile
+import unittest
+
+WEIGHTS = 'weights/yolov5n.pt'
+
+
+@unittest.skipUnless(os.path.exists(WEIGHTS), 'model weights not found')
+class StripDetectorTest(unittest.TestCase):
+    FRAMES = 40
+    SPEED = 8
+
+    @classmethod
+    def setUpClass(cls):
+        from models.experimental import attempt_load
+        from modules.stripDetector import compare_detection, recording_frames, synthetic_recording
+
+        cls.directory = tempfile.TemporaryDirectory()
+        path = synthetic_recording(os.path.join(cls.directory.name, 'synthetic.txt'), 1400 + cls.FRAMES * cls.SPEED)
+        model = attempt_load(WEIGHTS, map_location='cpu')
+        cls.result = compare_detection(model, int(model.stride.max()),
+                                       recording_frames(path, cls.FRAMES, cls.SPEED), report_conf=0.4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    # 首帧整帧推理，之后每帧只推理新滚入的条带
+    def test_strip_inference(self):
+        counters = self.result['counters']
+        self.assertEqual(counters['full'], 1)
+        self.assertEqual(counters['strip'], self.FRAMES - 1)
+
+    # 计算量（输入像素）不超过整帧推理的25%
+    def test_pixel_ratio(self):
+        self.assertLess(self.result['counters']['pixel_ratio'], 0.25)
+
+    # 召回率：整帧检测给出的置信框，增量检测同样给出
+    def test_recall(self):
+        self.assertGreater(self.result['confident_boxes'][0], 2 * self.FRAMES)
+        self.assertGreaterEqual(self.result['confident_recall'], 0.85)
+        self.assertGreaterEqual(self.result['recall'], 0.65)
+
+    # 精确率：增量检测的置信框都来自整帧检测（本帧或之前各帧）；移出条带的框不再重新检测，
+    # 整帧检测之后可能不再给出同一目标，按本帧计算的精确率下限较低
+    def test_precision(self):
+        self.assertGreaterEqual(self.result['confident_precision_seen'], 0.9)
+        self.assertGreaterEqual(self.result['precision_seen'], 0.8)
+        self.assertGreaterEqual(self.result['confident_precision'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()